@@ -0,0 +1,444 @@
+#!/usr/bin/python3
+##
+## Copyright (c) 2014-2017 Leidos.
+##
+## License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+##
+##
+## Developed under contract #FA8750-14-C-0241
+##
+
+# asyncRedisHelper.py -- asyncio versions of the redisHelper queue and set
+#
+# python 3 only (requires redis-py >= 4.2 for redis.asyncio); the python 2 scripts keep using redisHelper.
+# Keys, lua scripts, codecs, telemetry and dedup are shared with redisHelper so sync and async
+# producers/consumers can work on the same queues and sets, e.g.
+#
+#   async def worker(qRedis):
+#       while 1:
+#           dProject = await qRedis.get(timeout=30)
+#           ...
+#
+#   qRedis = AsyncRedisQueue('muse-to-build', codec=QueueCodec(), host='muse2-int', port=12345)
+#   await asyncio.gather( *[ worker(qRedis) for i in range(200) ] )
+
+import os
+import threading
+import time
+
+import redis
+import redis.asyncio
+
+from redisHelper import DEDUP_PUSH_SCRIPT
+from redisHelper import STATS_DEQUEUE_SCRIPT
+from redisHelper import QueueItems
+from redisHelper import getTelemetryKeys
+
+###
+# per-process registry of asyncio connection pools (see redisHelper.getConnectionPool); a pool's
+# connections belong to the event loop they were opened on, so use one loop per process
+###
+dAsyncConnectionPools = {}
+iAsyncConnectionPoolsPid = None
+oAsyncConnectionPoolsLock = threading.Lock()
+
+###
+def getAsyncConnectionPool(**redis_kwargs):
+
+    global iAsyncConnectionPoolsPid
+
+    dKwargs = dict(redis_kwargs)
+    dKwargs['host'] = dKwargs.get('host', 'localhost')
+    dKwargs['port'] = int(dKwargs.get('port', 6379))
+    dKwargs['db'] = int(dKwargs.get('db', 0))
+
+    tKey = ( dKwargs['host'], dKwargs['port'], dKwargs['db'] ) + tuple( sorted( (sKey, sValue) for (sKey, sValue) in dKwargs.items() if sKey not in ('host', 'port', 'db') ) )
+
+    with oAsyncConnectionPoolsLock:
+
+        if iAsyncConnectionPoolsPid != os.getpid():
+
+            dAsyncConnectionPools.clear()
+            iAsyncConnectionPoolsPid = os.getpid()
+
+        if tKey not in dAsyncConnectionPools:
+
+            dAsyncConnectionPools[tKey] = redis.asyncio.ConnectionPool(**dKwargs)
+
+        return dAsyncConnectionPools[tKey]
+
+###
+# asyncio redis client backed by the shared connection pool for the given connection parameters
+###
+def getAsyncRedis(**redis_kwargs):
+
+    return redis.asyncio.Redis(connection_pool=getAsyncConnectionPool(**redis_kwargs))
+
+###
+# Simple Queue with asyncio Redis Backend (see redisHelper.RedisQueue; lease mode is not available)
+###
+class AsyncRedisQueue(object):
+
+    ###
+    # The default connection parameters are: host='localhost', port=6379, db=0
+    #
+    # codec, telemetry, dedup and dedupKey: see RedisQueue
+    ###
+    def __init__(self, name, name2=None, namespace='queue', codec=None, telemetry=None, dedup=False, dedupKey=None, **redis_kwargs):
+
+        self.__db = getAsyncRedis(**redis_kwargs)
+        self.sKey = '%s:%s' %(namespace, name)
+
+        self.sKey2 = None
+
+        if name2:
+
+            self.sKey2 = '%s:%s' %(namespace, name2)
+
+        self.oCodec = codec
+        self.oItems = QueueItems(codec)
+
+        # telemetry; None is resolved on first use (constructors can't await)
+        (self.sStatsKey, self.sEnqueuedKey, self.sWaitsKey) = getTelemetryKeys(self.sKey)
+        self.iWaitSamples = 10000
+        self.bTelemetry = telemetry
+        self.bTelemetryInit = telemetry
+
+        self.bDedup = dedup
+        self.fDedupKey = dedupKey
+        self.sSeenKey = '%s:%s:seen' %(namespace, name)
+
+        self.__dequeued = self.__db.register_script(STATS_DEQUEUE_SCRIPT)
+        self.__dedupPush = self.__db.register_script(DEDUP_PUSH_SCRIPT)
+
+    ###
+    # resolve telemetry on first use: on if asked for, or if the queue's stats counters exist
+    ###
+    async def __telemetry(self):
+
+        if self.bTelemetry is None:
+
+            self.bTelemetry = bool( await self.__db.exists(self.sStatsKey) )
+
+        elif self.bTelemetryInit:
+
+            await self.__db.hsetnx(self.sStatsKey, 'in', 0)
+            await self.__db.hsetnx(self.sStatsKey, 'out', 0)
+            self.bTelemetryInit = False
+
+        return self.bTelemetry
+
+    ###
+    # dedup key of item (and its stored form sData)
+    ###
+    def __dedupKey(self, item, sData):
+
+        return self.fDedupKey(item) if self.fDedupKey else sData
+
+    ###
+    # push (encoded) items onto the queue; returns the number of items pushed
+    ###
+    async def __push(self, lItems, lKeys):
+
+        bTelemetry = await self.__telemetry()
+
+        if self.bDedup:
+
+            lArgs = [ '%.3f' %(time.time()) ]
+
+            for (sKey, sData) in zip(lKeys, lItems):
+
+                lArgs.extend( [sKey, sData] )
+
+            lScriptKeys = [self.sKey, self.sSeenKey]
+
+            if bTelemetry:
+
+                lScriptKeys.extend( [self.sEnqueuedKey, self.sStatsKey] )
+
+            return await self.__dedupPush(keys=lScriptKeys, args=lArgs)
+
+        if not bTelemetry:
+
+            await self.__db.lpush(self.sKey, *lItems)
+            return len(lItems)
+
+        async with self.__db.pipeline(transaction=True) as oPipe:
+
+            oPipe.lpush(self.sKey, *lItems)
+            oPipe.lpush(self.sEnqueuedKey, *( [ '%.3f' %(time.time()) ] * len(lItems) ))
+            oPipe.hincrby(self.sStatsKey, 'in', len(lItems))
+            await oPipe.execute()
+
+        return len(lItems)
+
+    ###
+    # record iCount items leaving the queue if telemetry is on
+    ###
+    async def __recordDequeue(self, iCount):
+
+        if iCount and await self.__telemetry():
+
+            await self.__dequeued(keys=[self.sEnqueuedKey, self.sStatsKey, self.sWaitsKey], args=[iCount, '%.3f' %(time.time()), self.iWaitSamples])
+
+    ###
+    # clear redis queue (and its dedup seen set)
+    ###
+    async def flush(self):
+
+        await self.__db.delete(self.sKey, self.sEnqueuedKey, self.sSeenKey)
+        self.oItems.clear()
+
+    ###
+    # Return the approximate size of the queue.
+    ###
+    async def size(self):
+
+        return await self.__db.llen(self.sKey)
+
+    ###
+    # Return True if the queue is empty, False otherwise.
+    ###
+    async def isEmpty(self):
+
+        return await self.size() == 0
+
+    ###
+    # Peek at head item in queue.
+    ###
+    async def peek(self):
+
+        lItems = await self.__db.lrange(self.sKey, -1, -1)
+
+        return self.oItems.decode(lItems[0]) if lItems else None
+
+    ###
+    # Put item into the queue; returns False if dedup mode skipped it as a duplicate
+    ###
+    async def put(self, item):
+
+        sData = self.oItems.encode(item)
+
+        return await self.__push( [ sData ], [ self.__dedupKey(item, sData) ] ) > 0
+
+    ###
+    # Put items from an iterable into the queue, chunk items per round trip; returns the number of items queued
+    ###
+    async def putMany(self, items, chunk=1000):
+
+        iCount = 0
+        lChunk = []
+        lKeys = []
+
+        for item in items:
+
+            sData = self.oItems.encode(item)
+
+            lChunk.append(sData)
+            lKeys.append( self.__dedupKey(item, sData) )
+
+            if len(lChunk) >= chunk:
+
+                iCount += await self.__push(lChunk, lKeys)
+                lChunk = []
+                lKeys = []
+
+        if lChunk:
+
+            iCount += await self.__push(lChunk, lKeys)
+
+        return iCount
+
+    ###
+    # Remove and return an item from the queue.
+    #
+    # If optional args block is true and timeout is None (the default), wait
+    # until an item is available; only the calling task waits, not the process.
+    ###
+    async def get(self, block=True, timeout=None):
+
+        item = None
+
+        if block:
+
+            tItem = await self.__db.brpop(self.sKey, timeout=timeout if timeout else 0)
+
+            if tItem:
+
+                item = tItem[1]
+
+        else:
+
+            item = await self.__db.rpop(self.sKey)
+
+        if item is not None:
+
+            await self.__recordDequeue(1)
+
+        return self.oItems.decode(item)
+
+    ###
+    # Remove and return an item from the queue, pushing it onto the secondary list.
+    #
+    # If optional args block is true and timeout is None (the default), wait
+    # until an item is available.
+    ###
+    async def getnpush(self, block=True, timeout=None):
+
+        if block:
+
+            item = await self.__db.brpoplpush(self.sKey, self.sKey2, timeout=timeout if timeout else 0)
+
+        else:
+
+            item = await self.__db.rpoplpush(self.sKey, self.sKey2)
+
+        if item is not None:
+
+            await self.__recordDequeue(1)
+
+        return self.oItems.decode(item, bTrack=True)
+
+    ###
+    # Removes item from secondary list when we're done processing
+    ###
+    async def done(self, value, num=0):
+
+        await self.__db.lrem(self.sKey2, num, self.oItems.stored(value))
+
+###
+# Simple Set with asyncio Redis Backend (see redisHelper.RedisSet)
+###
+class AsyncRedisSet(object):
+
+    ###
+    # The default connection parameters are: host='localhost', port=6379, db=0
+    ###
+    def __init__(self, name, namespace='set', **redis_kwargs):
+
+        self.__db = getAsyncRedis(**redis_kwargs)
+        self.sKey = '%s:%s' %(namespace, name)
+
+        # bumped on every change so RedisSet.snapshot() readers see async writes
+        self.sVersionKey = '%s:%s:version' %(namespace, name)
+
+        self.bSmismember = True
+
+    ###
+    # clear redis set
+    ###
+    async def flush(self):
+
+        async with self.__db.pipeline(transaction=False) as oPipe:
+
+            oPipe.delete(self.sKey)
+            oPipe.incr(self.sVersionKey)
+            await oPipe.execute()
+
+    ###
+    # Return the approximate size of the set.
+    ###
+    async def size(self):
+
+        return await self.__db.scard(self.sKey)
+
+    ###
+    # Return True if the set is empty, False otherwise.
+    ###
+    async def isEmpty(self):
+
+        return await self.size() == 0
+
+    ###
+    # variadic SADD and version bump in one round trip
+    ###
+    async def __sadd(self, lItems):
+
+        async with self.__db.pipeline(transaction=False) as oPipe:
+
+            oPipe.sadd(self.sKey, *lItems)
+            oPipe.incr(self.sVersionKey)
+            await oPipe.execute()
+
+    ###
+    # Put item into the set.
+    ###
+    async def put(self, item):
+
+        await self.__sadd( [ item ] )
+
+    ###
+    # Put items from an iterable into the set, chunk items per variadic SADD.
+    # Returns the number of items sent (duplicates included).
+    ###
+    async def putMany(self, items, chunk=1000):
+
+        iCount = 0
+        lChunk = []
+
+        for item in items:
+
+            lChunk.append(item)
+
+            if len(lChunk) >= chunk:
+
+                await self.__sadd(lChunk)
+                iCount += len(lChunk)
+                lChunk = []
+
+        if lChunk:
+
+            await self.__sadd(lChunk)
+            iCount += len(lChunk)
+
+        return iCount
+
+    ###
+    # Remove and return an item from the set.
+    ###
+    async def get(self):
+
+        async with self.__db.pipeline(transaction=False) as oPipe:
+
+            oPipe.spop(self.sKey)
+            oPipe.incr(self.sVersionKey)
+            (item, _) = await oPipe.execute()
+
+        return item
+
+    ###
+    # Return True if item is in the set
+    ###
+    async def contains(self, item):
+
+        return bool( await self.__db.sismember(self.sKey, item) )
+
+    ###
+    # Return a list of booleans, one per item, for membership of items in the set
+    ###
+    async def containsMany(self, items):
+
+        lItems = list(items)
+
+        if not lItems:
+
+            return []
+
+        if self.bSmismember:
+
+            try:
+
+                return [ bool(iMember) for iMember in await self.__db.execute_command('SMISMEMBER', self.sKey, *lItems) ]
+
+            except redis.exceptions.ResponseError as e:
+
+                # unknown command -- older redis server
+                self.bSmismember = False
+
+        async with self.__db.pipeline(transaction=False) as oPipe:
+
+            for item in lItems:
+
+                oPipe.sismember(self.sKey, item)
+
+            return [ bool(iMember) for iMember in await oPipe.execute() ]
@@ -15,6 +15,7 @@ import json
 import multiprocessing
 import os
 import os.path
+import Queue
 import socket
 import subprocess
 import sys
@@ -28,9 +29,15 @@ from locallibs import debug
 from locallibs import printMsg
 from locallibs import warning
 
+from projectDB import closeProjectDBs
+from projectDB import getProjectDB
 from projectDB import MuseProjectDB
+from projectDB import MySQLdb
 
+from redisHelper import QueueCodec
 from redisHelper import RedisQueue
+from redisHelper import RedisPriorityQueue
+from redisHelper import RedisStreamQueue
 from redisHelper import RedisSet
 
 ###################
@@ -96,6 +103,11 @@ from redisHelper import RedisSet
 ###
 lock = None
 
+###
+# local queue from the builder workers to the build status writer process (None: workers write to mysql themselves)
+###
+qBuildStatus = None
+
 ###
 # initializes the locking semaphore
 ###
@@ -103,6 +115,14 @@ def initialize_lock(l):
    global lock
    lock = l
 
+###
+# pool initializer; locking semaphore and the build status writer's queue
+###
+def initialize_worker(l, q):
+   global qBuildStatus
+   initialize_lock(l)
+   qBuildStatus = q
+
 ###
 # producer process; provides build status to mysql and elasticsearch
 ###
@@ -110,8 +130,6 @@ def postBuildStatusUpdates(dArgs, dBuffer, dConfig):
 
     dBuildArgs = {}
 
-    dMp = MuseProjectDB(db=dConfig['mysql-db'],port=dConfig['mysql-port'],user=dConfig['mysql-user'],passwd=dConfig['mysql-passwd'],loc=dConfig['mysql-loc'])
-
     dBuildArgs['projectName'] = dArgs['projectName']
     dBuildArgs['projectPath'] = dArgs['projectPath']
     dBuildArgs['buildTarPath'] = os.path.join( dArgs['buildPath'], dArgs['tarName'] )
@@ -128,14 +146,188 @@ def postBuildStatusUpdates(dArgs, dBuffer, dConfig):
 
     if dConfig['debug']: debug( 'func: postBuildStatusUpdates() build args prepared for mysql ingestion')
 
-    # commit status to database
-    dMp.open()
+    # write-behind: hand the record to the writer process and go on to the next build
+    if qBuildStatus is not None:
+
+        qBuildStatus.put(dBuildArgs)
+        return
+
+    # commit status to database over this process' pooled connection (kept open between builds)
+    dMp = getProjectDB(db=dConfig['mysql-db'],port=dConfig['mysql-port'],user=dConfig['mysql-user'],passwd=dConfig['mysql-passwd'],loc=dConfig['mysql-loc'])
     dMp.insertIntoBuildStatusTargets(dArgs=dBuildArgs, bDebug=dConfig['debug'])
     dMp.insertIntoBuildStatus(dArgs=dBuildArgs, bDebug=dConfig['debug'])
-    dMp.close()
 
     if dConfig['debug']: debug( 'func: postBuildStatusUpdates() build status ingested into mysql')
 
+###
+# append build status records to the writer's spill file (json lines), synced to disk before returning
+###
+def spillBuildStatus(lBuilds, dConfig):
+
+    with open(dConfig['mysql-writer-spill'], 'a') as fSpill:
+
+        for dBuildArgs in lBuilds:
+
+            fSpill.write( json.dumps(dBuildArgs) + '\n' )
+
+        fSpill.flush()
+        os.fsync( fSpill.fileno() )
+
+    warning('func: spillBuildStatus()', len(lBuilds), 'build status records spilled to', dConfig['mysql-writer-spill'])
+
+###
+# write spilled records back to mysql; the spill file is only removed once every batch of them is in.
+# batches mysql didn't take are written back to the spill file (in order) and False is returned
+###
+def replayBuildStatus(dMp, dConfig):
+
+    if not os.path.exists(dConfig['mysql-writer-spill']): return True
+
+    lBuilds = []
+
+    with open(dConfig['mysql-writer-spill']) as fSpill:
+
+        for sLine in fSpill:
+
+            try:
+
+                lBuilds.append( json.loads(sLine) )
+
+            except ValueError as e:
+
+                # a torn last line from a crash mid-spill
+                warning('func: replayBuildStatus() skipping unreadable spilled record:', sLine[:200], e)
+
+    lPending = []
+    bReachable = True
+
+    for iStart in range(0, len(lBuilds), dConfig['mysql-writer-batch-size']):
+
+        lBatch = lBuilds[iStart:iStart + dConfig['mysql-writer-batch-size']]
+
+        if bReachable:
+
+            try:
+
+                if dMp.insertIntoBuildStatusBatch(lBatch, bUpsert=True, bDebug=dConfig['debug']): continue
+
+                bReachable = dMp.ping()
+
+            except MySQLdb.Error as e:
+
+                warning('func: replayBuildStatus() mysql error replaying spilled records:', e)
+                bReachable = False
+
+        lPending += lBatch
+
+    if lPending:
+
+        rewriteBuildStatusSpill(lPending, dConfig)
+
+        warning('func: replayBuildStatus()', len(lBuilds) - len(lPending), 'of', len(lBuilds), 'spilled build status records written to mysql, the rest stay spilled')
+
+        return False
+
+    os.remove(dConfig['mysql-writer-spill'])
+
+    printMsg('func: replayBuildStatus()', len(lBuilds), 'spilled build status records written to mysql')
+
+    return True
+
+###
+# replace the spill file with lBuilds (write a temporary file and rename it over the spill, so a crash leaves one or the other)
+###
+def rewriteBuildStatusSpill(lBuilds, dConfig):
+
+    sTmpSpill = dConfig['mysql-writer-spill'] + '.tmp'
+
+    with open(sTmpSpill, 'w') as fSpill:
+
+        for dBuildArgs in lBuilds:
+
+            fSpill.write( json.dumps(dBuildArgs) + '\n' )
+
+        fSpill.flush()
+        os.fsync( fSpill.fileno() )
+
+    os.rename(sTmpSpill, dConfig['mysql-writer-spill'])
+
+###
+# write one batch of build status records; a batch mysql doesn't fully take (unreachable, a mysql error, a failed row,
+# or spilled records still pending) is spilled. records are upserted so a batch that partially made it in can safely be written again
+###
+def flushBuildStatus(lBuilds, dConfig):
+
+    try:
+
+        dMp = getProjectDB(db=dConfig['mysql-db'],port=dConfig['mysql-port'],user=dConfig['mysql-user'],passwd=dConfig['mysql-passwd'],loc=dConfig['mysql-loc'])
+
+        if dMp.ready() and replayBuildStatus(dMp, dConfig):
+
+            if not lBuilds: return
+
+            if dMp.insertIntoBuildStatusBatch(lBuilds, bUpsert=True, bDebug=dConfig['debug']):
+
+                if dConfig['debug']: debug('func: flushBuildStatus()', len(lBuilds), 'build status records written to mysql')
+                return
+
+    except MySQLdb.Error as e:
+
+        warning('func: flushBuildStatus() mysql error writing build status records:', e)
+
+    if lBuilds: spillBuildStatus(lBuilds, dConfig)
+
+###
+# build status writer process (write-behind); batches the records the builder workers put on qStatus into mysql
+# every mysql-writer-batch-size records or mysql-writer-interval seconds, spilling to disk while mysql is unreachable.
+# exits after flushing once it reads the None sentinel
+###
+def writeBuildStatus(qStatus, dConfig):
+
+    try:
+
+        lBuilds = []
+        fLastFlush = time.time()
+        bDone = False
+
+        while not bDone:
+
+            try:
+
+                dBuildArgs = qStatus.get(True, max(0.1, dConfig['mysql-writer-interval'] - (time.time() - fLastFlush)))
+
+                if dBuildArgs is None: bDone = True
+                else: lBuilds.append(dBuildArgs)
+
+            except Queue.Empty:
+
+                pass
+
+            if bDone or len(lBuilds) >= dConfig['mysql-writer-batch-size'] or time.time() - fLastFlush >= dConfig['mysql-writer-interval']:
+
+                try:
+
+                    flushBuildStatus(lBuilds, dConfig)
+
+                except Exception as e:
+
+                    # keep the writer (and the records it holds) alive; anything flushBuildStatus() didn't handle goes to disk
+                    warning('func: writeBuildStatus() unable to flush build status records:', e)
+                    traceback.print_exc()
+
+                    if lBuilds: spillBuildStatus(lBuilds, dConfig)
+
+                lBuilds = []
+                fLastFlush = time.time()
+
+        closeProjectDBs()
+
+    except Exception as e:
+
+        warning('Caught exception in build status writer')
+        traceback.print_exc()
+        raise e
+
 ###
 def isInt(s):
 
@@ -674,6 +866,23 @@ def recordProjectName(dArgs, bDebug=False):
 
     os.system(sCmd)
 
+###
+# returns the to-build queue builders lease projects from (the priority queue filled by queueProjectsToBuildByType.py --queue-priority with --priority-queue,
+# the stream filled by queueProjectsToBuildByType.py --queue-stream with --stream-queue; sConsumer names this builder in the stream's consumer group)
+# projects are decoded to dicts whatever --queue-codec they were queued with
+###
+def getToBuildQueue(dConfig, sConsumer=None):
+
+    if dConfig['stream-queue']:
+
+        return RedisStreamQueue(name=dConfig['redis-stream-to-build'], group=dConfig['redis-stream-group'], consumer=sConsumer, leaseTimeout=dConfig['redis-lease-timeout'], maxReaps=dConfig['redis-lease-max-reaps'], codec=QueueCodec(), host=dConfig['redis-loc'], port=dConfig['redis-port'])
+
+    if dConfig['priority-queue']:
+
+        return RedisPriorityQueue(name=dConfig['redis-queue-to-build-priority'], namespace='queue', leaseTimeout=dConfig['redis-lease-timeout'], maxReaps=dConfig['redis-lease-max-reaps'], codec=QueueCodec(), host=dConfig['redis-loc'], port=dConfig['redis-port'])
+
+    return RedisQueue(name=dConfig['redis-queue-to-build'], namespace='queue', leaseTimeout=dConfig['redis-lease-timeout'], maxReaps=dConfig['redis-lease-max-reaps'], codec=QueueCodec(), host=dConfig['redis-loc'], port=dConfig['redis-port'])
+
 ###
 # process build targets (type-specific) in redis queue
 ###
@@ -683,8 +892,8 @@ def processBuildTargets(tTup):
 
         (iContainerId, dArgs, dConfig) = tTup
 
-        # dual queues -- primary for getting what project to build next, secondary to mark what is being built
-        qRedis = RedisQueue(name=dConfig['redis-queue-to-build'], name2=dConfig['redis-queue-building'], namespace='queue', host=dConfig['redis-loc'], port=dConfig['redis-port'])
+        # leased queue -- projects being built are leased out and put back in the queue if their builder stops heartbeating
+        qRedis = getToBuildQueue(dConfig, dConfig['hostname'] + '_' + str(iContainerId))
 
         # set of existing builds for this os container used to prune out projects already built with this container
         sExistingBuilds = RedisSet(name=dConfig['redis-already-built-nate'], namespace='set', host=dConfig['redis-loc'], port=dConfig['redis-port'])
@@ -694,24 +903,29 @@ def processBuildTargets(tTup):
 
         while 1:
 
-            sBuildTarget = qRedis.getnpush(block=True, timeout=30)
-            #sBuildTarget = qRedis.peek()
+            # return projects abandoned by crashed builders (on any host) to the queue before claiming the next one
+            qRedis.reapLeases()
 
-            # debug(sBuildTarget)
+            tLease = qRedis.getLease(block=True, timeout=30)
+            #dBuildTarget = qRedis.peek()
 
-            if sBuildTarget:
+            # debug(dBuildTarget)
 
-                if dConfig['debug']: debug('func: processBuildTargets() sBuildTarget:', sBuildTarget)
+            if tLease:
 
-                dBuildTarget = json.loads(sBuildTarget)
+                (dBuildTarget, sLease) = tLease
+
+                if dConfig['debug']: debug('func: processBuildTargets() dBuildTarget:', json.dumps(dBuildTarget))
 
                 # initial setup
 
                 dArgs['projectName'] = dBuildTarget['projectName']
 
-                if dArgs['projectName'] in sExistingBuilds:
+                # check against a local copy of the set, refreshed from redis at most every redis-snapshot-max-age seconds
+                if dArgs['projectName'] in sExistingBuilds.snapshot(maxAge=dConfig['redis-snapshot-max-age']):
 
                     warning('func: processBuildTargets() project:', dArgs['projectName'], ' already built... skipping...')
+                    qRedis.ack(sLease)
                     continue
 
                 #sProjectPath = os.path.relpath(dBuildTarget['projectPath'], '/data/corpus')
@@ -787,6 +1001,12 @@ def processBuildTargets(tTup):
                 while pollBuild(dArgs=dArgs, bDebug=dConfig['debug']):
 
                     if dConfig['debug']: debug( 'func: processBuildTargets() build not completed... sleeping')
+
+                    # keep our lease on the project alive while it builds
+                    if not qRedis.heartbeat(sLease):
+
+                        warning('func: processBuildTargets() lease expired for project:', dArgs['projectName'], 'it may be rebuilt by another builder')
+
                     time.sleep(10)
 
                 # get container logs
@@ -804,8 +1024,8 @@ def processBuildTargets(tTup):
                 # remove container
                 removeContainer(dArgs=dArgs, bDebug=dConfig['debug'])
 
-                # remove project from "building" queue
-                # qRedis.done(value=sBuildTarget)
+                # release lease on project
+                qRedis.ack(sLease)
 
                 iCtr += 1
 
@@ -819,10 +1039,13 @@ def processBuildTargets(tTup):
 
         if dConfig['debug']: 
 
-            debug( 'func: processBuildTargets() sBuildTarget is either empty or none, likely since the redis queue is empty')
+            debug( 'func: processBuildTargets() dBuildTarget is either empty or none, likely since the redis queue is empty')
             debug( 'func: processBuildTargets() redis queue size:', qRedis.size())
             debug( 'func: processBuildTargets() exiting...')
 
+        # release this worker's pooled mysql connection
+        closeProjectDBs()
+
     except Exception as e:
 
         warning('Caught exception in worker thread:', iContainerId)
@@ -853,7 +1076,7 @@ def loadExistingBuilds(dConfig, sOS):
 ###
 def usage():
 
-    warning('Usage: buildProjectsByType.py --queue-projects=\"configure.ac\" --os=\"ubuntu14" --rebuild --debug')
+    warning('Usage: buildProjectsByType.py --queue-projects=\"configure.ac\" --os=\"ubuntu14" --priority-queue --stream-queue --rebuild --write-through --debug')
 
 ###
 def main(argv):
@@ -889,12 +1112,30 @@ def main(argv):
     dConfig['mysql-port'] = 54321 
     dConfig['mysql'] = True
 
+    # write-behind build status writer (see writeBuildStatus())
+    dConfig['mysql-write-behind'] = True
+    dConfig['mysql-writer-batch-size'] = 50
+    dConfig['mysql-writer-interval'] = 10
+    dConfig['mysql-writer-spill'] = os.path.join( dConfig['containerPath'], 'buildStatus-spill-' + dConfig['hostname'] + '.json' )
+
+    dConfig['priority-queue'] = False
+
     dConfig['rebuild'] = False
 
+    dConfig['stream-queue'] = False
+
     dConfig['redis-already-built'] = 'muse-already-built-'
     dConfig['redis-already-built-nate'] = 'NEWbuiltProjects'
     dConfig['redis-queue-to-build'] = 'muse-to-build'
+    dConfig['redis-queue-to-build-priority'] = 'muse-to-build-priority'
     dConfig['redis-queue-building'] = 'muse-building'
+    dConfig['redis-stream-to-build'] = 'muse-to-build'
+    dConfig['redis-stream-group'] = 'muse-builders'
+    dConfig['redis-lease-timeout'] = 600
+
+    # a project whose lease expires this many times (its builds keep crashing the builder) is dead-lettered instead of re-queued
+    dConfig['redis-lease-max-reaps'] = 3
+    dConfig['redis-snapshot-max-age'] = 60
     dConfig['redis-loc'] = 'muse2-int'
     # dConfig['redis-port'] = '6379'
     dConfig['redis-port'] = '12345'
@@ -961,7 +1202,7 @@ def main(argv):
     lSupportedOSs = ['fedora20', 'fedora21', 'ubuntu12', 'ubuntu14']
 
     ### command line argument handling
-    options, remainder = getopt.getopt(sys.argv[1:], 'f:o:rd', ['forks=','os=','rebuild','debug'])
+    options, remainder = getopt.getopt(sys.argv[1:], 'f:o:prsd', ['forks=','os=','priority-queue','rebuild','stream-queue','write-through','debug'])
 
     # debug('func: main()', 'options:', options)
     # debug('func: main()', 'remainder:', remainder)
@@ -989,9 +1230,22 @@ def main(argv):
 
                 bError = True
        
+        elif opt in ('-p', '--priority-queue'):
+
+            dConfig['priority-queue'] = True
+
         elif opt in ('-r', '--rebuild'):
 
             dConfig['rebuild'] = True
+
+        elif opt in ('-s', '--stream-queue'):
+
+            dConfig['stream-queue'] = True
+
+        elif opt == '--write-through':
+
+            # every builder writes its build status to mysql itself, no writer process
+            dConfig['mysql-write-behind'] = False
        
         elif opt in ('-d', '--debug'):
 
@@ -1002,14 +1256,10 @@ def main(argv):
     if bError: usage()
     else:
 
-        '''
-        # pre-initialization -- if projects remained in building queue, put them back in queue-to-build
-        qToBuildRedis = RedisQueue(name=dConfig['redis-queue-building'], name2=dConfig['redis-queue-to-build'], namespace='queue', host=dConfig['redis-loc'], port=dConfig['redis-port'])
-
-        for iCtr in range(0, len(qToBuildRedis)):
+        # pre-initialization -- if leases on projects have expired (builders that crashed or were restarted), put them back in queue-to-build
+        qToBuildRedis = getToBuildQueue(dConfig)
 
-            qToBuildRedis.getnpush()
-        '''
+        debug('func: main()', qToBuildRedis.reapLeases(), 'expired project leases returned to', qToBuildRedis.sKey)
 
         dConfig['redis-already-built'] = dConfig['redis-already-built'] + dArgs['containerOS']
 
@@ -1033,16 +1283,36 @@ def main(argv):
 
             lConsumerArgs.append( (iCtr, dArgs, dConfig) )
 
+        # build status writer; the workers hand it their build status records over a local queue
+        qStatus = None
+        oWriter = None
+
+        if dConfig['mysql-write-behind']:
+
+            qStatus = multiprocessing.Queue()
+            oWriter = multiprocessing.Process( target=writeBuildStatus, args=(qStatus, dConfig) )
+            oWriter.start()
+
         # create pool of workers -- number of workers equals the number of search strings to be processed
-        oConsumerPool = multiprocessing.Pool( processes=dConfig['forks'], initializer=initialize_lock, initargs=(lock,) )
+        oConsumerPool = multiprocessing.Pool( processes=dConfig['forks'], initializer=initialize_worker, initargs=(lock, qStatus) )
 
         ### do work -- use pool of workers to search for each search string in muse-corpus-source es index
         print(lConsumerArgs)
  
-        oConsumerPool.map(processBuildTargets, lConsumerArgs)
+        try:
+
+            oConsumerPool.map(processBuildTargets, lConsumerArgs)
+
+            oConsumerPool.close()
+            oConsumerPool.join()
 
-        oConsumerPool.close()
-        oConsumerPool.join()
+        finally:
+
+            if oWriter:
+
+                # flush whatever the writer still holds, then let it exit (also when the pool fails, or the writer would block exit)
+                qStatus.put(None)
+                oWriter.join()
         
         # processBuildTargets( (0, dArgs, dConfig) ) 
 
@@ -1052,6 +1322,10 @@ def main(argv):
 
         printMsg('func: main()', 'execution time:', (iEnd - iStart), 'seconds')
 
+        if dConfig['stream-queue']:
+
+            printMsg('func: main()', 'builds per consumer:', json.dumps(qToBuildRedis.throughput(), indent=4, sort_keys=True))
+
 ###
 if __name__ == "__main__":
     main(sys.argv[1:])
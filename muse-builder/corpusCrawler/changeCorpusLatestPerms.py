@@ -29,6 +29,8 @@ from locallibs import warning
 
 from redisHelper import RedisQueue
 
+from corpusManifest import projectRoots
+
 ###################
 ### check to see if elasticsearch is running
 # curl http://38.100.20.212:9200
@@ -150,29 +152,23 @@ def findProjects(sCorpusPath, iForks, dConfig):
 
     iCount = 0
 
-    for sRoot, lDirs, lFiles in os.walk(sCorpusPath):
-
-        iLevel = sRoot.count(os.sep)
-
-        if iLevel >= 11:
-
-            del lDirs[:]
+    # read from the manifest if there is one (see corpusManifest.py), otherwise shards of the corpus are walked in
+    # parallel (see corpusWalker.py) and roots come back as each shard finishes
+    for sRoot in projectRoots(sCorpusPath, sManifest=dConfig['manifest'], iForks=dConfig['walker-forks'], bDebug=dConfig['debug']):
 
-        if iLevel == 11:
+        if dConfig['debug']: debug('func: findProjects()', 'projects-root:', sRoot)
 
-            if dConfig['debug']: debug('func: findProjects()', 'projects-root:', sRoot, iLevel)
-
-            if dConfig['redis']:
-            
-                qRedis.put(sRoot)
-            
-            else:
+        if dConfig['redis']:
+        
+            qRedis.put(sRoot)
+        
+        else:
 
-                lProjectPaths.append(sRoot)
-            
-            iCount += 1
+            lProjectPaths.append(sRoot)
+        
+        iCount += 1
 
-            if dConfig['debug'] and iCount >= 1: break
+        if dConfig['debug'] and iCount >= 1: break
 
     printMsg('func: findProjects()', str(iCount), 'projects loaded into queue for processing')
 
@@ -180,7 +176,7 @@ def findProjects(sCorpusPath, iForks, dConfig):
 
 ###
 def usage():
-    warning('Usage: changeCorpusLatestPerms.py --corpus-dir-path=/data/corpus --forks=5 --redis --debug')
+    warning('Usage: changeCorpusLatestPerms.py --corpus-dir-path=/data/corpus --forks=5 --walker-forks=16 --manifest=/data/crawl/corpus.manifest --redis --debug')
     warning('Usage: Please note that above directory arguments are defaults if not supplied and both directories must exist on the filesystem.')
     warning('Usage: if mode is supplied, it must be either set to thread or process. thread is the default.')
 
@@ -196,13 +192,19 @@ def main(argv):
     dConfig['redis-loc'] = '38.100.20.212'
     dConfig['redis'] = False
 
+    # processes walking the corpus for project roots
+    dConfig['walker-forks'] = 16
+
+    # project-root manifest read instead of walking the corpus (see corpusManifest.py)
+    dConfig['manifest'] = None
+
     dConfig['time-stamp'] = datetime.datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
 
     iForks = 10
     bError = False
 
     ### command line argument handling
-    options, remainder = getopt.getopt(sys.argv[1:], 'c:f:rd', ['corpus-dir-path=','forks=','redis','debug'])
+    options, remainder = getopt.getopt(sys.argv[1:], 'c:f:w:m:rd', ['corpus-dir-path=','forks=','walker-forks=','manifest=','redis','debug'])
 
     # debug('func: main()', 'options:', options)
     # debug('func: main()', 'remainder:', remainder)
@@ -231,6 +233,25 @@ def main(argv):
 
                 bError = True
 
+        elif opt in ('-w', '--walker-forks'):
+
+            try:
+            
+                dConfig['walker-forks'] = int(arg)
+
+            except ValueError as e:
+
+                bError = True
+
+        elif opt in ('-m', '--manifest'):
+
+            dConfig['manifest'] = arg
+
+    if dConfig['manifest'] and not os.path.isfile(dConfig['manifest']):
+
+        warning('func: main() manifest does not exist:', dConfig['manifest'])
+        bError = True
+
     if not os.path.isdir(sCorpusPath):
 
         bError = True
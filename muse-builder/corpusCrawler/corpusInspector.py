@@ -30,6 +30,8 @@ from locallibs import warning
 
 from redisHelper import RedisQueue
 
+from corpusManifest import projectRoots
+
 
 counter=0
 ###################
@@ -254,29 +256,31 @@ def findProjects(qRedis, sCorpusPath, dConfig):
 
     iCount = 0
 
-    for sRoot, lDirs, lFiles in os.walk(sCorpusPath):
-
-        iLevel = sRoot.count(os.sep)
-
-        if iLevel >= 11:
+    # read from the manifest if there is one (see corpusManifest.py), otherwise shards of the corpus are walked in
+    # parallel (see corpusWalker.py) and roots come back as each shard finishes
+    for sRoot in projectRoots(sCorpusPath, sManifest=dConfig['manifest'], iForks=dConfig['walker-forks'], bDebug=dConfig['debug']):
 
-            del lDirs[:]
+        if "github" not in sRoot:
 
-        if iLevel == 11 and "github" not in sRoot:
+            if dConfig['debug']: debug('func: findProjects()', 'projects-root:', sRoot)
 
-            if dConfig['debug']: debug('func: findProjects()', 'projects-root:', sRoot, iLevel)
+            lProjectPaths.append(sRoot)
 
-            if dConfig['redis']:
-                qRedis.put(sRoot)
+            # push roots in chunks so consumers can start while the walk continues
+            if dConfig['redis'] and len(lProjectPaths) >= dConfig['redis-bulk-chunk-size']:
 
-            else:
-
-                lProjectPaths.append(sRoot)
+                qRedis.putMany(lProjectPaths, chunk=dConfig['redis-bulk-chunk-size'])
+                lProjectPaths = []
 
             iCount += 1
 
             if dConfig['debug'] and iCount >= 10: break
 
+    if dConfig['redis']:
+
+        qRedis.putMany(lProjectPaths, chunk=dConfig['redis-bulk-chunk-size'])
+        lProjectPaths = []
+
     printMsg('func: findProjects()', str(iCount), 'projects loaded into queue for processing')
 
     return lProjectPaths
@@ -357,7 +361,7 @@ def turnReplicationOn(oES, dConfig):
 
 ###
 def usage():
-    warning('Usage: corpusInspector.py --corpus-dir-path=/data/corpus --forks=5 --redis --debug')
+    warning('Usage: corpusInspector.py --corpus-dir-path=/data/corpus --forks=5 --walker-forks=16 --manifest=/data/crawl/corpus.manifest --redis --debug')
     warning('Usage: Please note that above directory arguments are defaults if not supplied and both directories must exist on the filesystem.')
     warning('Usage: if mode is supplied, it must be either set to thread or process. thread is the default.')
 
@@ -382,6 +386,13 @@ def main(argv):
     dConfig['redis-loc'] = 'muse2-int'
     dConfig['redis-port'] = '12345'
     dConfig['redis'] = False
+    dConfig['redis-bulk-chunk-size'] = 1000
+
+    # processes walking the corpus for project roots
+    dConfig['walker-forks'] = 16
+
+    # project-root manifest read instead of walking the corpus (see corpusManifest.py)
+    dConfig['manifest'] = None
 
     dConfig['time-stamp'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
@@ -389,7 +400,7 @@ def main(argv):
     bError = False
 
     ### command line argument handling
-    options, remainder = getopt.getopt(sys.argv[1:], 'c:f:rd', ['corpus-dir-path=','forks=','redis','debug'])
+    options, remainder = getopt.getopt(sys.argv[1:], 'c:f:w:m:rd', ['corpus-dir-path=','forks=','walker-forks=','manifest=','redis','debug'])
 
     # debug('func: main()', 'options:', options)
     # debug('func: main()', 'remainder:', remainder)
@@ -418,6 +429,25 @@ def main(argv):
 
                 bError = True
 
+        elif opt in ('-w', '--walker-forks'):
+
+            try:
+
+                dConfig['walker-forks'] = int(arg)
+
+            except ValueError as e:
+
+                bError = True
+
+        elif opt in ('-m', '--manifest'):
+
+            dConfig['manifest'] = arg
+
+    if dConfig['manifest'] and not os.path.isfile(dConfig['manifest']):
+
+        warning('func: main() manifest does not exist:', dConfig['manifest'])
+        bError = True
+
     if not os.path.isdir(sCorpusPath):
 
         bError = True
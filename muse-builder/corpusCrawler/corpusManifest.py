@@ -0,0 +1,423 @@
+#!/usr/bin/python
+##
+## Copyright (c) 2014-2017 Leidos.
+##
+## License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+##
+##
+## Developed under contract #FA8750-14-C-0241
+##
+
+# corpusManifest.py -- persistent, incrementally refreshed list of the corpus' project roots
+#
+# The manifest is a plain text file with one project root per line in sorted order, so the roots of any corpus
+# directory (or shard) are one contiguous run of lines that manifestRange() finds by binary search over an mmap of
+# the file, and shell scripts can read it as is. Next to it, <manifest>.dirs lists (in the same sorted form) every
+# directory the walk went through above the project roots, including the ones with no project below them, and
+# <manifest>.shards (json) keeps per shard (the corpus split at its first hex levels, see corpusWalker.py) the number of
+# roots, the newest directory mtime and a digest of the mtimes of the shard's directories in <manifest>.dirs.
+#
+# Adding or removing a directory changes the mtime of its parent, so a refresh only stats the directories in
+# <manifest>.dirs and walks again just the shards whose digest no longer matches.
+
+from __future__ import print_function
+
+import getopt
+import hashlib
+import json
+import mmap
+import multiprocessing
+import os
+import os.path
+import sys
+import time
+
+from locallibs import debug
+from locallibs import printMsg
+from locallibs import warning
+
+from corpusWalker import findProjectRoots
+from corpusWalker import iProjectLevel
+from corpusWalker import shardPaths
+from corpusWalker import walkShard
+
+###
+# manifest lines are bytes on disk; paths are str (the same thing on python 2)
+###
+def toBytes(sPath):
+
+    if isinstance(sPath, bytes): return sPath
+
+    return sPath.encode('utf-8', 'surrogateescape')
+
+###
+def fromBytes(sLine):
+
+    if isinstance(sLine, str): return sLine
+
+    return sLine.decode('utf-8', 'surrogateescape')
+
+###
+# offset of the first line in oMap that sorts >= sKey (lines are newline terminated)
+###
+def bisectManifest(oMap, sKey):
+
+    iLow = 0
+    iHigh = len(oMap)
+
+    while iLow < iHigh:
+
+        iStart = oMap.rfind(b'\n', 0, (iLow + iHigh) // 2) + 1
+        iEnd = oMap.find(b'\n', iStart)
+
+        if iEnd < 0: iEnd = len(oMap)
+
+        if oMap[iStart:iEnd] < sKey: iLow = iEnd + 1
+        else: iHigh = iStart
+
+    return iLow
+
+###
+# generator of the manifest's project roots below sCorpusPath (all of them with None), read through an mmap
+###
+def manifestRange(sManifest, sCorpusPath=None):
+
+    if not os.path.getsize(sManifest): return
+
+    with open(sManifest, 'rb') as fManifest:
+
+        oMap = mmap.mmap(fManifest.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+
+            sPrefix = b''
+
+            if sCorpusPath: sPrefix = toBytes( os.path.normpath(sCorpusPath) + os.sep )
+
+            iPos = bisectManifest(oMap, sPrefix)
+
+            while iPos < len(oMap):
+
+                iEnd = oMap.find(b'\n', iPos)
+
+                if iEnd < 0: iEnd = len(oMap)
+
+                sLine = oMap[iPos:iEnd]
+
+                if not sLine.startswith(sPrefix): break
+
+                if sLine: yield fromBytes(sLine)
+
+                iPos = iEnd + 1
+
+        finally:
+
+            oMap.close()
+
+###
+# project roots below sCorpusPath, from sManifest if one is given, otherwise by walking the corpus
+###
+def projectRoots(sCorpusPath, sManifest=None, iForks=16, bDebug=False):
+
+    if sManifest:
+
+        if bDebug: debug('func: projectRoots() reading project roots below', sCorpusPath, 'from manifest', sManifest)
+
+        return manifestRange(sManifest, sCorpusPath)
+
+    return findProjectRoots(sCorpusPath, iForks=iForks, bDebug=bDebug)
+
+###
+# sShard and lDirs (the shard's directories above its project roots), each with its mtime (None if it's gone)
+# dMtimes: mtimes already taken while walking the shard, anything else is stat'ed
+###
+def shardMtimes(sShard, lDirs, dMtimes=None):
+
+    dDirs = dict.fromkeys( [sShard] + list(lDirs) )
+
+    for sDir in dDirs:
+
+        if dMtimes and sDir in dMtimes:
+
+            dDirs[sDir] = dMtimes[sDir]
+
+        else:
+
+            try:
+
+                dDirs[sDir] = os.stat(sDir).st_mtime
+
+            except OSError as e:
+
+                pass
+
+    return dDirs
+
+###
+# .shards entry for a shard: number of roots, newest directory mtime and the digest refreshes compare against
+###
+def shardEntry(lRoots, dDirs):
+
+    oDigest = hashlib.sha1()
+
+    for sDir in sorted(dDirs.keys()):
+
+        oDigest.update( toBytes( sDir + '\t' + ('%.6f' % dDirs[sDir] if dDirs[sDir] is not None else '-') + '\n' ) )
+
+    return {'roots': len(lRoots), 'mtime': max( [fMtime for fMtime in dDirs.values() if fMtime is not None] or [0] ), 'digest': oDigest.hexdigest()}
+
+###
+# pool worker: (sShard, lRoots, lDirs, dEntry) with lRoots and lDirs None when the shard hasn't changed since dOld was
+# recorded. tArgs is (sShard, iLevel, sManifest, dOld) for Pool.imap; sManifest/dOld None (re)walk the shard unconditionally
+###
+def refreshShard(tArgs):
+
+    (sShard, iLevel, sManifest, dOld) = tArgs
+
+    if dOld and sManifest:
+
+        dDirs = shardMtimes( sShard, manifestRange(sManifest + '.dirs', sShard) )
+
+        if shardEntry([], dDirs)['digest'] == dOld['digest']: return (sShard, None, None, dOld)
+
+    dMtimes = {}
+
+    lRoots = walkShard( (sShard, iLevel), dMtimes=dMtimes )
+
+    # every directory listed on the way down, so a project added under one without projects yet is noticed
+    lDirs = sorted( [sDir for sDir in dMtimes if sDir != sShard] )
+
+    return ( sShard, lRoots, lDirs, shardEntry( lRoots, shardMtimes(sShard, lDirs, dMtimes=dMtimes) ) )
+
+###
+# writes sPath through a temporary file renamed into place, so readers see either the old or the new contents
+###
+def replaceFile(sPath, fnWrite):
+
+    sTmpPath = sPath + '.tmp'
+
+    with open(sTmpPath, 'wb') as fOut:
+
+        fnWrite(fOut)
+
+        fOut.flush()
+        os.fsync( fOut.fileno() )
+
+    os.rename(sTmpPath, sPath)
+
+###
+def readShards(sManifest):
+
+    sShardsPath = sManifest + '.shards'
+
+    if not os.path.exists(sManifest) or not os.path.exists(sShardsPath): return None
+
+    try:
+
+        with open(sShardsPath) as fShards:
+
+            return json.load(fShards)
+
+    except ValueError as e:
+
+        warning('func: readShards() unreadable shard file, rebuilding the manifest:', sShardsPath, e)
+
+    return None
+
+###
+# builds sManifest for lCorpusPaths or brings it up to date, re-walking only the shards that changed (all of them with
+# bFull or when there's no manifest yet). lCorpusPaths None refreshes the corpus directories the manifest was built for
+# returns the .shards contents
+###
+def refreshManifest(sManifest, lCorpusPaths=None, iForks=16, iShardDepth=2, iLevel=iProjectLevel, bFull=False, bDebug=False):
+
+    fStart = time.time()
+
+    dOld = readShards(sManifest)
+
+    if dOld and (dOld['level'] != iLevel or dOld['shard-depth'] != iShardDepth):
+
+        warning('func: refreshManifest() manifest was built with a different level / shard depth, rebuilding:', sManifest)
+        dOld = None
+
+    if not lCorpusPaths:
+
+        if not dOld:
+
+            warning('func: refreshManifest() no corpus directories given and no manifest to refresh:', sManifest)
+            return None
+
+        lCorpusPaths = dOld['corpus-dir-paths']
+
+    lCorpusPaths = sorted( set( [os.path.normpath(sCorpusPath) for sCorpusPath in lCorpusPaths] ) )
+
+    dOldShards = {}
+
+    # manifests from before <manifest>.dirs are walked in full once
+    if dOld and not bFull and os.path.exists(sManifest + '.dirs'): dOldShards = dOld['shards']
+
+    # new shards are walked, shards that are gone are dropped
+    lShards = []
+
+    for sCorpusPath in lCorpusPaths:
+
+        lShards += shardPaths(sCorpusPath, iShardDepth=iShardDepth, iLevel=iLevel)
+
+    # sorting on shard + os.sep keeps the concatenated roots sorted
+    lShards = sorted( set(lShards), key=lambda sShard: sShard + os.sep )
+
+    sOldManifest = sManifest if dOldShards else None
+
+    lArgs = [(sShard, iLevel, sOldManifest, dOldShards.get(sShard)) for sShard in lShards]
+
+    dNew = {'corpus-dir-paths': lCorpusPaths, 'level': iLevel, 'shard-depth': iShardDepth, 'shards': {}}
+
+    dCounts = {'walked': 0, 'roots': 0, 'delta': 0}
+
+    def writeManifest(fOut, fDirs):
+
+        oPool = multiprocessing.Pool( processes=max(1, min(iForks, len(lArgs))) )
+
+        try:
+
+            # in order, so the manifest is written as the shards come back
+            for (sShard, lRoots, lDirs, dEntry) in oPool.imap(refreshShard, lArgs):
+
+                if lRoots is None:
+
+                    lRoots = manifestRange(sOldManifest, sShard)
+                    lDirs = manifestRange(sOldManifest + '.dirs', sShard)
+
+                else:
+
+                    dCounts['walked'] += 1
+                    dCounts['delta'] += dEntry['roots'] - dOldShards.get(sShard, {'roots': 0})['roots']
+
+                    if bDebug: debug('func: refreshManifest() walked shard:', sShard, dEntry['roots'], 'roots')
+
+                for sRoot in lRoots:
+
+                    fOut.write( toBytes(sRoot) + b'\n' )
+
+                for sDir in lDirs:
+
+                    fDirs.write( toBytes(sDir) + b'\n' )
+
+                dNew['shards'][sShard] = dEntry
+                dCounts['roots'] += dEntry['roots']
+
+            oPool.close()
+
+        finally:
+
+            oPool.terminate()
+            oPool.join()
+
+    replaceFile( sManifest, lambda fOut: replaceFile( sManifest + '.dirs', lambda fDirs: writeManifest(fOut, fDirs) ) )
+
+    dNew['updated'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+
+    replaceFile( sManifest + '.shards', lambda fOut: fOut.write( toBytes( json.dumps(dNew, indent=1, sort_keys=True) ) ) )
+
+    printMsg('func: refreshManifest()', sManifest + ':', dCounts['roots'], 'project roots,', dCounts['walked'], 'of', len(lShards), 'shards walked,', ('%+d' % dCounts['delta']) if dOldShards else 'built', 'in', '%.1f' % (time.time() - fStart), 'seconds')
+
+    return dNew
+
+###
+def isInt(s):
+
+    try:
+
+        int(s)
+        return True
+
+    except ValueError:
+
+        return False
+
+###
+def usage():
+    warning('Usage: corpusManifest.py --manifest=/data/crawl/corpus.manifest --corpus-dir-path=/data/corpus_0to7 --corpus-dir-path=/data/corpus_8tof --forks=16 --full --list --debug')
+    warning('Usage: builds the manifest or refreshes it (only walking the shards that changed); --full walks every shard, --list prints the roots (below --corpus-dir-path if given) instead.')
+
+###
+def main(argv):
+
+    # defaults
+    bError = False
+
+    dConfig = {}
+
+    dConfig['debug'] = False
+    dConfig['manifest'] = None
+    dConfig['corpus-dir-paths'] = []
+    dConfig['forks'] = 16
+    dConfig['shard-depth'] = 2
+    dConfig['level'] = iProjectLevel
+    dConfig['full'] = False
+    dConfig['list'] = False
+
+    ### command line argument handling
+    options, remainder = getopt.getopt(sys.argv[1:], 'm:c:f:s:l:ad', ['manifest=','corpus-dir-path=','forks=','shard-depth=','level=','full','list','debug'])
+
+    for opt, arg in options:
+
+        if opt in ('-m', '--manifest'):
+
+            dConfig['manifest'] = arg
+
+        elif opt in ('-c', '--corpus-dir-path'):
+
+            dConfig['corpus-dir-paths'].append(arg)
+
+        elif opt in ('-f', '--forks'):
+
+            if isInt(arg): dConfig['forks'] = int(arg)
+            else: bError = True
+
+        elif opt in ('-s', '--shard-depth'):
+
+            if isInt(arg): dConfig['shard-depth'] = int(arg)
+            else: bError = True
+
+        elif opt in ('-l', '--level'):
+
+            if isInt(arg): dConfig['level'] = int(arg)
+            else: bError = True
+
+        elif opt in ('-a', '--full'):
+
+            dConfig['full'] = True
+
+        elif opt == '--list':
+
+            dConfig['list'] = True
+
+        elif opt in ('-d', '--debug'):
+
+            dConfig['debug'] = True
+
+    if not dConfig['manifest']: bError = True
+
+    for sCorpusPath in dConfig['corpus-dir-paths']:
+
+        if not dConfig['list'] and not os.path.isdir(sCorpusPath):
+
+            warning('func: main() corpus directory does not exist:', sCorpusPath)
+            bError = True
+
+    if bError: usage()
+    elif dConfig['list']:
+
+        for sCorpusPath in (dConfig['corpus-dir-paths'] or [None]):
+
+            for sRoot in manifestRange(dConfig['manifest'], sCorpusPath):
+
+                print(sRoot)
+
+    else:
+
+        refreshManifest(dConfig['manifest'], lCorpusPaths=dConfig['corpus-dir-paths'], iForks=dConfig['forks'], iShardDepth=dConfig['shard-depth'], iLevel=dConfig['level'], bFull=dConfig['full'], bDebug=dConfig['debug'])
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,301 @@
+#!/usr/bin/python
+##
+## Copyright (c) 2014-2017 Leidos.
+##
+## License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+##
+##
+## Developed under contract #FA8750-14-C-0241
+##
+
+# corpusWalker.py -- parallel discovery of the project roots of the uuid-sharded corpus
+#
+# Projects sit 8 hex levels below the corpus directory (/data/corpus_0to7/f/6/0/4/b/7/a/8/<uuid>), i.e. a project root
+# is a directory 11 os.sep deep. Instead of one os.walk down the whole tree, the tree is split at its first hex levels
+# into shards (16^2 by default) which a process pool walks concurrently, so discovery over NFS/SAN scales with the
+# number of outstanding listings instead of waiting on one directory at a time. Directories are listed with scandir,
+# whose d_type answers is_dir() without a stat per entry (the scandir package on python 2; without it each entry is stat'ed).
+
+from __future__ import print_function
+
+import getopt
+import multiprocessing
+import os
+import os.path
+import sys
+import time
+
+# optional, os.scandir is only in python >= 3.5
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+from locallibs import debug
+from locallibs import printMsg
+from locallibs import warning
+
+# os.sep depth of a project root: /data/corpus_0to7/f/6/0/4/b/7/a/8/<uuid>
+iProjectLevel = 11
+
+###
+# sorted subdirectories of sPath; symlinked directories aren't followed (as with os.walk)
+###
+def listDirs(sPath):
+
+    lDirs = []
+
+    try:
+
+        if scandir is not None:
+
+            for oEntry in scandir(sPath):
+
+                if oEntry.is_dir(follow_symlinks=False): lDirs.append(oEntry.path)
+
+        else:
+
+            for sName in os.listdir(sPath):
+
+                sDir = os.path.join(sPath, sName)
+
+                if os.path.isdir(sDir) and not os.path.islink(sDir): lDirs.append(sDir)
+
+    except OSError as e:
+
+        warning('func: listDirs() unable to list:', sPath, e)
+
+    lDirs.sort()
+
+    return lDirs
+
+###
+# project roots (directories iLevel os.sep deep) below sPath in sorted order; tShard is (sPath, iLevel) for Pool.imap
+# dMtimes: filled with the mtime of every directory listed, taken just before listing it (see corpusManifest.py)
+###
+def walkShard(tShard, dMtimes=None):
+
+    (sPath, iLevel) = tShard
+
+    lRoots = []
+    lStack = [sPath]
+
+    while lStack:
+
+        sDir = lStack.pop()
+        iDirLevel = sDir.count(os.sep)
+
+        if iDirLevel == iLevel:
+
+            lRoots.append(sDir)
+
+        elif iDirLevel < iLevel:
+
+            if dMtimes is not None:
+
+                try:
+
+                    dMtimes[sDir] = os.stat(sDir).st_mtime
+
+                except OSError as e:
+
+                    pass
+
+            lStack.extend( reversed( listDirs(sDir) ) )
+
+    return lRoots
+
+###
+# the directories iShardDepth levels below sCorpusPath (but no deeper than the project roots), listed serially
+###
+def shardPaths(sCorpusPath, iShardDepth=2, iLevel=iProjectLevel):
+
+    lShards = [sCorpusPath]
+
+    for i in range( sCorpusPath.count(os.sep), min(sCorpusPath.count(os.sep) + iShardDepth, iLevel) ):
+
+        lShards = [sDir for sShard in lShards for sDir in listDirs(sShard)]
+
+    return lShards
+
+###
+# generator of the project roots below sCorpusPath. shards are walked by iForks processes and each shard's roots are
+# yielded (sorted) as soon as the shard is done; bOrdered yields the shards in order too, so all roots come out sorted.
+# the walk stops when the generator is closed (e.g. by a break in the caller's loop)
+###
+def findProjectRoots(sCorpusPath, iForks=16, iShardDepth=2, iLevel=iProjectLevel, bOrdered=False, bDebug=False):
+
+    sCorpusPath = os.path.normpath(sCorpusPath)
+
+    lShards = [(sShard, iLevel) for sShard in shardPaths(sCorpusPath, iShardDepth=iShardDepth, iLevel=iLevel)]
+
+    if bDebug: debug('func: findProjectRoots()', len(lShards), 'shards below', sCorpusPath, 'walked by', iForks, 'processes')
+
+    if iForks <= 1 or len(lShards) <= 1:
+
+        for tShard in lShards:
+
+            for sRoot in walkShard(tShard):
+
+                yield sRoot
+
+        return
+
+    oPool = multiprocessing.Pool( processes=min(iForks, len(lShards)) )
+
+    try:
+
+        fnMap = oPool.imap if bOrdered else oPool.imap_unordered
+
+        for lRoots in fnMap(walkShard, lShards):
+
+            for sRoot in lRoots:
+
+                yield sRoot
+
+        oPool.close()
+
+    finally:
+
+        oPool.terminate()
+        oPool.join()
+
+###
+# streams the project roots below sCorpusPath into qOut: iChunk at a time through putMany() (RedisQueue) or one at a time
+# through put() (multiprocessing.Queue and the like). fnFilter(sRoot) -> False skips a root, iLimit stops after that many.
+# iterRoots: roots to queue instead of walking sCorpusPath (e.g. read from a manifest, see corpusManifest.py)
+# returns the number of roots queued
+###
+def queueProjectRoots(qOut, sCorpusPath, iChunk=1000, fnFilter=None, iLimit=None, iForks=16, iShardDepth=2, iLevel=iProjectLevel, iterRoots=None, bDebug=False):
+
+    iCount = 0
+
+    bPutMany = hasattr(qOut, 'putMany')
+
+    lRoots = []
+
+    if iterRoots is None: iterRoots = findProjectRoots(sCorpusPath, iForks=iForks, iShardDepth=iShardDepth, iLevel=iLevel, bDebug=bDebug)
+
+    for sRoot in iterRoots:
+
+        if fnFilter and not fnFilter(sRoot): continue
+
+        if bDebug: debug('func: queueProjectRoots()', 'projects-root:', sRoot)
+
+        if bPutMany:
+
+            lRoots.append(sRoot)
+
+            # push roots in chunks so consumers can start while the walk continues
+            if len(lRoots) >= iChunk:
+
+                qOut.putMany(lRoots, chunk=iChunk)
+                lRoots = []
+
+        else:
+
+            qOut.put(sRoot)
+
+        iCount += 1
+
+        if iLimit and iCount >= iLimit: break
+
+    if lRoots: qOut.putMany(lRoots, chunk=iChunk)
+
+    return iCount
+
+###
+def isInt(s):
+
+    try:
+
+        int(s)
+        return True
+
+    except ValueError:
+
+        return False
+
+###
+def usage():
+    warning('Usage: corpusWalker.py --corpus-dir-path=/data/corpus_0to7 --forks=16 --shard-depth=2 --level=11 --sorted --count --debug')
+
+###
+def main(argv):
+
+    # defaults
+    bError = False
+
+    dConfig = {}
+
+    dConfig['debug'] = False
+    dConfig['corpus-dir-path'] = '/data/corpus_0to7'
+    dConfig['forks'] = 16
+    dConfig['shard-depth'] = 2
+    dConfig['level'] = iProjectLevel
+    dConfig['sorted'] = False
+
+    # only report the number of roots found and how long the walk took (otherwise stdout is the list of roots)
+    dConfig['count'] = False
+
+    ### command line argument handling
+    options, remainder = getopt.getopt(sys.argv[1:], 'c:f:s:l:ond', ['corpus-dir-path=','forks=','shard-depth=','level=','sorted','count','debug'])
+
+    for opt, arg in options:
+
+        if opt in ('-c', '--corpus-dir-path'):
+
+            dConfig['corpus-dir-path'] = arg
+
+        elif opt in ('-f', '--forks'):
+
+            if isInt(arg): dConfig['forks'] = int(arg)
+            else: bError = True
+
+        elif opt in ('-s', '--shard-depth'):
+
+            if isInt(arg): dConfig['shard-depth'] = int(arg)
+            else: bError = True
+
+        elif opt in ('-l', '--level'):
+
+            if isInt(arg): dConfig['level'] = int(arg)
+            else: bError = True
+
+        elif opt in ('-o', '--sorted'):
+
+            dConfig['sorted'] = True
+
+        elif opt in ('-n', '--count'):
+
+            dConfig['count'] = True
+
+        elif opt in ('-d', '--debug'):
+
+            dConfig['debug'] = True
+
+    if not os.path.isdir(dConfig['corpus-dir-path']):
+
+        warning('func: main() corpus directory does not exist:', dConfig['corpus-dir-path'])
+        bError = True
+
+    if bError: usage()
+    else:
+
+        fStart = time.time()
+
+        iCount = 0
+
+        for sRoot in findProjectRoots(dConfig['corpus-dir-path'], iForks=dConfig['forks'], iShardDepth=dConfig['shard-depth'], iLevel=dConfig['level'], bOrdered=dConfig['sorted'], bDebug=dConfig['debug']):
+
+            if not dConfig['count']: print(sRoot)
+
+            iCount += 1
+
+        if dConfig['count']: printMsg('func: main()', iCount, 'project roots found in', '%.1f' % (time.time() - fStart), 'seconds')
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -70,18 +70,25 @@ def createBuildSummaries(dConfig):
         # empty redis set
         dProjects[sProjectBin].flush()
 
-        lProjects = dMp.select(sSelectClause='projectName', sTable=sTable, sOrderByClause='projectName', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
+        lProjects = dMp.iselect(sSelectClause='projectName', sTable=sTable, sOrderByClause='projectName', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
 
         # populate redis set with projects of each bin type
-        for tProject in lProjects:
+        dProjects[sProjectBin].putMany( (sProjectName for (sProjectName, ) in lProjects), chunk=dConfig['redis-bulk-chunk-size'] )
 
-            (sProjectName, ) = tProject
+    # local copies of each bin so per-row status lookups are done in memory
+    dProjectBins = {}
 
-            dProjects[sProjectBin].put(sProjectName)
+    for sProjectBin in dProjects:
+
+        dProjectBins[sProjectBin] = dProjects[sProjectBin].snapshot()
 
     dProjectSummary = {}
 
-    lTargetRows = dMp.select(sSelectClause=sSelectClause, sTable='buildStatusWithTargets', sOrderByClause='projectName,buildTarPath', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
+    # serialized summaries waiting to be pushed onto the json queue
+    lSummaries = []
+
+    # streamed from a server-side cursor; summaries are pushed to redis as rows arrive
+    lTargetRows = dMp.iselect(sSelectClause=sSelectClause, sTable='buildStatusWithTargets', sOrderByClause='projectName,buildTarPath', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
 
     for tTargetRow in lTargetRows:
 
@@ -127,10 +134,15 @@ def createBuildSummaries(dConfig):
             else:
 
                 if dConfig['debug']: debug( 'func: createBuildSummaries() dProjectSummary:', json.dumps(dProjectSummary,indent=4) )
-                qRedis.put( json.dumps(dProjectSummary) )
+                lSummaries.append( json.dumps(dProjectSummary) )
                 iProjectCount += 1
                 dProjectSummary = {}
 
+                if len(lSummaries) >= dConfig['redis-bulk-chunk-size']:
+
+                    qRedis.putMany(lSummaries, chunk=dConfig['redis-bulk-chunk-size'])
+                    lSummaries = []
+
         if not dProjectSummary:
 
             # project specific build summary info
@@ -153,9 +165,9 @@ def createBuildSummaries(dConfig):
                 'builds' : [dBuild]
             }
 
-            if dTarget['projectName'] in dProjects['success']: dProjectSummary['buildStatus'] = 'success'
-            elif dTarget['projectName'] in dProjects['partial']: dProjectSummary['buildStatus'] = 'partial'
-            elif dTarget['projectName'] in dProjects['fail']: dProjectSummary['buildStatus'] = 'fail'
+            if dTarget['projectName'] in dProjectBins['success']: dProjectSummary['buildStatus'] = 'success'
+            elif dTarget['projectName'] in dProjectBins['partial']: dProjectSummary['buildStatus'] = 'partial'
+            elif dTarget['projectName'] in dProjectBins['fail']: dProjectSummary['buildStatus'] = 'fail'
 
             # target specific build summary info
 
@@ -173,11 +185,13 @@ def createBuildSummaries(dConfig):
     if dProjectSummary:
 
         if dConfig['debug']: debug( 'func: createBuildSummaries() dProjectSummary:', json.dumps(dProjectSummary,indent=4) )
-        qRedis.put( json.dumps(dProjectSummary) )
+        lSummaries.append( json.dumps(dProjectSummary) )
         iProjectCount += 1
 
         dProjectSummary = {}
 
+    qRedis.putMany(lSummaries, chunk=dConfig['redis-bulk-chunk-size'])
+
     dMp.close()
 
     printMsg('func: createBuildSummaries()', str(iProjectCount), 'projects queued')
@@ -257,6 +271,7 @@ def main(argv):
     # dConfig['redis-port'] = '6379'
     dConfig['redis-port'] = '12345'
     dConfig['redis'] = True
+    dConfig['redis-bulk-chunk-size'] = 1000
 
     ### command line argument handling
     options, remainder = getopt.getopt(sys.argv[1:], 'f:d', ['forks=','debug'])
@@ -38,6 +38,11 @@ def main(argv):
 
     printMsg ( '# of same-type projects: ', len(lMultipleSameTypeProjects), '# of multiple-build-type projects:', len(lMultipleBuildTypeProjects) )
 
+    # multi-type projects per combination of build types, counted in mysql from the buildType bitmask
+    for (lBuildTypes, iCount) in dMp.countBuildTypeCombinations():
+
+        printMsg ( '# of projects with build types', '+'.join(lBuildTypes) + ':', iCount )
+
     with open('multipleSameTypeProjects.json', 'w') as fSameType:
         json.dump(lMultipleSameTypeProjects, fSameType, indent=4)
 
@@ -28,7 +28,8 @@ from locallibs import debug
 from locallibs import printMsg
 from locallibs import warning
 
-from projectDB import MuseProjectDB
+from projectDB import closeProjectDBs
+from projectDB import getProjectDB
 
 from redisHelper import RedisQueue
 from redisHelper import RedisSet
@@ -110,8 +111,6 @@ def postBuildStatusUpdates(dArgs, bjson, dConfig):
 
     dBuildArgs = {}
 
-    dMp = MuseProjectDB(db=dConfig['mysql-db'],port=dConfig['mysql-port'],user=dConfig['mysql-user'],passwd=dConfig['mysql-passwd'],loc=dConfig['mysql-loc'])
-
     dBuildArgs['projectName'] = bjson['projectName']    
     dBuildArgs['projectPath'] = bjson['sourcePath']     
     dBuildArgs['buildTarPath'] = bjson['builds'][0]['buildTarPath']
@@ -130,11 +129,10 @@ def postBuildStatusUpdates(dArgs, bjson, dConfig):
 
     if dConfig['debug']: debug( 'func: postBuildStatusUpdates() build args prepared for mysql ingestion')
 
-    # commit status to database
-    dMp.open()
-    dMp.insertIntoBuildStatusTargets(dArgs=dBuildArgs, bDebug=dConfig['debug'])
-    dMp.insertIntoBuildStatus(dArgs=dBuildArgs, bDebug=dConfig['debug'])
-    dMp.close()
+    # commit status to database over this process' pooled connection (kept open across build.json files)
+    dMp = getProjectDB(db=dConfig['mysql-db'],port=dConfig['mysql-port'],user=dConfig['mysql-user'],passwd=dConfig['mysql-passwd'],loc=dConfig['mysql-loc'])
+    dMp.insertIntoBuildStatusTargets(dArgs=dBuildArgs, bUpsert=True, bDebug=dConfig['debug'])
+    dMp.insertIntoBuildStatus(dArgs=dBuildArgs, bUpsert=True, bDebug=dConfig['debug'])
 
     if dConfig['debug']: debug( 'func: postBuildStatusUpdates() build status ingested into mysql')
 
@@ -252,6 +250,8 @@ def main(argv):
     	    # call to update mysql based on build summary json of project
             postBuildStatusUpdates(dArgs, data, dConfig)
 
+    closeProjectDBs()
+
 
 
 ###
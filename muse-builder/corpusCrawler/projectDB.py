@@ -12,26 +12,182 @@ from __future__ import print_function
 import getopt
 import json
 import os
+import re
 import sys
+import tempfile
+import threading
 import time
 import traceback
-import MySQLdb
 
+# optional, only the MySQL backend needs mysqlclient; without it the sqlite backend runs on sqliteDB's stand-in
+try:
+    import MySQLdb
+    import MySQLdb.cursors
+except ImportError:
+    from sqliteDB import MySQLdb
+
+from collections import deque
 from contextlib import closing
 
 from locallibs import debug
 from locallibs import printMsg
 from locallibs import warning
 
+from sqliteDB import SqliteConnection
+from sqliteDB import isSqliteUrl
+from sqliteDB import sqlitePath
+
 ###################
 
+###
+# per-process MuseProjectDB registry; one open connection per (loc, port, db, user) is reused across calls
+#
+# the registry is dropped whenever the pid changes so that workers forked by multiprocessing.Pool
+# never reuse a connection inherited from their parent
+###
+dProjectDBs = {}
+iProjectDBsPid = None
+oProjectDBsLock = threading.Lock()
+
+###
+# pooled MuseProjectDB for the given connection parameters; the connection is pinged (and reopened if stale) on every checkout
+###
+def getProjectDB(db='muse', user='muse', passwd='muse', loc='muse2-int', port=54321):
+
+    global iProjectDBsPid
+
+    tKey = (loc, int(port), db, user)
+
+    with oProjectDBsLock:
+
+        if iProjectDBsPid != os.getpid():
+
+            dProjectDBs.clear()
+            iProjectDBsPid = os.getpid()
+
+        if tKey not in dProjectDBs:
+
+            dProjectDBs[tKey] = MuseProjectDB(db=db, user=user, passwd=passwd, loc=loc, port=port)
+
+        dMp = dProjectDBs[tKey]
+
+    dMp.ping()
+
+    return dMp
+
+###
+# close every pooled connection held by this process
+###
+def closeProjectDBs():
+
+    with oProjectDBsLock:
+
+        if iProjectDBsPid == os.getpid():
+
+            for dMp in dProjectDBs.values():
+
+                dMp.close()
+
+        dProjectDBs.clear()
+
+###
+# query instrumentation defaults for new MuseProjectDB instances (see configureQueryStats())
+###
+dQueryStatsDefaults = {
+    'slow-query': 5.0,
+    'interval': 0,
+    'on-close': True
+}
+
+###
+# set the slow query threshold (seconds), the periodic summary interval (seconds, 0 = off) and whether close() writes a summary,
+# for every MuseProjectDB created afterwards in this process (and in workers forked from it)
+###
+def configureQueryStats(fSlowQuery=None, iInterval=None, bOnClose=None):
+
+    if fSlowQuery is not None: dQueryStatsDefaults['slow-query'] = float(fSlowQuery)
+    if iInterval is not None: dQueryStatsDefaults['interval'] = int(iInterval)
+    if bOnClose is not None: dQueryStatsDefaults['on-close'] = bool(bOnClose)
+
+###
+# table a statement works on, '-' for statements without one (USE, DROP TRIGGER, ...)
+###
+oQueryTableRe = re.compile(r'\b(?:INTO\s+TABLE|TABLE(?:\s+IF(?:\s+NOT)?\s+EXISTS)?|VIEW(?:\s+IF\s+EXISTS)?|FROM|INTO|UPDATE|JOIN|ON)\s+`?(\w+)', re.I)
+
+def queryTable(sQuery):
+
+    oMatch = oQueryTableRe.search(sQuery)
+
+    return oMatch.group(1) if oMatch else '-'
+
+###
+# returns the fPct percentile of sorted list lValues (None if empty)
+###
+def percentile(lValues, fPct):
+
+    if not lValues:
+
+        return None
+
+    return lValues[ min( len(lValues) - 1, int(fPct * len(lValues)) ) ]
+
+###
+# cursor handed out by MuseProjectDB.cursor(); times every execute/executemany and reports it to MuseProjectDB.recordQuery()
+###
+class TimedCursor:
+
+    def __init__(self, dMp, cursor, sMethod):
+
+        self.dMp = dMp
+        self.cursor = cursor
+        self.sMethod = sMethod
+
+    ###
+    def execute(self, sQuery, args=None):
+
+        return self.timed(self.cursor.execute, sQuery, args)
+
+    ###
+    def executemany(self, sQuery, args):
+
+        return self.timed(self.cursor.executemany, sQuery, args)
+
+    ###
+    def timed(self, fnExecute, sQuery, args):
+
+        fStart = time.time()
+        bError = True
+
+        try:
+
+            result = fnExecute(sQuery, args)
+            bError = False
+
+            return result
+
+        finally:
+
+            self.dMp.recordQuery(self.sMethod, sQuery, time.time() - fStart, self.cursor.rowcount, bError)
+
+    ###
+    def __getattr__(self, sName):
+
+        return getattr(self.cursor, sName)
+
+    ###
+    def close(self):
+
+        self.cursor.close()
+
 class MuseProjectDB:
 
     ###
     #def __init__(self, db='muse',user='muse',passwd='muse',loc='muse2-int', port=54321):
+    # db may also be a sqlite url (sqlite:////tmp/muse.db) to run against an embedded database file, see sqliteDB.py
     def __init__(self, db='muse',user='muse',passwd='muse',loc='muse2-int', port=54321):
 
         self.db = db
+        self.bSqlite = isSqliteUrl(db)
         self.user = user
         self.passwd = passwd
         self.loc = loc
@@ -39,11 +195,69 @@ class MuseProjectDB:
 
         self.conn = None
 
+        # rows per multi-row INSERT/commit in insertRows()
+        self.iBatchSize = 1000
+
+        # tries of an updateBuildSummaries() transaction that keeps losing races with concurrent builds
+        self.iSummaryAttempts = 3
+
+        # secondary index definitions dropped by disableIndexes(), keyed by table
+        self.dDisabledIndexes = {}
+
+        # rows per server round trip in iselect()
+        self.iFetchSize = 10000
+
+        # query instrumentation (see cursor() / recordQuery()): statements slower than fSlowQuery seconds are logged,
+        # a summary is written on close() (bQueryStatsOnClose) and every iQueryStatsInterval seconds (0 = never),
+        # p99 is taken over the last iQuerySamples latencies of each method / table
+        self.fSlowQuery = dQueryStatsDefaults['slow-query']
+        self.bQueryStatsOnClose = dQueryStatsDefaults['on-close']
+        self.iQueryStatsInterval = dQueryStatsDefaults['interval']
+        self.iQuerySamples = 10000
+        self.resetQueryStats()
+
         self.lBuildTypes = ['configureBuildType','configureacBuildType','configureinBuildType','cmakeBuildType','makefileBuildType','antBuildType', 'mavenBuildType']
         self.lSourceTypes = ['cBuildType','cppBuildType']
         self.lAllTypes = self.lBuildTypes + self.lSourceTypes
-        self.lTables = ['projects','buildTargets','buildStatus','buildStatusTargets','sourceTargets']
-        self.lViews = ['availableProjects', 'availableTargets','availableSourceTargets','availableSourceTargetsWithSite','availableTargetsWithSite','buildFail','buildMinDepth','buildPartial','buildStatusWithTargets','buildSuccess','buildTopTargets','builtWith_ubuntu12','builtWith_ubuntu14','builtWith_fedora20','builtWith_fedora21','cProjects','cProjectsWithNoBuildTargets','numTargetsPerProject','unBuiltProjects', 'unBuiltSourceTargets','unBuiltSourceTargetsWithSite','unBuiltTargets','unBuiltTargetsWithSite','unknownCProjects']
+
+        # buildType bitmask column: bit i <-> lAllTypes[i], kept in sync with the boolean columns by triggers (see migrateBuildTypes())
+        self.dBuildTypeBits = dict( (sBuildType, 1 << iBit) for (iBit, sBuildType) in enumerate(self.lAllTypes) )
+        self.dBuildTypeTables = {
+            'buildTargets': self.lBuildTypes,
+            'buildStatusTargets': self.lAllTypes,
+            'sourceTargets': self.lSourceTypes
+        }
+
+        # natural keys; the paths are too long to index directly, so a unique keyHash column (binary sha1 of the
+        # key columns, set by trigger) stands in for them. projects and the summary tables are keyed by their primary keys
+        self.dNaturalKeys = {
+            'buildTargets': ['projectName','buildTargetPath'],
+            'sourceTargets': ['projectName','buildTargetPath'],
+            'buildStatus': ['projectName','buildTarPath'],
+            'buildStatusTargets': ['projectName','buildTarPath','buildTargetPath']
+        }
+
+        # unique key behind each table's ON DUPLICATE KEY UPDATE (the conflict target the sqlite backend needs)
+        self.dUpsertKeys = dict(self.dNaturalKeys)
+        self.dUpsertKeys['projects'] = ['projectName']
+        self.dUpsertKeys['projectBuildStatus'] = ['projectName']
+        self.dUpsertKeys['projectOSBuildStatus'] = ['projectName','os']
+        self.dUpsertKeys['buildStatusCounts'] = ['site','os','builds']
+        self.dUpsertKeys['topTargets'] = ['id']
+        self.dUpsertKeys['summaryRefreshes'] = ['tableName']
+        self.dUpsertKeys['rowCounts'] = ['tableName','shard']
+
+        self.lSummaryTables = ['projectBuildStatus','projectOSBuildStatus','buildStatusCounts','topTargets']
+        self.lSummaryStatuses = ['successes','partials','fails']
+        self.lTables = ['projects','buildTargets','buildStatus','buildStatusTargets','sourceTargets'] + self.lSummaryTables
+        self.lViews = ['availableProjects', 'availableTargets','availableSourceTargets','availableSourceTargetsWithSite','availableTargetsWithSite','buildFail','buildMinDepth','buildPartial','buildStatusWithTargets','buildSuccess','buildTopTargets','builtWith_ubuntu12','builtWith_ubuntu14','builtWith_fedora20','builtWith_fedora21','cProjects','cProjectsWithNoBuildTargets','numTargetsPerProject','unBuiltProjects', 'unBuiltSourceTargets','unBuiltSourceTargetsWithSite','unBuiltTargets','unBuiltTargetsWithSite','unknownCProjects','availableTopTargets','unBuiltTopTargets']
+
+        # tables whose exact row counts are kept in rowCounts (see migrateRowCounts()); every connection counts into
+        # one of iRowCountShards rows so concurrent writers don't all wait on the same counter row lock
+        self.lCountedTables = ['projects','buildTargets','buildStatus','buildStatusTargets','sourceTargets']
+        self.iRowCountShards = 16
+
+        self.lBuildStatusTargetsInsertCols = ['projectName','projectPath','buildTargetPath','buildTarPath'] + self.lAllTypes + ['builder','version','os','returnCode']
 
         self.dTables = {
             'projects': {
@@ -64,6 +278,46 @@ class MuseProjectDB:
                 'cols': ['projectName','projectPath','buildTargetPath'] + self.lSourceTypes,
                 'colsNoBools': ['projectName','projectPath','buildTargetPath']
             },
+            'projectBuildStatus': {
+                'cols': ['projectName','site','status']
+            },
+            'projectOSBuildStatus': {
+                'cols': ['projectName','os','site','status']
+            },
+            'buildStatusCounts': {
+                'cols': ['site','os','builds','projectCount']
+            },
+            'topTargets': {
+                'cols': ['id','projectName','projectPath','buildTargetPath'] + self.lBuildTypes + ['ranking','depth','site']
+            },
+        }
+
+        # composite indexes for the views' projectName joins, maintained by migrateIndexes()
+        # (project names are uuids; the prefix lengths keep keys under the 767 byte InnoDB COMPACT limit).
+        # the bulk loaded tables (see disableIndexes) declare all of their secondary indexes so rebuildIndexes() can always restore them
+        self.dIndexes = {
+            'projects': [
+                ('projects_site_projectName', ['site(64)','projectName(64)'])
+            ],
+            'buildTargets': [
+                ('buildTargets_projectName', ['projectName']),
+                ('buildTargets_ranking', ['ranking']),
+                ('buildTargets_depth', ['depth']),
+                ('buildTargets_projectName_depth', ['projectName(64)','depth']),
+                ('buildTargets_projectName_ranking', ['projectName(64)','ranking']),
+                ('buildTargets_projectName_buildType', ['projectName(64)','buildType'])
+            ],
+            'buildStatus': [
+                ('buildStatus_projectName_buildTarPath', ['projectName(64)','buildTarPath(191)']),
+                ('buildStatus_os_projectName', ['os(32)','projectName(64)']),
+                ('buildStatus_returnCode_projectName', ['returnCode','numObjectsGenerated','projectName(64)'])
+            ],
+            'buildStatusTargets': [
+                ('buildStatusTargets_projectName_buildTarPath', ['projectName(64)','buildTarPath(191)'])
+            ],
+            'sourceTargets': [
+                ('sourceTargets_projectName', ['projectName'])
+            ]
         }
 
     ###
@@ -118,7 +372,7 @@ class MuseProjectDB:
         sQuery = 'CREATE DATABASE ' + self.db + ';'
         lQueries.append(sQuery)
 
-        with closing( self.conn.cursor() ) as cursor:
+        with closing( self.cursor() ) as cursor:
 
             #execute mysql statements
             for sQuery in lQueries:
@@ -140,6 +394,11 @@ class MuseProjectDB:
         self.createSourceTargetsTable(bDebug=bDebug)
         self.createBuildStatusTargetsTable(bDebug=bDebug)
         self.createBuildStatusTable(bDebug=bDebug)
+        self.createSummaryTables(bDebug=bDebug)
+        self.migrateBuildTypes(bDebug=bDebug)
+        self.migrateUniqueKeys(bDebug=bDebug)
+        self.migrateRowCounts(bDebug=bDebug)
+        self.migrateIndexes(bDebug=bDebug)
 
     ###
     def createProjectsTable(self, bDebug=False):
@@ -183,7 +442,7 @@ class MuseProjectDB:
         sQuery = 'CREATE INDEX projects_java ON projects (java) USING BTREE;'
         lQueries.append(sQuery)
 
-        with closing( self.conn.cursor() ) as cursor:
+        with closing( self.cursor() ) as cursor:
 
             #execute mysql statements
             for sQuery in lQueries:
@@ -212,7 +471,7 @@ class MuseProjectDB:
         sQuery = 'DROP TABLE IF EXISTS projects;'
         lQueries.append(sQuery)
 
-        with closing( self.conn.cursor() ) as cursor:
+        with closing( self.cursor() ) as cursor:
 
             #execute mysql statements
             for sQuery in lQueries:
@@ -248,9 +507,12 @@ class MuseProjectDB:
 
             sQuery += '`' + sBuildType + '` BOOL DEFAULT FALSE NOT NULL,'
 
+        sQuery += '`buildType` SMALLINT UNSIGNED NOT NULL DEFAULT 0,'
         sQuery += '`ranking` INT UNSIGNED NOT NULL,'
         sQuery += '`depth` INT UNSIGNED NOT NULL,'
-        sQuery += 'PRIMARY KEY(`id`));'
+        sQuery += '`keyHash` BINARY(20),'
+        sQuery += 'PRIMARY KEY(`id`),'
+        sQuery += 'UNIQUE KEY `buildTargets_keyHash` (`keyHash`));'
         lQueries.append(sQuery)
 
         sQuery = 'CREATE INDEX buildTargets_projectName ON buildTargets (projectName) USING BTREE;'
@@ -262,7 +524,7 @@ class MuseProjectDB:
         sQuery = 'CREATE INDEX buildTargets_depth ON buildTargets (depth) USING BTREE;'
         lQueries.append(sQuery)
 
-        with closing( self.conn.cursor() ) as cursor:
+        with closing( self.cursor() ) as cursor:
 
             #execute mysql statements
             for sQuery in lQueries:
@@ -291,7 +553,7 @@ class MuseProjectDB:
         sQuery = 'DROP TABLE IF EXISTS buildTargets;'
         lQueries.append(sQuery)
 
-        with closing( self.conn.cursor() ) as cursor:
+        with closing( self.cursor() ) as cursor:
 
             #execute mysql statements
             for sQuery in lQueries:
@@ -327,13 +589,16 @@ class MuseProjectDB:
 
             sQuery += '`' + sBuildType + '` BOOL DEFAULT FALSE NOT NULL,'
 
-        sQuery += 'PRIMARY KEY(`id`));'
+        sQuery += '`buildType` SMALLINT UNSIGNED NOT NULL DEFAULT 0,'
+        sQuery += '`keyHash` BINARY(20),'
+        sQuery += 'PRIMARY KEY(`id`),'
+        sQuery += 'UNIQUE KEY `sourceTargets_keyHash` (`keyHash`));'
         lQueries.append(sQuery)
 
         sQuery = 'CREATE INDEX sourceTargets_projectName ON sourceTargets (projectName) USING BTREE;'
         lQueries.append(sQuery)
 
-        with closing( self.conn.cursor() ) as cursor:
+        with closing( self.cursor() ) as cursor:
 
             #execute mysql statements
             for sQuery in lQueries:
@@ -362,7 +627,7 @@ class MuseProjectDB:
         sQuery = 'DROP TABLE IF EXISTS sourceTargets;'
         lQueries.append(sQuery)
 
-        with closing( self.conn.cursor() ) as cursor:
+        with closing( self.cursor() ) as cursor:
 
             #execute mysql statements
             for sQuery in lQueries:
@@ -399,11 +664,14 @@ class MuseProjectDB:
 
             sQuery += '`' + sBuildType + '` BOOL DEFAULT FALSE NOT NULL,'
 
+        sQuery += '`buildType` SMALLINT UNSIGNED NOT NULL DEFAULT 0,'
         sQuery += '`builder` VARCHAR(255) CHARACTER SET utf8,'
         sQuery += '`version` VARCHAR(255) CHARACTER SET utf8 NOT NULL,'
         sQuery += '`os` VARCHAR(255) CHARACTER SET utf8 NOT NULL,'
         sQuery += '`returnCode` INT UNSIGNED NOT NULL,'
-        sQuery += 'PRIMARY KEY(`id`));'
+        sQuery += '`keyHash` BINARY(20),'
+        sQuery += 'PRIMARY KEY(`id`),'
+        sQuery += 'UNIQUE KEY `buildStatusTargets_keyHash` (`keyHash`));'
 
         lQueries.append(sQuery)
 
@@ -419,7 +687,7 @@ class MuseProjectDB:
         sQuery = 'CREATE INDEX buildStatusTargets_returnCode ON buildStatusTargets (returnCode) USING BTREE;'
         lQueries.append(sQuery)
 
-        with closing( self.conn.cursor() ) as cursor:
+        with closing( self.cursor() ) as cursor:
 
             #execute mysql statements
             for sQuery in lQueries:
@@ -448,7 +716,7 @@ class MuseProjectDB:
         sQuery = 'DROP TABLE IF EXISTS buildStatusTargets;'
         lQueries.append(sQuery)
 
-        with closing( self.conn.cursor() ) as cursor:
+        with closing( self.cursor() ) as cursor:
 
             #execute mysql statements
             for sQuery in lQueries:
@@ -465,6 +733,89 @@ class MuseProjectDB:
                     warning('func: dropBuildStatusTargetsTable() Unexpected error:', e)
                     break
 
+    ###
+    # materialized summaries of buildStatus (see updateBuildSummaries() / rebuildSummaries())
+    #
+    # status is the best build outcome: 0 success, 1 partial (objects generated), 2 fail
+    # buildStatusCounts holds distinct project counts per site/os/status ('*' = all sites or all os)
+    ###
+    def createSummaryTables(self, bDebug=False):
+
+        lQueries = []
+
+        if not self.ready(): self.open()
+        else: lQueries.append('USE ' + self.db + ';')
+
+        sQuery = 'CREATE TABLE IF NOT EXISTS projectBuildStatus ('
+        sQuery += '`projectName` VARCHAR(255) CHARACTER SET utf8 NOT NULL,'
+        sQuery += '`site` VARCHAR(255) CHARACTER SET utf8 NOT NULL DEFAULT \'\','
+        sQuery += '`status` TINYINT UNSIGNED NOT NULL,'
+        sQuery += 'PRIMARY KEY(`projectName`));'
+        lQueries.append(sQuery)
+
+        sQuery = 'CREATE TABLE IF NOT EXISTS projectOSBuildStatus ('
+        sQuery += '`projectName` VARCHAR(255) CHARACTER SET utf8 NOT NULL,'
+        sQuery += '`os` VARCHAR(64) CHARACTER SET utf8 NOT NULL,'
+        sQuery += '`site` VARCHAR(255) CHARACTER SET utf8 NOT NULL DEFAULT \'\','
+        sQuery += '`status` TINYINT UNSIGNED NOT NULL,'
+        sQuery += 'PRIMARY KEY(`projectName`,`os`));'
+        lQueries.append(sQuery)
+
+        sQuery = 'CREATE TABLE IF NOT EXISTS buildStatusCounts ('
+        sQuery += '`site` VARCHAR(191) CHARACTER SET utf8 NOT NULL,'
+        sQuery += '`os` VARCHAR(64) CHARACTER SET utf8 NOT NULL,'
+        sQuery += '`builds` VARCHAR(16) CHARACTER SET utf8 NOT NULL,'
+        sQuery += '`projectCount` BIGINT NOT NULL DEFAULT 0,'
+        sQuery += 'PRIMARY KEY(`site`,`os`,`builds`));'
+        lQueries.append(sQuery)
+
+        sQuery = 'CREATE TABLE IF NOT EXISTS topTargets ('
+        sQuery += '`id` BIGINT UNSIGNED NOT NULL,'
+        sQuery += '`projectName` VARCHAR(255) CHARACTER SET utf8 NOT NULL,'
+        sQuery += '`projectPath` VARCHAR(255) CHARACTER SET utf8 NOT NULL,'
+        sQuery += '`buildTargetPath` VARCHAR(750) CHARACTER SET utf8 NOT NULL,'
+
+        for sBuildType in self.lBuildTypes:
+
+            sQuery += '`' + sBuildType + '` BOOL DEFAULT FALSE NOT NULL,'
+
+        sQuery += '`ranking` INT UNSIGNED NOT NULL,'
+        sQuery += '`depth` INT UNSIGNED NOT NULL,'
+        sQuery += '`site` VARCHAR(255) CHARACTER SET utf8,'
+        sQuery += 'PRIMARY KEY(`id`));'
+        lQueries.append(sQuery)
+
+        sQuery = 'CREATE INDEX topTargets_projectName_ranking ON topTargets (projectName, ranking) USING BTREE;'
+        lQueries.append(sQuery)
+
+        sQuery = 'CREATE INDEX topTargets_site ON topTargets (site) USING BTREE;'
+        lQueries.append(sQuery)
+
+        # when topTargets was last refreshed and the buildTargets row count it was refreshed from (see topTargetsStaleness())
+        sQuery = 'CREATE TABLE IF NOT EXISTS summaryRefreshes ('
+        sQuery += '`tableName` VARCHAR(64) CHARACTER SET utf8 NOT NULL,'
+        sQuery += '`refreshed` DATETIME NOT NULL,'
+        sQuery += '`sourceRows` BIGINT NOT NULL DEFAULT 0,'
+        sQuery += 'PRIMARY KEY(`tableName`));'
+        lQueries.append(sQuery)
+
+        with closing( self.cursor() ) as cursor:
+
+            #execute mysql statements
+            for sQuery in lQueries:
+                
+                try:
+
+                    if bDebug: debug('func: createSummaryTables()', sQuery) 
+
+                    cursor.execute(sQuery)
+                    self.conn.commit()
+            
+                except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+                    warning('func: createSummaryTables() statement failed to execute:', sQuery) 
+                    warning('func: createSummaryTables() Unexpected error:', e)
+                    break    
+
     ###
     def createViews(self,bDebug=False):
 
@@ -576,6 +927,11 @@ class MuseProjectDB:
         lQueries.append('CREATE OR REPLACE VIEW availableSourceTargetsWithSite AS SELECT t1.*,t2.site AS site FROM availableSourceTargets t1 INNER JOIN projects t2 USING (projectName);')
         lQueries.append('CREATE OR REPLACE VIEW unBuiltSourceTargetsWithSite AS SELECT t1.*,t2.site AS site FROM unBuiltSourceTargets t1 INNER JOIN projects t2 USING (projectName);')
 
+        # summary table views (kept current by updateBuildSummaries(), topTargets refreshed by rebuildTopTargets())
+
+        lQueries.append('CREATE OR REPLACE VIEW availableTopTargets AS (SELECT t_all.* FROM topTargets t_all LEFT JOIN projectBuildStatus t_success ON t_success.projectName = t_all.projectName AND t_success.status = 0 WHERE t_success.projectName IS NULL);')
+        lQueries.append('CREATE OR REPLACE VIEW unBuiltTopTargets AS (SELECT t_all.* FROM topTargets t_all LEFT JOIN projectBuildStatus t_built USING (projectName) WHERE t_built.projectName IS NULL);')
+
         # buildStatus & project related views
 
         sQuery = 'CREATE OR REPLACE VIEW successfulCProjects AS '
@@ -583,7 +939,7 @@ class MuseProjectDB:
         sQuery += 'buildSuccess t1 INNER JOIN cProjects t2 USING (projectName) GROUP BY t2.site;'
         lQueries.append(sQuery)
 
-        with closing( self.conn.cursor() ) as cursor:
+        with closing( self.cursor() ) as cursor:
 
             #execute mysql statements
             for sQuery in lQueries:
@@ -625,6 +981,8 @@ class MuseProjectDB:
         lQueries.append('DROP VIEW IF EXISTS cProjectsWithNoBuildTargets;')
         lQueries.append('DROP VIEW IF EXISTS cProjects;')
 
+        lQueries.append('DROP VIEW IF EXISTS availableTopTargets;')
+        lQueries.append('DROP VIEW IF EXISTS unBuiltTopTargets;')
         lQueries.append('DROP VIEW IF EXISTS availableTargetsWithSite;')
         lQueries.append('DROP VIEW IF EXISTS unBuiltTargetsWithSite;')
         lQueries.append('DROP VIEW IF EXISTS availableTargets;')
@@ -648,7 +1006,7 @@ class MuseProjectDB:
         lQueries.append('DROP VIEW IF EXISTS buildStatusWithTargets;')
         lQueries.append('DROP VIEW IF EXISTS buildStatusWithSite;')
 
-        with closing( self.conn.cursor() ) as cursor:
+        with closing( self.cursor() ) as cursor:
 
             #execute mysql statements
             for sQuery in lQueries:
@@ -689,7 +1047,9 @@ class MuseProjectDB:
         sQuery += '`numObjectsGenerated` INT UNSIGNED NOT NULL,'
         sQuery += '`numSources` INT UNSIGNED NOT NULL,'
         sQuery += '`returnCode` INT UNSIGNED NOT NULL,'
-        sQuery += 'PRIMARY KEY(`id`));'
+        sQuery += '`keyHash` BINARY(20),'
+        sQuery += 'PRIMARY KEY(`id`),'
+        sQuery += 'UNIQUE KEY `buildStatus_keyHash` (`keyHash`));'
 
         lQueries.append(sQuery)
 
@@ -717,7 +1077,7 @@ class MuseProjectDB:
         sQuery = 'CREATE INDEX buildStatus_returnCode ON buildStatus (returnCode) USING BTREE;'
         lQueries.append(sQuery)
 
-        with closing( self.conn.cursor() ) as cursor:
+        with closing( self.cursor() ) as cursor:
 
             #execute mysql statements
             for sQuery in lQueries:
@@ -746,7 +1106,7 @@ class MuseProjectDB:
         sQuery = 'DROP TABLE IF EXISTS buildStatus;'
         lQueries.append(sQuery)
 
-        with closing( self.conn.cursor() ) as cursor:
+        with closing( self.cursor() ) as cursor:
 
             #execute mysql statements
             for sQuery in lQueries:
@@ -793,7 +1153,15 @@ class MuseProjectDB:
         sQuery = 'TRUNCATE TABLE buildStatusTargets;'
         lQueries.append(sQuery)
 
-        with closing( self.conn.cursor() ) as cursor:
+        # truncate summary tables
+        for sTable in self.lSummaryTables + ['summaryRefreshes']:
+
+            lQueries.append('TRUNCATE TABLE ' + sTable + ';')
+
+        # TRUNCATE empties the tables behind the counters' back
+        lQueries.append('UPDATE rowCounts SET numRows = 0;')
+
+        with closing( self.cursor() ) as cursor:
 
             #execute mysql statements
             for sQuery in lQueries:
@@ -830,7 +1198,10 @@ class MuseProjectDB:
         sQuery = 'TRUNCATE TABLE ' + sTable + ';'
         lQueries.append(sQuery)
 
-        with closing( self.conn.cursor() ) as cursor:
+        # TRUNCATE empties the tables behind the counters' back
+        if sTable in self.lCountedTables: lQueries.append('UPDATE rowCounts SET numRows = 0 WHERE tableName = \'' + sTable + '\';')
+
+        with closing( self.cursor() ) as cursor:
 
             #execute mysql statements
             for sQuery in lQueries:
@@ -858,13 +1229,17 @@ class MuseProjectDB:
 
             if not self.conn or not self.conn.open:
 
-                if bSetSchema:
+                if self.bSqlite:
+
+                    self.conn = SqliteConnection(sqlitePath(self.db), dNaturalKeys=self.dNaturalKeys, dUpsertKeys=self.dUpsertKeys)
 
-                    self.conn = MySQLdb.connect(host=self.loc,port=self.port,user=self.user,passwd=self.passwd,db=self.db,charset='utf8',use_unicode=True)
+                elif bSetSchema:
+
+                    self.conn = MySQLdb.connect(host=self.loc,port=self.port,user=self.user,passwd=self.passwd,db=self.db,charset='utf8',use_unicode=True,local_infile=1)
 
                 else:
 
-                    self.conn = MySQLdb.connect(host=self.loc,port=self.port,user=self.user,passwd=self.passwd,charset='utf8',use_unicode=True)
+                    self.conn = MySQLdb.connect(host=self.loc,port=self.port,user=self.user,passwd=self.passwd,charset='utf8',use_unicode=True,local_infile=1)
 
         except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
 
@@ -872,599 +1247,1783 @@ class MuseProjectDB:
             warning('func: open() Unexpected error:', e)
 
     ###
-    def close(self):
-    
+    # make sure the connection is usable; reopens it if it was never opened, was closed or went stale (e.g. wait_timeout)
+    ###
+    def ping(self):
+
         if self.ready():
 
-            self.conn.close()
+            try:
 
-    ###
-    def insertIntoProjects(self, lProjects, bDebug=False):
+                self.conn.ping()
+                return True
 
-        lQueries = []
+            except (MySQLdb.InterfaceError, MySQLdb.OperationalError) as e:
 
-        if not self.ready(): self.open()
-        else: lQueries.append('USE ' + self.db + ';')
+                warning('func: ping() stale connection, reconnecting:', e)
 
-        lArgs = ['bytecode_available', 'source', 'c', 'cpp', 'csharp', 'java']
+                try:
 
-        for dProject in lProjects:
+                    self.conn.close()
 
-            if '_source' in dProject:
+                except (MySQLdb.InterfaceError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
 
-                dSource = dProject['_source']
+                    pass
 
-                if bDebug: debug( 'func: insertIntoProjects()', json.dumps(dSource, indent=4) ) 
+                self.conn = None
 
-                sQuery = 'INSERT INTO projects ('
+        self.open()
 
-                for sArg in lArgs:
+        return self.ready()
 
-                    sQuery += sArg + ','
+    ###
+    def close(self):
+    
+        if self.bQueryStatsOnClose and self.iQueriesSinceSummary: self.logQueryStats()
 
-                sQuery += 'codeDir,site,projectName) VALUES ('
+        if self.ready():
 
-                for sArg in lArgs:
+            self.conn.close()
 
-                    if sArg in dSource:
+    ###
+    # instrumented cursor; every statement MuseProjectDB runs goes through one of these. sMethod defaults to the calling method
+    ###
+    def cursor(self, cursorclass=None, sMethod=None):
 
-                        sQuery += '\'%s\',' % MySQLdb.escape_string( str( int( dSource[sArg] ) ) )
+        if not sMethod: sMethod = sys._getframe(1).f_code.co_name
 
-                    else:
+        if cursorclass: cursor = self.conn.cursor(cursorclass)
+        else: cursor = self.conn.cursor()
 
-                        sQuery += '\'0\','
+        return TimedCursor(self, cursor, sMethod.replace('()', ''))
 
-                for sArg in ['codeDir','site']:
+    ###
+    def resetQueryStats(self):
 
-                    if sArg in dSource and dSource[sArg]:
+        self.dQueryStats = { 'method': {}, 'table': {} }
+        self.iQueriesSinceSummary = 0
+        self.fLastSummary = time.time()
 
-                        sQuery += '\'%s\',' % MySQLdb.escape_string( dSource[sArg] )
+    ###
+    # account one statement to its method and table; logs it if slower than self.fSlowQuery
+    ###
+    def recordQuery(self, sMethod, sQuery, fElapsed, iRows, bError=False):
 
-                    else:
+        for (sScope, sKey) in [ ('method', sMethod), ('table', queryTable(sQuery)) ]:
 
-                        sQuery += 'NULL,'
+            if sKey not in self.dQueryStats[sScope]:
 
-                sQuery += '\'%s\');' % MySQLdb.escape_string( dSource['name'] )
+                self.dQueryStats[sScope][sKey] = { 'count': 0, 'errors': 0, 'rows': 0, 'total': 0.0, 'max': 0.0, 'samples': deque(maxlen=self.iQuerySamples) }
 
-                lQueries.append(sQuery)
+            dStats = self.dQueryStats[sScope][sKey]
 
-        with closing( self.conn.cursor() ) as cursor:
+            dStats['count'] += 1
+            dStats['total'] += fElapsed
+            dStats['max'] = max(dStats['max'], fElapsed)
+            dStats['samples'].append(fElapsed)
 
-            #execute mysql statements
-            for sQuery in lQueries:
+            if bError: dStats['errors'] += 1
+            elif iRows and iRows > 0: dStats['rows'] += iRows
 
-                try:
+        self.iQueriesSinceSummary += 1
 
-                    if bDebug: debug('func: insertIntoProjects()', sQuery) 
+        if fElapsed >= self.fSlowQuery:
 
-                    cursor.execute(sQuery)
-                    self.conn.commit()
-            
-                except (UnicodeEncodeError, MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
-            
-                    warning('func: insertIntoProjects() statement failed to execute:', sQuery) 
-                    warning('func: insertIntoProjects() Unexpected error:', e)
-                    break
+            warning('func: ' + sMethod + '() slow query: %.3fs,' %(fElapsed), iRows, 'rows:', sQuery[:2000])
+
+        if self.iQueryStatsInterval and time.time() - self.fLastSummary >= self.iQueryStatsInterval:
 
+            self.logQueryStats()
+
+    ###
+    # query counters as a plain dict: { 'method'|'table': { name: { count, errors, rows, total, mean, p99, max } } } (seconds)
     ###
-    def insertIntoBuildTargets(self, lTargets, bDebug=False):
+    def getQueryStats(self):
 
-        lQueries = []
+        dReport = {}
 
-        if not self.ready(): self.open()
-        else: lQueries.append('USE ' + self.db + ';')
+        for (sScope, dScope) in self.dQueryStats.items():
 
-        for dArgs in lTargets:
+            dReport[sScope] = {}
 
-            # verify required arguments are all included
-            lArgNames = dArgs.keys()
+            for (sKey, dStats) in dScope.items():
 
-            lRequiredArgs = self.dTables['buildTargets']['cols']
+                dReport[sScope][sKey] = {
+                    'count': dStats['count'],
+                    'errors': dStats['errors'],
+                    'rows': dStats['rows'],
+                    'total': dStats['total'],
+                    'mean': dStats['total'] / dStats['count'],
+                    'p99': percentile( sorted(dStats['samples']), 0.99 ),
+                    'max': dStats['max']
+                }
 
-            bMissingArg = False
-            lMissingArgs = []
+        return dReport
 
-            for sRequiredArg in lRequiredArgs:
+    ###
+    # print the counters, busiest (total time) first
+    ###
+    def logQueryStats(self):
 
-                if sRequiredArg not in lArgNames:
+        dReport = self.getQueryStats()
 
-                    bMissingArg = True
-                    lMissingArgs.append(sRequiredArg)
+        for sScope in ['method', 'table']:
 
-            if bMissingArg:
+            for (sKey, dStats) in sorted(dReport[sScope].items(), key=lambda tItem: tItem[1]['total'], reverse=True):
 
-                warning('func: insertIntoBuildTargets() missing required arguments:', lMissingArgs) 
+                printMsg('func: logQueryStats()', sScope + ':', sKey, 'count:', dStats['count'], 'errors:', dStats['errors'], 'rows:', dStats['rows'], 'total: %.3fs mean: %.4fs p99: %.4fs max: %.4fs' %(dStats['total'], dStats['mean'], dStats['p99'], dStats['max']))
 
-            else:
+        self.iQueriesSinceSummary = 0
+        self.fLastSummary = time.time()
 
-                # sProjectName, sProjectPath, sBuildTargetPath, bConfigureBuildType=False, bConfigureacBuildType=False, bConfigureinBuildType=False, bCmakeBuildType=False, bMakefileBuildType=False, bAntBuildType=False, bMavenBuildType=False, iDepth=0, 
+    ###
+    # batched write path used by the insertInto* methods; lRows are tuples ordered like lCols
+    # each chunk of iBatchSize rows goes out as one multi-row INSERT (executemany) and one commit,
+    # a chunk that fails is rolled back and retried row by row so only the bad rows are dropped
+    # with bUpsert rows whose natural key already exists are updated in place (ON DUPLICATE KEY UPDATE) so reruns are idempotent
+    ###
+    def insertRows(self, sTable, lCols, lRows, sCaller='insertRows()', iBatchSize=None, bUpsert=False, bDebug=False):
 
-                sQuery = 'INSERT INTO buildTargets ('
-                sQuery += 'projectName,'
-                sQuery += 'projectPath,'
-                sQuery += 'buildTargetPath,'
+        iInserted = 0
 
-                for sBuildType in self.lBuildTypes:
+        if not lRows: return iInserted
 
-                    sQuery += sBuildType + ','
+        if not iBatchSize: iBatchSize = self.iBatchSize
 
-                sQuery += 'ranking,'
-                sQuery += 'depth) VALUES ('
-                sQuery += '\'%s\',' % MySQLdb.escape_string( dArgs['projectName'] )
-                sQuery += '\'%s\',' % MySQLdb.escape_string( dArgs['projectPath'] )
-                sQuery += '\'%s\',' % MySQLdb.escape_string( dArgs['buildTargetPath'] )
+        bUseDb = self.ready()
 
-                for sBuildType in self.lBuildTypes:
+        if not bUseDb: self.open()
 
-                    sQuery += '\'%s\',' % MySQLdb.escape_string( str( int(dArgs[sBuildType]) ) )
+        sQuery = 'INSERT INTO ' + sTable + ' (' + ','.join(lCols) + ') VALUES (' + ','.join( ['%s'] * len(lCols) ) + ')'
 
-                sQuery += '\'%s\',' % MySQLdb.escape_string( str(dArgs['ranking']) )
-                sQuery += '\'%s\');' % MySQLdb.escape_string( str(dArgs['depth']) )
-                lQueries.append(sQuery)
+        if bUpsert: sQuery += self.upsertClause(lCols)
 
-        with closing( self.conn.cursor() ) as cursor:
+        with closing( self.cursor(sMethod=sCaller) ) as cursor:
 
-            #execute mysql statements
-            for sQuery in lQueries:
+            try:
 
-                try:
+                if bUseDb: cursor.execute('USE ' + self.db + ';')
 
-                    if bDebug: debug('func: insertIntoBuildTargets()', sQuery) 
+            except (MySQLdb.InterfaceError, MySQLdb.OperationalError) as e:
 
-                    cursor.execute(sQuery)
-                    self.conn.commit()
-            
-                except (UnicodeEncodeError, MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
-            
-                    warning('func: insertIntoBuildTargets() statement failed to execute:', sQuery) 
-                    warning('func: insertIntoBuildTargets() Unexpected error:', e)
-                    break
+                warning('func: ' + sCaller + ' connection lost, no rows written:', e)
+                return iInserted
 
-    ###
-    def insertIntoSourceTargets(self, lTargets, bDebug=False):
+            for iStart in range(0, len(lRows), iBatchSize):
 
-        lQueries = []
+                lChunk = lRows[iStart:iStart + iBatchSize]
 
-        if not self.ready(): self.open()
-        else: lQueries.append('USE ' + self.db + ';')
+                try:
 
-        for dArgs in lTargets:
+                    if bDebug: debug('func: ' + sCaller, sQuery, 'x', len(lChunk))
 
-            # verify required arguments are all included
-            lArgNames = dArgs.keys()
+                    # an upsert's affected rows can't tell new rows from updated ones, look its keys up first
+                    iNew = self.newRows(cursor, sTable, lCols, lChunk) if bUpsert else None
 
-            lRequiredArgs = self.dTables['sourceTargets']['cols']
+                    cursor.executemany(sQuery, lChunk)
 
-            bMissingArg = False
-            lMissingArgs = []
+                    self.addRowCount(cursor, sTable, cursor.rowcount if iNew is None else iNew)
+                    self.conn.commit()
+                    iInserted += len(lChunk)
 
-            for sRequiredArg in lRequiredArgs:
+                except (MySQLdb.InterfaceError, MySQLdb.OperationalError) as e:
 
-                if sRequiredArg not in lArgNames:
+                    # the connection is gone (or the server is refusing the batch); retrying row by row would only fail again
+                    warning('func: ' + sCaller + ' batch of', len(lChunk), 'rows failed, giving up after', iInserted, 'of', len(lRows), 'rows:', e)
 
-                    bMissingArg = True
-                    lMissingArgs.append(sRequiredArg)
+                    self.rollback(sCaller)
 
-            if bMissingArg:
+                    return iInserted
 
-                warning('func: insertIntoBuildTargets() missing required arguments:', lMissingArgs) 
+                except (UnicodeEncodeError, MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.ProgrammingError) as e:
 
-            else:
+                    warning('func: ' + sCaller + ' batch of', len(lChunk), 'rows failed, retrying row by row:', e)
 
-                # sProjectName, sProjectPath, sBuildTargetPath, bConfigureBuildType=False, bConfigureacBuildType=False, bConfigureinBuildType=False, bCmakeBuildType=False, bMakefileBuildType=False, bAntBuildType=False, bMavenBuildType=False, iDepth=0, 
+                    if not self.rollback(sCaller): return iInserted
 
-                sQuery = 'INSERT INTO sourceTargets ('
-                sQuery += 'projectName,'
-                sQuery += 'projectPath,'
-                sQuery += 'buildTargetPath,'
-                sQuery += 'cBuildType,'
-                sQuery += 'cppBuildType) VALUES ('
-                sQuery += '\'%s\',' % MySQLdb.escape_string( dArgs['projectName'] )
-                sQuery += '\'%s\',' % MySQLdb.escape_string( dArgs['projectPath'] )
-                sQuery += '\'%s\',' % MySQLdb.escape_string( dArgs['buildTargetPath'] )
-                sQuery += '\'%s\',' % MySQLdb.escape_string( str( int(dArgs['cBuildType']) ) )
-                sQuery += '\'%s\')' % MySQLdb.escape_string( str( int(dArgs['cppBuildType']) ) )
+                    iChunkInserted = 0
+                    iChunkNew = 0
 
-                lQueries.append(sQuery)
+                    try:
 
-        with closing( self.conn.cursor() ) as cursor:
+                        for tRow in lChunk:
 
-            #execute mysql statements
-            for sQuery in lQueries:
+                            try:
 
-                try:
+                                iNew = self.newRows(cursor, sTable, lCols, [tRow]) if bUpsert else 1
 
-                    if bDebug: debug('func: insertIntoSourceTargets()', sQuery) 
+                                cursor.execute(sQuery, tRow)
+                                iChunkInserted += 1
+                                iChunkNew += iNew
 
-                    cursor.execute(sQuery)
+                            except (UnicodeEncodeError, MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.ProgrammingError) as e:
+
+                                warning('func: ' + sCaller + ' statement failed to execute:', sQuery, tRow) 
+                                warning('func: ' + sCaller + ' Unexpected error:', e)
+
+                        self.addRowCount(cursor, sTable, iChunkNew)
+                        self.conn.commit()
+
+                    except (MySQLdb.InterfaceError, MySQLdb.OperationalError) as e:
+
+                        # rows executed since the rollback weren't committed, so none of this chunk counts
+                        warning('func: ' + sCaller + ' connection lost retrying row by row, giving up after', iInserted, 'of', len(lRows), 'rows:', e)
+
+                        self.rollback(sCaller)
+
+                        return iInserted
+
+                    iInserted += iChunkInserted
+
+        return iInserted
+
+    ###
+    # roll back the open transaction; False (with a warning) if the connection is gone
+    ###
+    def rollback(self, sCaller='rollback()'):
+
+        try:
+
+            self.conn.rollback()
+            return True
+
+        except (MySQLdb.InterfaceError, MySQLdb.OperationalError) as e:
+
+            warning('func: ' + sCaller + ' rollback failed, connection lost:', e)
+            return False
+
+    ###
+    # add iRows to sTable's rowCounts counter (see migrateRowCounts()) in the open transaction, so the count commits or rolls
+    # back with the rows. a database without rowCounts yet is left alone, countRows() falls back to COUNT(*) there
+    ###
+    def addRowCount(self, cursor, sTable, iRows):
+
+        if sTable not in self.lCountedTables or not iRows: return
+
+        sQuery = 'UPDATE rowCounts SET numRows = numRows + %s WHERE tableName = %s AND shard = CONNECTION_ID() %% %s;'
+
+        try:
+
+            cursor.execute(sQuery, (iRows, sTable, self.iRowCountShards))
+
+        except (MySQLdb.InternalError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+
+            debug('func: addRowCount() no counter for', sTable + ':', e)
+
+    ###
+    # number of distinct natural keys in lRows (tuples ordered like lCols) that aren't in sTable yet, i.e. the rows an upsert
+    # of lRows adds; 0 for tables without counters. two connections upserting the same new key at once both count it,
+    # migrateRowCounts() reseeds
+    ###
+    def newRows(self, cursor, sTable, lCols, lRows):
+
+        if sTable not in self.lCountedTables: return 0
+
+        lKeyCols = self.dUpsertKeys[sTable]
+        lIndexes = [lCols.index(sCol) for sCol in lKeyCols]
+
+        lKeys = list( set( [tuple( [tRow[iIndex] for iIndex in lIndexes] ) for tRow in lRows] ) )
+
+        iExisting = 0
+
+        if sTable in self.dNaturalKeys and not self.bSqlite:
+
+            # keyHash stands in for the natural key on mysql (see self.dNaturalKeys)
+            sWhere = 'keyHash IN ('
+            sKey = 'UNHEX(SHA1(CONCAT_WS(CHAR(0), ' + ','.join( ['%s'] * len(lKeyCols) ) + ')))'
+
+        else:
+
+            # sqlite takes row values as a VALUES list
+            sWhere = '(' + ','.join(lKeyCols) + ') IN (' + ('VALUES ' if self.bSqlite else '')
+            sKey = '(' + ','.join( ['%s'] * len(lKeyCols) ) + ')'
+
+        # bounded statements, old sqlite builds take at most 999 parameters
+        for iStart in range(0, len(lKeys), 200):
+
+            lBatch = lKeys[iStart:iStart + 200]
+
+            cursor.execute('SELECT COUNT(*) FROM ' + sTable + ' WHERE ' + sWhere + ','.join( [sKey] * len(lBatch) ) + ');', tuple( [value for tKey in lBatch for value in tKey] ))
+
+            iExisting += int( cursor.fetchone()[0] )
+
+        return len(lKeys) - iExisting
+
+    ###
+    # ON DUPLICATE KEY UPDATE suffix overwriting lCols with the incoming values
+    ###
+    def upsertClause(self, lCols):
+
+        return ' ON DUPLICATE KEY UPDATE ' + ','.join( [sCol + '=VALUES(' + sCol + ')' for sCol in lCols] )
+
+    ###
+    def insertIntoProjects(self, lProjects, bUpsert=False, bDebug=False):
+
+        lRows = []
+
+        lArgs = ['bytecode_available', 'source', 'c', 'cpp', 'csharp', 'java']
+
+        for dProject in lProjects:
+
+            if '_source' in dProject:
+
+                dSource = dProject['_source']
+
+                if bDebug: debug( 'func: insertIntoProjects()', json.dumps(dSource, indent=4) ) 
+
+                lRow = []
+
+                for sArg in lArgs:
+
+                    if sArg in dSource:
+
+                        lRow.append( int( dSource[sArg] ) )
+
+                    else:
+
+                        lRow.append(0)
+
+                for sArg in ['codeDir','site']:
+
+                    if sArg in dSource and dSource[sArg]:
+
+                        lRow.append( dSource[sArg] )
+
+                    else:
+
+                        lRow.append(None)
+
+                lRow.append( dSource['name'] )
+
+                lRows.append( tuple(lRow) )
+
+        return self.insertRows('projects', lArgs + ['codeDir','site','projectName'], lRows, sCaller='insertIntoProjects()', bUpsert=bUpsert, bDebug=bDebug)
+
+    ###
+    def insertIntoBuildTargets(self, lTargets, bUpsert=False, bDebug=False):
+
+        lRows = []
+
+        lRequiredArgs = self.dTables['buildTargets']['cols']
+
+        for dArgs in lTargets:
+
+            # verify required arguments are all included
+            lArgNames = dArgs.keys()
+
+            bMissingArg = False
+            lMissingArgs = []
+
+            for sRequiredArg in lRequiredArgs:
+
+                if sRequiredArg not in lArgNames:
+
+                    bMissingArg = True
+                    lMissingArgs.append(sRequiredArg)
+
+            if bMissingArg:
+
+                warning('func: insertIntoBuildTargets() missing required arguments:', lMissingArgs) 
+
+            else:
+
+                # sProjectName, sProjectPath, sBuildTargetPath, bConfigureBuildType=False, bConfigureacBuildType=False, bConfigureinBuildType=False, bCmakeBuildType=False, bMakefileBuildType=False, bAntBuildType=False, bMavenBuildType=False, iDepth=0, 
+
+                lRow = [ dArgs['projectName'], dArgs['projectPath'], dArgs['buildTargetPath'] ]
+
+                for sBuildType in self.lBuildTypes:
+
+                    lRow.append( int(dArgs[sBuildType]) )
+
+                lRow.append( dArgs['ranking'] )
+                lRow.append( dArgs['depth'] )
+
+                lRows.append( tuple(lRow) )
+
+        return self.insertRows('buildTargets', lRequiredArgs, lRows, sCaller='insertIntoBuildTargets()', bUpsert=bUpsert, bDebug=bDebug)
+
+    ###
+    def insertIntoSourceTargets(self, lTargets, bUpsert=False, bDebug=False):
+
+        lRows = []
+
+        lRequiredArgs = self.dTables['sourceTargets']['cols']
+
+        for dArgs in lTargets:
+
+            # verify required arguments are all included
+            lArgNames = dArgs.keys()
+
+            bMissingArg = False
+            lMissingArgs = []
+
+            for sRequiredArg in lRequiredArgs:
+
+                if sRequiredArg not in lArgNames:
+
+                    bMissingArg = True
+                    lMissingArgs.append(sRequiredArg)
+
+            if bMissingArg:
+
+                warning('func: insertIntoSourceTargets() missing required arguments:', lMissingArgs) 
+
+            else:
+
+                lRows.append( (dArgs['projectName'], dArgs['projectPath'], dArgs['buildTargetPath'], int(dArgs['cBuildType']), int(dArgs['cppBuildType'])) )
+
+        return self.insertRows('sourceTargets', lRequiredArgs, lRows, sCaller='insertIntoSourceTargets()', bUpsert=bUpsert, bDebug=bDebug)
+
+    ###
+    # escape a value for the LOAD DATA default field format (tab separated, backslash escaped, \N for NULL)
+    ###
+    def tsvField(self, value):
+
+        if value is None: return '\\N'
+
+        if isinstance(value, bool): value = int(value)
+
+        if isinstance(value, unicode): value = value.encode('utf-8')
+        else: value = str(value)
+
+        return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r').replace('\0', '\\0')
+
+    ###
+    # a bulkLoad() row as a tuple ordered like lCols; None (with a warning) for a dict missing some of lCols
+    ###
+    def bulkRow(self, row, lCols):
+
+        if isinstance(row, dict):
+
+            lMissingArgs = [sCol for sCol in lCols if sCol not in row]
+
+            if lMissingArgs:
+
+                warning('func: bulkLoad() missing required arguments:', lMissingArgs)
+                return None
+
+            return tuple( [row[sCol] for sCol in lCols] )
+
+        return tuple(row)
+
+    ###
+    # bulk ingestion path; spools lRows to a local TSV file and loads it with LOAD DATA LOCAL INFILE
+    # rows are dicts holding the table's cols (as passed to insertIntoBuildTargets/insertIntoSourceTargets) or tuples ordered like lCols
+    # returns the number of rows loaded; with bUpsert rows matching an existing natural key replace it, otherwise they are skipped
+    ###
+    def bulkLoad(self, sTable, lRows, lCols=None, bUpsert=False, bDebug=False):
+
+        iLoaded = 0
+
+        if sTable not in self.lTables:
+
+            warning('func: bulkLoad() invalid table provided sTable:', sTable)
+            warning('func: bulkLoad() valid values for sTable are:', self.lTables)
+            return iLoaded
+
+        if not lRows: return iLoaded
+
+        if not lCols: lCols = self.dTables[sTable]['cols']
+
+        if self.bSqlite:
+
+            # no LOAD DATA in sqlite; batched INSERTs are its bulk path
+            lTuples = [self.bulkRow(row, lCols) for row in lRows]
+
+            return self.insertRows(sTable, lCols, [tRow for tRow in lTuples if tRow is not None], sCaller='bulkLoad()', bUpsert=bUpsert, bDebug=bDebug)
+
+        if not self.ready(): self.open()
+
+        (iFd, sPath) = tempfile.mkstemp(prefix=sTable + '_', suffix='.tsv')
+
+        iWritten = 0
+
+        try:
+
+            with os.fdopen(iFd, 'wb') as fTsv:
+
+                for row in lRows:
+
+                    row = self.bulkRow(row, lCols)
+
+                    if row is None: continue
+
+                    fTsv.write( '\t'.join( [self.tsvField(value) for value in row] ) + '\n' )
+                    iWritten += 1
+
+            sQuery = 'LOAD DATA LOCAL INFILE \'' + sPath + '\' ' + ('REPLACE ' if bUpsert else '') + 'INTO TABLE ' + sTable + ' CHARACTER SET utf8 (' + ','.join(lCols) + ');'
+
+            with closing( self.cursor() ) as cursor:
+
+                try:
+
+                    if bDebug: debug('func: bulkLoad()', sQuery, iWritten, 'rows')
+
+                    cursor.execute('USE ' + self.db + ';')
+                    cursor.execute(sQuery)
+
+                    iLoaded = cursor.rowcount
+
+                    # a replaced row counts twice (delete + insert), so REPLACE added 2 * iWritten - iLoaded rows
+                    self.addRowCount(cursor, sTable, 2 * iWritten - iLoaded if bUpsert else iLoaded)
+                    self.conn.commit()
+
+                    if iLoaded != iWritten and not bUpsert: warning('func: bulkLoad() loaded', iLoaded, 'of', iWritten, 'rows into', sTable)
+
+                except (UnicodeEncodeError, MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+
+                    warning('func: bulkLoad() statement failed to execute:', sQuery) 
+                    warning('func: bulkLoad() Unexpected error:', e)
+
+        finally:
+
+            os.remove(sPath)
+
+        return iLoaded
+
+    ###
+    # drop sTable's secondary indexes ahead of an initial bulk fill; definitions are kept for rebuildIndexes()
+    # (ALTER TABLE ... DISABLE KEYS is a no-op on InnoDB); unique keys stay so duplicate targets are still rejected
+    ###
+    def disableIndexes(self, sTable, bDebug=False):
+
+        dIndexes = {}
+
+        if not self.ready(): self.open()
+
+        with closing( self.cursor() ) as cursor:
+
+            try:
+
+                cursor.execute('USE ' + self.db + ';')
+                cursor.execute('SHOW INDEX FROM ' + sTable + ';')
+
+                # Table, Non_unique, Key_name, Seq_in_index, Column_name, ...
+                for tRow in cursor.fetchall():
+
+                    if tRow[2] == 'PRIMARY' or not tRow[1]: continue
+
+                    if tRow[2] not in dIndexes: dIndexes[ tRow[2] ] = { 'unique': not tRow[1], 'cols': [] }
+
+                    dIndexes[ tRow[2] ]['cols'].append( (tRow[3], tRow[4]) )
+
+                if dIndexes:
+
+                    sQuery = 'ALTER TABLE ' + sTable + ' ' + ', '.join( ['DROP INDEX ' + sIndex for sIndex in dIndexes] ) + ';'
+
+                    if bDebug: debug('func: disableIndexes()', sQuery) 
+
+                    cursor.execute(sQuery)
+                    self.conn.commit()
+
+            except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+
+                warning('func: disableIndexes() failed on table:', sTable) 
+                warning('func: disableIndexes() Unexpected error:', e)
+                return {}
+
+        self.dDisabledIndexes[sTable] = dIndexes
+
+        return dIndexes
+
+    ###
+    # re-create the secondary indexes dropped by disableIndexes() in a single ALTER TABLE (one rebuild pass), then add any
+    # declared index (self.dIndexes) still missing, e.g. when the process that dropped them died before rebuilding
+    ###
+    def rebuildIndexes(self, sTable, dIndexes=None, bDebug=False):
+
+        if dIndexes is None: dIndexes = self.dDisabledIndexes.get(sTable, {})
+
+        if dIndexes: self.rebuildDisabledIndexes(sTable, dIndexes, bDebug=bDebug)
+
+        return self.migrateIndexes(lTables=[sTable], bDebug=bDebug)
+
+    ###
+    # single ALTER TABLE re-creating dIndexes (as recorded by disableIndexes()) on sTable
+    ###
+    def rebuildDisabledIndexes(self, sTable, dIndexes, bDebug=False):
+
+        if not self.ready(): self.open()
+
+        lAdds = []
+
+        for (sIndex, dIndex) in sorted(dIndexes.items()):
+
+            sCols = ','.join( [sCol for (iSeq, sCol) in sorted(dIndex['cols'])] )
+
+            if dIndex['unique']: lAdds.append('ADD UNIQUE INDEX ' + sIndex + ' (' + sCols + ') USING BTREE')
+            else: lAdds.append('ADD INDEX ' + sIndex + ' (' + sCols + ') USING BTREE')
+
+        sQuery = 'ALTER TABLE ' + sTable + ' ' + ', '.join(lAdds) + ';'
+
+        with closing( self.cursor() ) as cursor:
+
+            try:
+
+                if bDebug: debug('func: rebuildDisabledIndexes()', sQuery) 
+
+                cursor.execute('USE ' + self.db + ';')
+                cursor.execute(sQuery)
+                self.conn.commit()
+
+                self.dDisabledIndexes.pop(sTable, None)
+
+            except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+
+                warning('func: rebuildDisabledIndexes() statement failed to execute:', sQuery) 
+                warning('func: rebuildDisabledIndexes() Unexpected error:', e)
+
+    ###
+    # index migration; adds the indexes in self.dIndexes that are missing and re-creates the ones whose columns differ
+    # returns { table: { 'ok': [...], 'added': [...], 'rebuilt': [...] } }; with bDryRun nothing is altered. lTables limits it to those tables
+    ###
+    def migrateIndexes(self, bDryRun=False, lTables=None, bDebug=False):
+
+        dReport = {}
+
+        if not self.ready(): self.open()
+
+        with closing( self.cursor() ) as cursor:
+
+            for sTable in sorted(self.dIndexes.keys()):
+
+                if lTables is not None and sTable not in lTables: continue
+
+                dReport[sTable] = { 'ok': [], 'added': [], 'rebuilt': [] }
+                dExisting = {}
+                lAlters = []
+
+                try:
+
+                    cursor.execute('USE ' + self.db + ';')
+                    cursor.execute('SHOW INDEX FROM ' + sTable + ';')
+
+                    # Table, Non_unique, Key_name, Seq_in_index, Column_name, Collation, Cardinality, Sub_part, ...
+                    for tRow in cursor.fetchall():
+
+                        sCol = tRow[4]
+                        if tRow[7]: sCol += '(' + str(tRow[7]) + ')'
+
+                        dExisting.setdefault(tRow[2], []).append( (tRow[3], sCol) )
+
+                    for (sIndex, lCols) in self.dIndexes[sTable]:
+
+                        # sqlite indexes whole columns, there are no prefix lengths to compare
+                        if self.bSqlite: lCompareCols = [sCol.split('(')[0] for sCol in lCols]
+                        else: lCompareCols = lCols
+
+                        if sIndex in dExisting:
+
+                            if [sCol for (iSeq, sCol) in sorted(dExisting[sIndex])] == lCompareCols:
+
+                                dReport[sTable]['ok'].append(sIndex)
+                                continue
+
+                            lAlters.append('DROP INDEX ' + sIndex)
+                            dReport[sTable]['rebuilt'].append(sIndex)
+
+                        else:
+
+                            dReport[sTable]['added'].append(sIndex)
+
+                        lAlters.append('ADD INDEX ' + sIndex + ' (' + ','.join(lCols) + ') USING BTREE')
+
+                    if lAlters and not bDryRun:
+
+                        # one ALTER TABLE per table so it is only rebuilt once
+                        sQuery = 'ALTER TABLE ' + sTable + ' ' + ', '.join(lAlters) + ';'
+
+                        if bDebug: debug('func: migrateIndexes()', sQuery) 
+
+                        cursor.execute(sQuery)
+                        self.conn.commit()
+
+                except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+
+                    warning('func: migrateIndexes() failed on table:', sTable, lAlters) 
+                    warning('func: migrateIndexes() Unexpected error:', e)
+
+        return dReport
+
+    ###
+    # EXPLAIN SELECT * for each view; returns { view: [ { explain column: value } ] } with a 'problems' list per plan row
+    # flagging full table scans (type ALL), temporary tables and filesorts
+    ###
+    def explainViews(self, lViews=None, bDebug=False):
+
+        dPlans = {}
+
+        if not lViews: lViews = self.lViews
+
+        if not self.ready(): self.open()
+
+        with closing( self.cursor() ) as cursor:
+
+            for sView in lViews:
+
+                sQuery = 'EXPLAIN SELECT * FROM ' + sView + ';'
+
+                try:
+
+                    if bDebug: debug('func: explainViews()', sQuery) 
+
+                    cursor.execute('USE ' + self.db + ';')
+                    cursor.execute(sQuery)
+
+                    lNames = [tCol[0] for tCol in cursor.description]
+                    dPlans[sView] = []
+
+                    for tRow in cursor.fetchall():
+
+                        dRow = dict( zip(lNames, tRow) )
+                        dRow['problems'] = []
+
+                        if dRow.get('type') == 'ALL': dRow['problems'].append('full scan')
+                        if 'Using temporary' in (dRow.get('Extra') or ''): dRow['problems'].append('temporary table')
+                        if 'Using filesort' in (dRow.get('Extra') or ''): dRow['problems'].append('filesort')
+
+                        # sqlite's EXPLAIN QUERY PLAN: id, parent, notused, detail
+                        if (dRow.get('detail') or '').startswith('SCAN ') and ' USING ' not in dRow['detail']: dRow['problems'].append('full scan')
+                        if 'USE TEMP B-TREE' in (dRow.get('detail') or ''): dRow['problems'].append('temporary table')
+
+                        dPlans[sView].append(dRow)
+
+                except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+
+                    warning('func: explainViews() statement failed to execute:', sQuery) 
+                    warning('func: explainViews() Unexpected error:', e)
+
+        return dPlans
+
+    ###
+    #
+    ###
+    def verifyEncoding(self, sOriginal):
+
+        sTransformed = ''
+
+        try:
+
+            sTransformed = sOriginal.encode('utf-8')
+            #sTransformed = sOriginal.decode('utf-8')
+
+        except (ValueError, UnicodeDecodeError, UnicodeEncodeError) as e:
+
+            try:
+
+                sTransformed = sOriginal.encode('latin-1')
+                #sTransformed = sOriginal.decode('latin-1')
+
+            except (ValueError, UnicodeDecodeError, UnicodeEncodeError) as e:
+
+                try:
+
+                    sTransformed = sOriginal.encode('utf-16')
+                    #sTransformed = sOriginal.decode('utf-16')
+
+                except (ValueError, UnicodeDecodeError, UnicodeEncodeError) as e:
+
+                    warning('func verifyEncoding(): failed to transform sOriginal:', sOriginal, 'with utf-8, latin-1 and utf-16', e)
+                    sTransformed = ''
+
+        return sTransformed
+
+    ###
+    def insertIntoBuildStatusTargets(self, dArgs, bUpsert=False, bDebug=False):
+
+        iInserted = 0
+
+        # verify required arguments are all included
+        lArgNames = dArgs.keys()
+
+        lRequiredArgs = self.dTables['buildStatusTargets']['colsNoBools'] + ['targets']
+        lRequiredArgs.remove('buildTargetPath')
+        lRequiredArgs.remove('builder')
+
+        bMissingArg = False
+        lMissingArgs = []
+
+        for sRequiredArg in lRequiredArgs:
+
+            if sRequiredArg not in lArgNames:
+
+                bMissingArg = True
+                lMissingArgs.append(sRequiredArg)
+
+        if bMissingArg:
+
+            warning('func: insertIntoBuildStatusTargets() missing required arguments:', lMissingArgs) 
+
+        else:
+
+            iInserted = self.insertRows('buildStatusTargets', self.lBuildStatusTargetsInsertCols, self.buildStatusTargetRows(dArgs), sCaller='insertIntoBuildStatusTargets()', bUpsert=bUpsert, bDebug=bDebug)
+
+        return iInserted
+
+    ###
+    # buildStatusTargets rows (ordered like self.lBuildStatusTargetsInsertCols) for one build's dArgs['targets'];
+    # every row carries all of the build type columns so the whole build goes out as one multi-row INSERT
+    ###
+    def buildStatusTargetRows(self, dArgs):
+
+        lRows = []
+
+        for dTarget in dArgs['targets']:
+
+            lRow = [ dArgs['projectName'], dArgs['projectPath'], self.verifyEncoding(dTarget['buildTargetPath']), dArgs['buildTarPath'] ]
+
+            for sBuildType in self.lAllTypes:
+
+                lRow.append( int(sBuildType == dTarget['buildType']) )
+
+            lRow += [ dArgs.get('builder'), dArgs['version'], dArgs['os'], dTarget['returnCode'] ]
+
+            lRows.append( tuple(lRow) )
+
+        return lRows
+
+    ###
+    # buildStatus row (ordered like self.dTables['buildStatus']['cols']) for one build
+    ###
+    def buildStatusRow(self, dArgs):
+
+        return (dArgs['projectName'], dArgs['projectPath'], dArgs['buildTarPath'], dArgs.get('builder') or None, str(dArgs['buildTime']), dArgs['version'], dArgs['os'], str(dArgs['numObjectsPreBuild']), str(dArgs['numObjectsPostBuild']), str(dArgs['numObjectsGenerated']), str(dArgs['numSources']), str(dArgs['returnCode']))
+
+    ###
+    # insertIntoBuildStatusTargets + insertIntoBuildStatus for a batch of builds: the target rows of every build go out as
+    # one multi-row INSERT, the status rows as another, then the summaries are brought up to date
+    # returns True if every row was written
+    ###
+    def insertIntoBuildStatusBatch(self, lBuilds, bUpsert=False, bDebug=False):
+
+        lRequiredArgs = [sCol for sCol in self.dTables['buildStatus']['cols'] if sCol != 'builder'] + ['targets']
+
+        lTargetRows = []
+        lStatusRows = []
+        lWritten = []
+
+        for dArgs in lBuilds:
+
+            lMissingArgs = [sArg for sArg in lRequiredArgs if sArg not in dArgs]
+
+            if lMissingArgs:
+
+                warning('func: insertIntoBuildStatusBatch() missing required arguments:', lMissingArgs, 'for project:', dArgs.get('projectName'))
+                continue
+
+            lTargetRows += self.buildStatusTargetRows(dArgs)
+            lStatusRows.append( self.buildStatusRow(dArgs) )
+            lWritten.append(dArgs)
+
+        iTargets = self.insertRows('buildStatusTargets', self.lBuildStatusTargetsInsertCols, lTargetRows, sCaller='insertIntoBuildStatusBatch()', bUpsert=bUpsert, bDebug=bDebug)
+        iStatuses = self.insertRows('buildStatus', self.dTables['buildStatus']['cols'], lStatusRows, sCaller='insertIntoBuildStatusBatch()', bUpsert=bUpsert, bDebug=bDebug)
+
+        if iStatuses != len(lStatusRows):
+
+            # insertRows() doesn't say which rows failed, so leave the summaries to the retry of the whole batch
+            # (the caller spills it and the upserts rewrite it) rather than count builds that aren't in buildStatus
+            warning('func: insertIntoBuildStatusBatch() only', iStatuses, 'of', len(lStatusRows), 'buildStatus rows written, summaries not updated')
+            return False
+
+        for dArgs in lWritten:
+
+            self.updateBuildSummaries(dArgs, bDebug=bDebug)
+
+        return iTargets == len(lTargetRows)
+
+    ###
+    def insertIntoBuildStatus(self, dArgs, bUpsert=False, bDebug=False):
+
+        lQueries = []
+
+        if not self.ready(): self.open()
+        else: lQueries.append( ('USE ' + self.db + ';', None) )
+
+        # verify required arguments are all included
+        lArgNames = dArgs.keys()
+
+        lRequiredArgs = list(self.dTables['buildStatus']['cols'])
+        lRequiredArgs.remove('builder')
+
+        bMissingArg = False
+        lMissingArgs = []
+
+        for sRequiredArg in lRequiredArgs:
+
+            if sRequiredArg not in lArgNames:
+
+                bMissingArg = True
+                lMissingArgs.append(sRequiredArg)
+
+        if bMissingArg:
+
+            warning('func: insertIntoBuildStatus() missing required arguments:', lMissingArgs) 
+
+        else:
+
+            sQuery = 'INSERT INTO buildStatus ('
+            sQuery += 'projectName,'
+            sQuery += 'projectPath,'
+            sQuery += 'buildTarPath,'
+            sQuery += 'builder,'
+            sQuery += 'buildTime,'
+            sQuery += 'version,'
+            sQuery += 'os,'
+            sQuery += 'numObjectsPreBuild,'
+            sQuery += 'numObjectsPostBuild,'
+            sQuery += 'numObjectsGenerated,'
+            sQuery += 'numSources,'
+            sQuery += 'returnCode) VALUES ('
+
+            sQuery += ','.join( ['%s'] * 12 ) + ')'
+
+            # bound rather than escaped into the statement so it works on the sqlite backend too
+            tArgs = self.buildStatusRow(dArgs)
+
+            if bUpsert: sQuery += self.upsertClause( ['projectPath','builder','buildTime','version','os','numObjectsPreBuild','numObjectsPostBuild','numObjectsGenerated','numSources','returnCode'] )
+
+            sQuery += ';'
+            lQueries.append( (sQuery, tArgs) )
+
+            bInserted = True
+
+            with closing( self.cursor() ) as cursor:
+
+                #execute mysql statements
+                for (sQuery, tArgs) in lQueries:
+
+                    try:
+
+                        if bDebug: debug('func: insertIntoBuildStatus()', sQuery, tArgs) 
+
+                        # USE has no args
+                        iNew = self.newRows(cursor, 'buildStatus', self.dTables['buildStatus']['cols'], [tArgs]) if bUpsert and tArgs else None
+
+                        cursor.execute(sQuery, tArgs)
+
+                        if tArgs: self.addRowCount(cursor, 'buildStatus', cursor.rowcount if iNew is None else iNew)
+
+                        self.conn.commit()
+                
+                    except (UnicodeEncodeError, MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+                
+                        warning('func: insertIntoBuildStatus() statement failed to execute:', sQuery, tArgs) 
+                        warning('func: insertIntoBuildStatus() Unexpected error:', e)
+                        bInserted = False
+                        break
+
+            # keep the materialized build summaries current
+            if bInserted: self.updateBuildSummaries(dArgs, bDebug=bDebug)
+
+    ###
+    # build outcome of a buildStatus row as stored in the summary tables
+    ###
+    def buildStatusRank(self, iReturnCode, iNumObjectsGenerated):
+
+        if int(iReturnCode) == 0: return 0
+        if int(iNumObjectsGenerated) > 0: return 1
+
+        return 2
+
+    ###
+    # incremental maintenance of the summary tables for one new buildStatus row (called from insertIntoBuildStatus)
+    #
+    # the project's best status per os and overall only ever improves, so a build either adds the project to the
+    # counts (first build) or moves it from its old status to a better one; runs in one transaction, concurrent
+    # builds of the same project are serialized by the row locks. the first builds of a project on two os can both find
+    # no projectBuildStatus row and both insert it; the loser gets a deadlock or duplicate key and the transaction is
+    # retried, by then the row is there. rebuildSummaries() corrects any drift
+    ###
+    def updateBuildSummaries(self, dArgs, bDebug=False):
+
+        iStatus = self.buildStatusRank(dArgs['returnCode'], dArgs['numObjectsGenerated'])
+        sQuery = ''
+
+        with closing( self.cursor() ) as cursor:
+
+            for iAttempt in range(1, self.iSummaryAttempts + 1):
+
+                try:
+
+                    cursor.execute('USE ' + self.db + ';')
+
+                    sQuery = 'SELECT site FROM projects WHERE projectName = %s;'
+                    cursor.execute(sQuery, (dArgs['projectName'], ))
+                    tRow = cursor.fetchone()
+
+                    sSite = (tRow[0] if tRow else '') or ''
+
+                    # (status table, key cols, key values, os value used in the counts)
+                    lScopes = [
+                        ('projectOSBuildStatus', 'projectName = %s AND os = %s', (dArgs['projectName'], dArgs['os']), dArgs['os']),
+                        ('projectBuildStatus', 'projectName = %s', (dArgs['projectName'], ), '*')
+                    ]
+
+                    for (sTable, sWhere, tKey, sOS) in lScopes:
+
+                        sQuery = 'SELECT status FROM ' + sTable + ' WHERE ' + sWhere + ' FOR UPDATE;'
+                        cursor.execute(sQuery, tKey)
+                        tRow = cursor.fetchone()
+
+                        iOldStatus = tRow[0] if tRow else None
+
+                        if iOldStatus is not None and iOldStatus <= iStatus: continue
+
+                        if iOldStatus is None:
+
+                            if sTable == 'projectOSBuildStatus': sQuery = 'INSERT INTO projectOSBuildStatus (projectName, os, site, status) VALUES (%s, %s, %s, %s);'
+                            else: sQuery = 'INSERT INTO projectBuildStatus (projectName, site, status) VALUES (%s, %s, %s);'
+
+                            cursor.execute(sQuery, tKey + (sSite, iStatus))
+
+                        else:
+
+                            sQuery = 'UPDATE ' + sTable + ' SET status = %s WHERE ' + sWhere + ';'
+                            cursor.execute(sQuery, (iStatus, ) + tKey)
+
+                        dDeltas = { self.lSummaryStatuses[iStatus]: 1 }
+
+                        if iOldStatus is None: dDeltas['totals'] = 1
+                        else: dDeltas[ self.lSummaryStatuses[iOldStatus] ] = -1
+
+                        sQuery = 'INSERT INTO buildStatusCounts (site, os, builds, projectCount) VALUES (%s, %s, %s, %s) ON DUPLICATE KEY UPDATE projectCount = projectCount + VALUES(projectCount);'
+
+                        for sSiteKey in [sSite, '*']:
+
+                            for (sBuilds, iDelta) in dDeltas.items():
+
+                                cursor.execute(sQuery, (sSiteKey, sOS, sBuilds, iDelta))
+
+                    self.conn.commit()
+
+                    return True
+
+                except (UnicodeEncodeError, MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+
+                    bRolledBack = self.rollback('updateBuildSummaries()')
+
+                    # deadlock / duplicate key from a concurrent build of the same project, nothing of this attempt was kept
+                    if bRolledBack and self.isRetryableError(e) and iAttempt < self.iSummaryAttempts:
+
+                        if bDebug: debug('func: updateBuildSummaries() attempt', iAttempt, 'lost a race, retrying:', e)
+                        continue
+
+                    warning('func: updateBuildSummaries() statement failed to execute:', sQuery) 
+                    warning('func: updateBuildSummaries() Unexpected error:', e)
+                    warning('func: updateBuildSummaries() summaries may be stale for project:', dArgs['projectName'], 'run projectDB.py --rebuild-summaries')
+
+                    return False
+
+        return False
+
+    ###
+    # deadlock (1213) or duplicate key (1062) errors; the statement lost a race with a concurrent transaction and
+    # rerunning the whole transaction sees that transaction's rows
+    ###
+    def isRetryableError(self, e):
+
+        return bool(e.args) and e.args[0] in (1062, 1213)
+
+    ###
+    # full rebuild of the summary tables from buildStatus, projects and buildTopTargets
+    ###
+    def rebuildSummaries(self, bDebug=False):
+
+        lQueries = []
+
+        if not self.ready(): self.open()
+        else: lQueries.append('USE ' + self.db + ';')
+
+        sStatus = 'CASE WHEN b.returnCode = 0 THEN 0 WHEN b.numObjectsGenerated > 0 THEN 1 ELSE 2 END'
+        sBuilds = 'ELT(status + 1, \'' + '\',\''.join(self.lSummaryStatuses) + '\')'
+
+        for sTable in ['projectBuildStatus', 'projectOSBuildStatus', 'buildStatusCounts']:
+
+            lQueries.append('TRUNCATE TABLE ' + sTable + ';')
+
+        lQueries.append('INSERT INTO projectOSBuildStatus (projectName, os, site, status) SELECT b.projectName, b.os, COALESCE(MAX(p.site), \'\'), MIN(' + sStatus + ') FROM buildStatus b LEFT JOIN projects p USING (projectName) GROUP BY b.projectName, b.os;')
+        lQueries.append('INSERT INTO projectBuildStatus (projectName, site, status) SELECT projectName, MAX(site), MIN(status) FROM projectOSBuildStatus GROUP BY projectName;')
+
+        # per site/os, all sites per os, per site over all os, everything
+        lGroups = [
+            ('site', 'os', 'projectOSBuildStatus', 'site, os'),
+            ('\'*\'', 'os', 'projectOSBuildStatus', 'os'),
+            ('site', '\'*\'', 'projectBuildStatus', 'site'),
+            ('\'*\'', '\'*\'', 'projectBuildStatus', '')
+        ]
+
+        for (sSiteExpr, sOSExpr, sTable, sGroupBy) in lGroups:
+
+            sGroupByStatus = 'GROUP BY ' + (sGroupBy + ', ' if sGroupBy else '') + 'status'
+            lQueries.append('INSERT INTO buildStatusCounts (site, os, builds, projectCount) SELECT ' + sSiteExpr + ', ' + sOSExpr + ', ' + sBuilds + ', COUNT(*) FROM ' + sTable + ' ' + sGroupByStatus + ';')
+            lQueries.append('INSERT INTO buildStatusCounts (site, os, builds, projectCount) SELECT ' + sSiteExpr + ', ' + sOSExpr + ', \'totals\', COUNT(*) FROM ' + sTable + (' GROUP BY ' + sGroupBy if sGroupBy else '') + ';')
+
+        with closing( self.cursor() ) as cursor:
+
+            #execute mysql statements
+            for sQuery in lQueries:
+                
+                try:
+
+                    if bDebug: debug('func: rebuildSummaries()', sQuery) 
+
+                    cursor.execute(sQuery)
+                    self.conn.commit()
+            
+                except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+                    warning('func: rebuildSummaries() statement failed to execute:', sQuery) 
+                    warning('func: rebuildSummaries() Unexpected error:', e)
+                    break    
+
+        self.rebuildTopTargets(bDebug=bDebug)
+
+    ###
+    # refresh topTargets (the top ranked build targets of every project, with its site) from buildTopTargets and record
+    # the buildTargets row count it was refreshed from in summaryRefreshes; returns False if the refresh failed
+    # (queueProjectsToBuildByType.py --analyze-projects refreshes it once the build targets are in)
+    ###
+    def rebuildTopTargets(self, bDebug=False):
+
+        # counted first so rows added while the refresh runs make topTargets look stale rather than current
+        iSourceRows = self.countRows('buildTargets', bDebug=bDebug)
+
+        lQueries = []
+
+        if not self.ready(): self.open()
+        else: lQueries.append('USE ' + self.db + ';')
+
+        sCols = ','.join( self.dTables['topTargets']['cols'][:-1] )
+
+        lQueries.append('TRUNCATE TABLE topTargets;')
+        lQueries.append('INSERT INTO topTargets (' + sCols + ',site) SELECT ' + ','.join( ['t.' + sCol for sCol in sCols.split(',')] ) + ',p.site FROM buildTopTargets t LEFT JOIN projects p USING (projectName);')
+
+        with closing( self.cursor() ) as cursor:
+
+            #execute mysql statements
+            for sQuery in lQueries:
+                
+                try:
+
+                    if bDebug: debug('func: rebuildTopTargets()', sQuery) 
+
+                    cursor.execute(sQuery)
                     self.conn.commit()
             
-                except (UnicodeEncodeError, MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
-            
-                    warning('func: insertIntoSourceTargets() statement failed to execute:', sQuery) 
-                    warning('func: insertIntoSourceTargets() Unexpected error:', e)
-                    break
+                except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+                    warning('func: rebuildTopTargets() statement failed to execute:', sQuery) 
+                    warning('func: rebuildTopTargets() Unexpected error:', e)
+                    return False
+
+        return self.insertRows('summaryRefreshes', ['tableName','refreshed','sourceRows'], [ ('topTargets', time.strftime('%Y-%m-%d %H:%M:%S'), iSourceRows) ], sCaller='rebuildTopTargets()', bUpsert=True, bDebug=bDebug) == 1
 
     ###
-    #
+    # why topTargets can't be trusted to queue from: None if it is current, otherwise the reason (empty, never
+    # refreshed, or buildTargets has changed since its last refresh)
     ###
-    def verifyEncoding(self, sOriginal):
+    def topTargetsStaleness(self, bDebug=False):
 
-        sTransformed = ''
-
-        try:
+        lQueries = []
 
-            sTransformed = sOriginal.encode('utf-8')
-            #sTransformed = sOriginal.decode('utf-8')
+        if not self.ready(): self.open()
+        else: lQueries.append( ('USE ' + self.db + ';', None) )
 
-        except (ValueError, UnicodeDecodeError, UnicodeEncodeError) as e:
+        lQueries.append( ('SELECT id FROM topTargets LIMIT 1;', None) )
+        lQueries.append( ('SELECT refreshed, sourceRows FROM summaryRefreshes WHERE tableName = %s;', ('topTargets', )) )
 
-            try:
+        lResults = []
 
-                sTransformed = sOriginal.encode('latin-1')
-                #sTransformed = sOriginal.decode('latin-1')
+        with closing( self.cursor() ) as cursor:
 
-            except (ValueError, UnicodeDecodeError, UnicodeEncodeError) as e:
+            for (sQuery, tArgs) in lQueries:
 
                 try:
 
-                    sTransformed = sOriginal.encode('utf-16')
-                    #sTransformed = sOriginal.decode('utf-16')
+                    if bDebug: debug('func: topTargetsStaleness()', sQuery, tArgs) 
 
-                except (ValueError, UnicodeDecodeError, UnicodeEncodeError) as e:
+                    cursor.execute(sQuery, tArgs)
 
-                    warning('func verifyEncoding(): failed to transform sOriginal:', sOriginal, 'with utf-8, latin-1 and utf-16', e)
-                    sTransformed = ''
+                    if sQuery.startswith('SELECT'): lResults.append( cursor.fetchone() )
 
-        return sTransformed
+                except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+
+                    warning('func: topTargetsStaleness() statement failed to execute:', sQuery) 
+                    warning('func: topTargetsStaleness() Unexpected error:', e)
+                    lResults.append(None)
 
+        (tTopTarget, tRefresh) = lResults
+
+        if not tTopTarget: return 'topTargets is empty'
+
+        if not tRefresh: return 'topTargets has no recorded refresh'
+
+        iSourceRows = self.countRows('buildTargets', bDebug=bDebug)
+
+        if iSourceRows != tRefresh[1]: return 'topTargets was refreshed at ' + str(tRefresh[0]) + ' from ' + str(tRefresh[1]) + ' build targets, buildTargets now has ' + str(iSourceRows)
+
+        return None
+
+    ###
+    # rows in sTable. the tables in self.lCountedTables are read from their rowCounts counters (O(1)), anything else
+    # (or a database migrateRowCounts() hasn't run on) with SELECT COUNT(*), which is a full index scan on InnoDB
+    # bEstimate: InnoDB's statistics from information_schema instead, no lock waits but can be off by tens of percent
+    # (sqlite has no estimate and counts exactly)
     ###
-    def insertIntoBuildStatusTargets(self, dArgs, bDebug=False):
+    def countRows(self, sTable, bDebug=False, bEstimate=False):
 
-        lQueries = []
+        iNumRows = 0
 
-        if not self.ready(): self.open()
-        else: lQueries.append('USE ' + self.db + ';')
+        if sTable in self.lTables:
 
-        # verify required arguments are all included
-        lArgNames = dArgs.keys()
+            # tried in order until one of them comes back with a count
+            lQueries = []
 
-        lRequiredArgs = self.dTables['buildStatusTargets']['colsNoBools'] + ['targets']
-        lRequiredArgs.remove('buildTargetPath')
-        lRequiredArgs.remove('builder')
+            if bEstimate and not self.bSqlite: lQueries.append( ('SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s;', (self.db, sTable)) )
+            if sTable in self.lCountedTables: lQueries.append( ('SELECT SUM(numRows) FROM rowCounts WHERE tableName = %s;', (sTable,)) )
 
-        bMissingArg = False
-        lMissingArgs = []
+            lQueries.append( ('SELECT COUNT(*) FROM ' + sTable + ';', None) )
 
-        for sRequiredArg in lRequiredArgs:
+            bUseDb = self.ready()
 
-            if sRequiredArg not in lArgNames:
+            if not bUseDb: self.open()
 
-                bMissingArg = True
-                lMissingArgs.append(sRequiredArg)
+            with closing( self.cursor() ) as cursor:
 
-        if bMissingArg:
+                if bUseDb: cursor.execute('USE ' + self.db + ';')
 
-            warning('func: insertIntoBuildStatusTargets() missing required arguments:', lMissingArgs) 
+                #execute mysql statements
+                for (iQuery, (sQuery, tArgs)) in enumerate(lQueries):
+
+                    try:
+
+                        if bDebug: debug('func: countRows()', sQuery, tArgs) 
+
+                        cursor.execute(sQuery, tArgs)
+
+                        tTup = cursor.fetchone()
+
+                        if tTup and tTup[0] is not None:
+          
+                            iNumRows = int( tTup[0] )
+                            break
+                
+                    except (ValueError, MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+
+                        # no rowCounts table yet, fall through to COUNT(*)
+                        if iQuery < len(lQueries) - 1:
+
+                            if bDebug: debug('func: countRows() falling back from:', sQuery, e)
+                            continue
+            
+                        warning('func: countRows() statement failed to execute:', sQuery) 
+                        warning('func: countRows() Unexpected error:', e)
 
         else:
 
-            for dTarget in dArgs['targets']:
+             warning('func: countRows() table provided sTable:', sTable)
+             warning('func: countRows() valid values for sTable are:', self.lTables)
+
+        return iNumRows
+
+    ###
+    def findAllBuildTypeProjectsFromTable(self, sBuildType, sTable, bDebug=False):
+
+        lProjects = []
 
-                sQuery = 'INSERT INTO buildStatusTargets ('
-                sQuery += 'projectName,'
-                sQuery += 'projectPath,'
-                sQuery += 'buildTargetPath,'
-                sQuery += 'buildTarPath,'
-                sQuery += dTarget['buildType'] + ','
-                sQuery += 'builder,'
-                sQuery += 'version,'
-                sQuery += 'os,'
-                sQuery += 'returnCode) VALUES ('
-                sQuery += '%s,' # projectName
-                sQuery += '%s,' # projectPath
-                sQuery += '%s,' # buildTargetPath
-                sQuery += '%s,' # buildTarPath
-                sQuery += '%s,' # dTarget['buildType']
-                sQuery += '%s,' # builder
-                sQuery += '%s,' # version
-                sQuery += '%s,' # os
-                sQuery += '%s);' # returnCode
+        lTables = ['buildTargets','buildStatus']
 
-                tArgs = (dArgs['projectName'], dArgs['projectPath'], self.verifyEncoding(dTarget['buildTargetPath']), dArgs['buildTarPath'], str( int(True) ), dArgs['builder'], dArgs['version'], dArgs['os'], str(dTarget['returnCode']))
+        if sTable in lTables and sBuildType in self.lBuildTypes:
 
-                lQueries.append( (sQuery, tArgs) )
+            lQueries = []
 
+            if not self.ready(): self.open()
+            else: lQueries.append('USE ' + self.db + ';')
 
-                # mysql escape_string doesn't handle unicode
-                '''
+            sQuery = 'SELECT projectName FROM ' + sTable + ' WHERE '
+            sQuery += sBuildType + ' IS TRUE;'
 
-                #sProjectName, sProjectPath, sBuildTargetPath, bConfigureBuildType=False, bConfigureacBuildType=False, bConfigureinBuildType=False, bCmakeBuildType=False, bAntBuildType=False, bMavenBuildType=False, sBuilder='', iBuildTime=0, sVersion="1.0", sOS='ubuntu14', iReturnCode=0, 
+            lQueries.append(sQuery)
 
-                sQuery += '\'%s\',' % MySQLdb.escape_string( dArgs['projectName'] )
-                sQuery += '\'%s\',' % MySQLdb.escape_string( dArgs['projectPath'] )
+            with closing( self.cursor() ) as cursor:
 
+                #execute mysql statements
                 try:
 
-                    sQuery += '\'%s\',' % MySQLdb.escape_string( self.verifyEncoding(dTarget['buildTargetPath']) )
+                    for sQuery in lQueries:
+
+                        if bDebug: debug('func: findAllBuildTypeProjectsFromTable()', sQuery) 
+
+                        cursor.execute(sQuery)
+
+                    for iCtr in range(cursor.rowcount):
+
+                        (sProjectName,) = cursor.fetchone()
+                        lProjects.append(sProjectName)
+                
+                except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+            
+                    warning('func: findAllBuildTypeProjectsFromTable() statement failed to execute:', sQuery) 
+                    warning('func: findAllBuildTypeProjectsFromTable() Unexpected error:', e)
+
+        else:
+
+             warning('func: findAllBuildTypeProjectsFromTable() invalid build type or table provided sBuildType:', sBuildType,'sTable:', sTable)
+             warning('func: findAllBuildTypeProjectsFromTable() valid values for sBuiltType are:', self.lBuildTypes)
+             warning('func: findAllBuildTypeProjectsFromTable() valid values for sTable are:', lTables)
+
+        return lProjects
+
+    ###
+    def select(self, sSelectClause, sTable, sWhereClause='', sOrderByClause='', sLimitClause='', bDebug=False):
+
+        lRows = []
+
+        if sTable in (self.lTables + self.lViews):
+
+            lQueries = []
 
-                except (UnicodeEncodeError, UnicodeDecodeError) as e:
+            if not self.ready(): self.open()
+            else: lQueries.append('USE ' + self.db + ';')
 
-                    warning('func: insertIntoBuildStatusTargets() having trouble escaping buildTargetPath for builder: ', dArgs['builder'], 'for project:', dArgs['projectName'])
-                    raise e
+            if not sSelectClause: warning('func: select() sSelectClause is not valid:', sSelectClause) 
 
-                sQuery += '\'%s\',' % MySQLdb.escape_string( dArgs['buildTarPath'] )
-                sQuery += '\'%s\',' % MySQLdb.escape_string( str( int(True) ) )
-                sQuery += '\'%s\',' % MySQLdb.escape_string( dArgs['builder'] )
-                sQuery += '\'%s\',' % MySQLdb.escape_string( dArgs['version'] )
-                sQuery += '\'%s\',' % MySQLdb.escape_string( dArgs['os'] )
-                sQuery += '\'%s\');' % MySQLdb.escape_string( str(dTarget['returnCode']) )
-                lQueries.append(sQuery)
-                '''
+            lQueries.append( self.selectQuery(sSelectClause, sTable, sWhereClause, sOrderByClause, sLimitClause) )
 
-            with closing( self.conn.cursor() ) as cursor:
+            with closing( self.cursor() ) as cursor:
 
                 #execute mysql statements
-                for sQuery in lQueries:
+                try:
 
-                    try:
+                    for sQuery in lQueries:
+
+                        if bDebug: debug('func: select()', sQuery) 
+
+                        cursor.execute(sQuery)
+
+                    for iCtr in range(cursor.rowcount):
+
+                        tRow = cursor.fetchone()
+                        lRows.append(tRow)
+                    
+                except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+            
+                    warning('func: select() statement failed to execute:', sQuery) 
+                    warning('func: select() Unexpected error:', e)
 
-                        if bDebug: debug('func: insertIntoBuildStatusTargets()', sQuery) 
+        else:
 
-                        if isinstance(sQuery, tuple):
+             warning('func: select() table provided sTable:', sTable)
+             warning('func: select() valid values for sTable are:', self.lTables + self.lViews)
 
-                            (sQuery, tArgs) = sQuery
-                            cursor.execute(sQuery, tArgs)
+        return lRows
 
-                        else:
-                            
-                            cursor.execute(sQuery)
+    ###
+    def selectQuery(self, sSelectClause, sTable, sWhereClause='', sOrderByClause='', sLimitClause=''):
+
+        sQuery = 'SELECT ' + sSelectClause + ' FROM ' + sTable
+
+        if sWhereClause:
+
+            sQuery += ' WHERE ' + sWhereClause
+
+        if sOrderByClause:
+
+            sQuery += ' ORDER BY ' + sOrderByClause
+
+        if sLimitClause:
+
+            sQuery += ' LIMIT ' + sLimitClause
+
+        sQuery += ';'
+
+        return sQuery
+
+    ###
+    # streaming select(); yields rows from a server-side cursor (SSCursor) iFetchSize rows at a time, so a
+    # multi-million row scan runs in constant memory. The connection can't run other statements until the
+    # generator is exhausted or closed, so don't interleave other queries on this MuseProjectDB while iterating
+    ###
+    def iselect(self, sSelectClause, sTable, sWhereClause='', sOrderByClause='', sLimitClause='', iFetchSize=None, bDebug=False):
+
+        if sTable not in (self.lTables + self.lViews):
+
+            warning('func: iselect() table provided sTable:', sTable)
+            warning('func: iselect() valid values for sTable are:', self.lTables + self.lViews)
+            return
+
+        if not sSelectClause:
+
+            warning('func: iselect() sSelectClause is not valid:', sSelectClause) 
+            return
+
+        if not iFetchSize: iFetchSize = self.iFetchSize
+
+        bUseDb = self.ready()
+
+        if not bUseDb: self.open()
+
+        sQuery = self.selectQuery(sSelectClause, sTable, sWhereClause, sOrderByClause, sLimitClause)
+
+        with closing( self.cursor(MySQLdb.cursors.SSCursor) ) as cursor:
+
+            try:
+
+                if bUseDb: cursor.execute('USE ' + self.db + ';')
+
+                if bDebug: debug('func: iselect()', sQuery) 
+
+                cursor.execute(sQuery)
+
+                while True:
+
+                    lRows = cursor.fetchmany(iFetchSize)
+
+                    if not lRows: break
+
+                    for tRow in lRows:
+
+                        yield tRow
+
+            except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+        
+                warning('func: iselect() statement failed to execute:', sQuery) 
+                warning('func: iselect() Unexpected error:', e)
+
+    ###
+    # build type bitmask helpers; bit i of the buildType column is set when the row's lAllTypes[i] column is
+    ###
+    def buildTypeMask(self, lTypes):
+
+        iMask = 0
+
+        for sBuildType in lTypes:
+
+            iMask |= self.dBuildTypeBits[sBuildType]
+
+        return iMask
+
+    ###
+    def buildTypesFromMask(self, iMask):
+
+        return [sBuildType for sBuildType in self.lAllTypes if int(iMask) & self.dBuildTypeBits[sBuildType]]
+
+    ###
+    # SQL expression computing the bitmask from the legacy boolean columns (sPrefix is 'NEW.' inside triggers)
+    ###
+    def buildTypeMaskExpr(self, sTable, sPrefix=''):
 
+        return ' | '.join( ['(' + sPrefix + '`' + sBuildType + '` << ' + str(self.lAllTypes.index(sBuildType)) + ')' for sBuildType in self.dBuildTypeTables[sTable]] )
+
+    ###
+    # adds the buildType bitmask column to the target tables, backfills it from the legacy boolean columns and
+    # installs insert/update triggers so writers that only set the legacy columns (inserts, LOAD DATA) keep it in sync
+    ###
+    def migrateBuildTypes(self, bDebug=False):
+
+        if not self.ready(): self.open()
+
+        with closing( self.cursor() ) as cursor:
+
+            for sTable in sorted(self.dBuildTypeTables.keys()):
+
+                lQueries = []
+
+                sExpr = self.buildTypeMaskExpr(sTable)
+
+                try:
+
+                    cursor.execute('USE ' + self.db + ';')
+                    cursor.execute('SHOW COLUMNS FROM ' + sTable + ' LIKE \'buildType\';')
+
+                    if not cursor.fetchall():
+
+                        lQueries.append('ALTER TABLE ' + sTable + ' ADD COLUMN `buildType` SMALLINT UNSIGNED NOT NULL DEFAULT 0;')
+
+                    lQueries.append('UPDATE ' + sTable + ' SET buildType = ' + sExpr + ' WHERE buildType <> ' + sExpr + ';')
+
+                    for sQuery in lQueries:
+
+                        if bDebug: debug('func: migrateBuildTypes()', sQuery) 
+
+                        cursor.execute(sQuery)
                         self.conn.commit()
-                
-                    except (UnicodeEncodeError, MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
-                
-                        warning('func: insertIntoBuildStatusTargets() statement failed to execute:', sQuery) 
-                        warning('func: insertIntoBuildStatusTargets() Unexpected error:', e)
-                        warning('func: insertIntoBuildStatusTargets() for project:', )
-                        break
 
+                except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+
+                    warning('func: migrateBuildTypes() failed on table:', sTable) 
+                    warning('func: migrateBuildTypes() Unexpected error:', e)
+
+        for sTable in sorted(self.dBuildTypeTables.keys()):
+
+            self.createTriggers(sTable, bDebug=bDebug)
+
+    ###
+    # SQL expression for a table's keyHash column: binary sha1 of its natural key columns
+    ###
+    def keyHashExpr(self, sTable, sPrefix=''):
+
+        return 'UNHEX(SHA1(CONCAT_WS(CHAR(0), ' + ', '.join( [sPrefix + '`' + sCol + '`' for sCol in self.dNaturalKeys[sTable]] ) + ')))'
+
+    ###
+    # (re)creates the BEFORE INSERT/UPDATE triggers deriving sTable's computed columns (buildType bitmask, keyHash);
+    # mysql < 5.7.2 allows a single trigger per table and event, so every computed column is set by the same trigger
     ###
-    def insertIntoBuildStatus(self, dArgs, bDebug=False):
+    def createTriggers(self, sTable, bDebug=False):
 
         lQueries = []
 
         if not self.ready(): self.open()
         else: lQueries.append('USE ' + self.db + ';')
 
-        # verify required arguments are all included
-        lArgNames = dArgs.keys()
+        lAssignments = []
+
+        with closing( self.cursor() ) as cursor:
+
+            try:
+
+                cursor.execute('USE ' + self.db + ';')
+                cursor.execute('SHOW COLUMNS FROM ' + sTable + ';')
+
+                # only derive the columns this table already has, migrateBuildTypes() and migrateUniqueKeys() each add their own
+                lColumns = [tRow[0] for tRow in cursor.fetchall()]
+
+            except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+
+                warning('func: createTriggers() failed to read columns of table:', sTable, e) 
+                return
+
+        if sTable in self.dBuildTypeTables and 'buildType' in lColumns: lAssignments.append('NEW.buildType = ' + self.buildTypeMaskExpr(sTable, sPrefix='NEW.'))
+        if sTable in self.dNaturalKeys and 'keyHash' in lColumns: lAssignments.append('NEW.keyHash = ' + self.keyHashExpr(sTable, sPrefix='NEW.'))
+
+        for sEvent in ['INSERT', 'UPDATE']:
+
+            sTrigger = sTable + '_' + sEvent.lower()
+
+            # triggers from before keyHash existed
+            lQueries.append('DROP TRIGGER IF EXISTS ' + sTable + '_buildType_' + sEvent.lower() + ';')
+            lQueries.append('DROP TRIGGER IF EXISTS ' + sTrigger + ';')
+
+            if lAssignments: lQueries.append('CREATE TRIGGER ' + sTrigger + ' BEFORE ' + sEvent + ' ON ' + sTable + ' FOR EACH ROW SET ' + ', '.join(lAssignments) + ';')
+
+        with closing( self.cursor() ) as cursor:
+
+            #execute mysql statements
+            for sQuery in lQueries:
+                
+                try:
+
+                    if bDebug: debug('func: createTriggers()', sQuery) 
+
+                    cursor.execute(sQuery)
+                    self.conn.commit()
+            
+                except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+                    warning('func: createTriggers() statement failed to execute:', sQuery) 
+                    warning('func: createTriggers() Unexpected error:', e)
+                    break    
+
+    ###
+    # adds the keyHash column and its unique index to the tables in self.dNaturalKeys so the insertInto* methods
+    # can upsert; existing duplicates are removed first, keeping the oldest row (lowest id) of each natural key
+    ###
+    def migrateUniqueKeys(self, bDebug=False):
+
+        # sqlite tables are created with unique constraints on the natural key columns themselves
+        if self.bSqlite: return
 
-        lRequiredArgs = self.dTables['buildStatus']['cols']
-        lRequiredArgs.remove('builder')
+        if not self.ready(): self.open()
 
-        bMissingArg = False
-        lMissingArgs = []
+        with closing( self.cursor() ) as cursor:
 
-        for sRequiredArg in lRequiredArgs:
+            for sTable in sorted(self.dNaturalKeys.keys()):
 
-            if sRequiredArg not in lArgNames:
+                lQueries = []
 
-                bMissingArg = True
-                lMissingArgs.append(sRequiredArg)
+                try:
 
-        if bMissingArg:
+                    cursor.execute('USE ' + self.db + ';')
+                    cursor.execute('SHOW COLUMNS FROM ' + sTable + ' LIKE \'keyHash\';')
 
-            warning('func: insertIntoBuildStatus() missing required arguments:', lMissingArgs) 
+                    if not cursor.fetchall():
 
-        else:
+                        lQueries.append('ALTER TABLE ' + sTable + ' ADD COLUMN `keyHash` BINARY(20);')
 
-            sQuery = 'INSERT INTO buildStatus ('
-            sQuery += 'projectName,'
-            sQuery += 'projectPath,'
-            sQuery += 'buildTarPath,'
-            sQuery += 'builder,'
-            sQuery += 'buildTime,'
-            sQuery += 'version,'
-            sQuery += 'os,'
-            sQuery += 'numObjectsPreBuild,'
-            sQuery += 'numObjectsPostBuild,'
-            sQuery += 'numObjectsGenerated,'
-            sQuery += 'numSources,'
-            sQuery += 'returnCode) VALUES ('
+                    lQueries.append('UPDATE ' + sTable + ' SET keyHash = ' + self.keyHashExpr(sTable) + ' WHERE keyHash IS NULL;')
 
-            sQuery += '\'%s\',' % MySQLdb.escape_string( dArgs['projectName'] )
-            sQuery += '\'%s\',' % MySQLdb.escape_string( dArgs['projectPath'] )
-            sQuery += '\'%s\',' % MySQLdb.escape_string( dArgs['buildTarPath'] )
-            sQuery += '\'%s\',' % MySQLdb.escape_string( dArgs['builder'] )
-            sQuery += '\'%s\',' % MySQLdb.escape_string( str(dArgs['buildTime']) )
-            sQuery += '\'%s\',' % MySQLdb.escape_string( dArgs['version'] )
-            sQuery += '\'%s\',' % MySQLdb.escape_string( dArgs['os'] )
-            sQuery += '\'%s\',' % MySQLdb.escape_string( str(dArgs['numObjectsPreBuild']) )
-            sQuery += '\'%s\',' % MySQLdb.escape_string( str(dArgs['numObjectsPostBuild']) )
-            sQuery += '\'%s\',' % MySQLdb.escape_string( str(dArgs['numObjectsGenerated']) )            
-            sQuery += '\'%s\',' % MySQLdb.escape_string( str(dArgs['numSources']) )
-            sQuery += '\'%s\');' % MySQLdb.escape_string( str(dArgs['returnCode']) )
-            lQueries.append(sQuery)
+                    cursor.execute('SHOW INDEX FROM ' + sTable + ' WHERE Key_name = \'' + sTable + '_keyHash\';')
 
-            with closing( self.conn.cursor() ) as cursor:
+                    if not cursor.fetchall():
 
-                #execute mysql statements
-                for sQuery in lQueries:
+                        lQueries.append('DELETE t_dup FROM ' + sTable + ' t_dup INNER JOIN ' + sTable + ' t_keep ON t_dup.keyHash = t_keep.keyHash AND t_dup.id > t_keep.id;')
+                        lQueries.append('ALTER TABLE ' + sTable + ' ADD UNIQUE INDEX ' + sTable + '_keyHash (keyHash);')
 
-                    try:
+                    for sQuery in lQueries:
 
-                        if bDebug: debug('func: insertIntoBuildStatus()', sQuery) 
+                        if bDebug: debug('func: migrateUniqueKeys()', sQuery) 
 
                         cursor.execute(sQuery)
                         self.conn.commit()
-                
-                    except (UnicodeEncodeError, MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
-                
-                        warning('func: insertIntoBuildStatus() statement failed to execute:', sQuery) 
-                        warning('func: insertIntoBuildStatus() Unexpected error:', e)
-                        break
 
-    ###
-    def countRows(self, sTable, bDebug):
+                except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
 
-        iNumProjects = 0
+                    warning('func: migrateUniqueKeys() failed on table:', sTable) 
+                    warning('func: migrateUniqueKeys() Unexpected error:', e)
 
-        if sTable in self.lTables:
+        for sTable in sorted(self.dNaturalKeys.keys()):
 
-            lQueries = []
+            self.createTriggers(sTable, bDebug=bDebug)
 
-            if not self.ready(): self.open()
-            else: lQueries.append('USE ' + self.db + ';')
+    ###
+    # adds the rowCounts table countRows() reads and (re)seeds the counters of self.lCountedTables from COUNT(*).
+    # insertRows(), bulkLoad() and insertIntoBuildStatus() add the rows they insert to the counters in the same transaction.
+    # while a table is counted its counter rows are locked, so writers that inserted rows meanwhile add them on top of the
+    # seeded count once it commits; nothing is lost or counted twice, but those writers wait for the COUNT(*)
+    ###
+    def migrateRowCounts(self, bDebug=False):
 
-            sQuery = 'SELECT COUNT(*) FROM ' + sTable + ';'
-            lQueries.append(sQuery)
+        lQueries = []
 
-            with closing( self.conn.cursor() ) as cursor:
+        if not self.ready(): self.open()
+        else: lQueries.append('USE ' + self.db + ';')
 
-                #execute mysql statements
-                try:
+        sQuery = 'CREATE TABLE IF NOT EXISTS rowCounts ('
+        sQuery += '`tableName` VARCHAR(64) CHARACTER SET utf8 NOT NULL,'
+        sQuery += '`shard` TINYINT UNSIGNED NOT NULL,'
+        sQuery += '`numRows` BIGINT NOT NULL DEFAULT 0,'
+        sQuery += 'PRIMARY KEY(`tableName`,`shard`));'
+        lQueries.append(sQuery)
 
-                    for sQuery in lQueries:
+        for sTable in self.lCountedTables:
 
-                        if bDebug: debug('func: countRows()', sQuery) 
+            # per-row counting triggers of earlier versions
+            for sEvent in ['insert', 'delete']:
 
-                        cursor.execute(sQuery)
+                lQueries.append('DROP TRIGGER IF EXISTS ' + sTable + '_count_' + sEvent + ';')
 
-                    tTup = cursor.fetchone()
+            lQueries.append('INSERT INTO rowCounts (tableName, shard, numRows) VALUES ' + ','.join( ['(\'' + sTable + '\',' + str(iShard) + ',0)' for iShard in range(self.iRowCountShards)] ) + ' ON DUPLICATE KEY UPDATE numRows = numRows;')
 
-                    sNumProjects = ''
+        with closing( self.cursor() ) as cursor:
 
-                    if tTup:
+            #execute mysql statements
+            for sQuery in lQueries:
+                
+                try:
 
-                        (sNumProjects,) = tTup
+                    if bDebug: debug('func: migrateRowCounts()', sQuery) 
 
-                    if sNumProjects:
-          
-                        iNumProjects = int( sNumProjects )
-                
-                except (ValueError, MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+                    cursor.execute(sQuery)
+                    self.conn.commit()
             
-                    warning('func: countRows() statement failed to execute:', sQuery) 
-                    warning('func: countRows() Unexpected error:', e)
+                except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+                    warning('func: migrateRowCounts() statement failed to execute:', sQuery) 
+                    warning('func: migrateRowCounts() Unexpected error:', e)
+                    return
 
+            for sTable in self.lCountedTables:
 
-        else:
+                try:
 
-             warning('func: countRows() table provided sTable:', sTable)
-             warning('func: countRows() valid values for sTable are:', self.lTables)
+                    cursor.execute('USE ' + self.db + ';')
 
-        return iNumProjects
+                    if self.bSqlite:
 
-    ###
-    def findAllBuildTypeProjectsFromTable(self, sBuildType, sTable, bDebug=False):
+                        # one statement holds sqlite's database write lock from the count to the update
+                        sQuery = 'UPDATE rowCounts SET numRows = CASE WHEN shard = 0 THEN (SELECT COUNT(*) FROM ' + sTable + ') ELSE 0 END WHERE tableName = %s;'
+                        tArgs = (sTable, )
 
-        lProjects = []
+                    else:
 
-        lTables = ['buildTargets','buildStatus']
+                        # writers add their count right before committing, so once the counter rows are locked every
+                        # committed row is counted and the rest wait for the seed; COUNT(*) is a consistent read and
+                        # doesn't wait on their uncommitted rows
+                        sQuery = 'SELECT shard FROM rowCounts WHERE tableName = %s FOR UPDATE;'
+                        if bDebug: debug('func: migrateRowCounts()', sQuery, sTable) 
+                        cursor.execute(sQuery, (sTable, ))
+                        cursor.fetchall()
 
-        if sTable in lTables and sBuildType in self.lBuildTypes:
+                        sQuery = 'SELECT COUNT(*) FROM ' + sTable + ';'
+                        if bDebug: debug('func: migrateRowCounts()', sQuery) 
+                        cursor.execute(sQuery)
 
-            lQueries = []
+                        sQuery = 'UPDATE rowCounts SET numRows = CASE WHEN shard = 0 THEN %s ELSE 0 END WHERE tableName = %s;'
+                        tArgs = (int( cursor.fetchone()[0] ), sTable)
 
-            if not self.ready(): self.open()
-            else: lQueries.append('USE ' + self.db + ';')
+                    if bDebug: debug('func: migrateRowCounts()', sQuery, tArgs) 
 
-            sQuery = 'SELECT projectName FROM ' + sTable + ' WHERE '
-            sQuery += sBuildType + ' IS TRUE;'
+                    cursor.execute(sQuery, tArgs)
+                    self.conn.commit()
 
-            lQueries.append(sQuery)
+                except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
 
-            with closing( self.conn.cursor() ) as cursor:
+                    self.rollback('migrateRowCounts()')
 
-                #execute mysql statements
-                try:
+                    warning('func: migrateRowCounts() failed to seed the row count of table:', sTable) 
+                    warning('func: migrateRowCounts() statement failed to execute:', sQuery) 
+                    warning('func: migrateRowCounts() Unexpected error:', e)
 
-                    for sQuery in lQueries:
+    ###
+    # projects whose targets in sTable (taken together) have any of the build types in iMask, or all of them with bAll
+    ###
+    def findProjectsByBuildTypeMask(self, iMask, sTable='buildTargets', bAll=False, bDebug=False):
 
-                        if bDebug: debug('func: findAllBuildTypeProjectsFromTable()', sQuery) 
+        lProjects = []
 
-                        cursor.execute(sQuery)
+        if sTable not in self.dBuildTypeTables:
 
-                    for iCtr in range(cursor.rowcount):
+            warning('func: findProjectsByBuildTypeMask() invalid table provided sTable:', sTable)
+            warning('func: findProjectsByBuildTypeMask() valid values for sTable are:', sorted(self.dBuildTypeTables.keys()))
+            return lProjects
 
-                        (sProjectName,) = cursor.fetchone()
-                        lProjects.append(sProjectName)
-                
-                except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
-            
-                    warning('func: findAllBuildTypeProjectsFromTable() statement failed to execute:', sQuery) 
-                    warning('func: findAllBuildTypeProjectsFromTable() Unexpected error:', e)
+        sHaving = '(BIT_OR(buildType) & %s) = %s' if bAll else '(BIT_OR(buildType) & %s) <> 0'
+        tArgs = (iMask, iMask) if bAll else (iMask, )
 
-        else:
+        for (sProjectName, ) in self.executeSelect('findProjectsByBuildTypeMask()', 'SELECT projectName FROM ' + sTable + ' GROUP BY projectName HAVING ' + sHaving + ';', tArgs, bDebug=bDebug):
 
-             warning('func: findAllBuildTypeProjectsFromTable() invalid build type or table provided sBuildType:', sBuildType,'sTable:', sTable)
-             warning('func: findAllBuildTypeProjectsFromTable() valid values for sBuiltType are:', self.lBuildTypes)
-             warning('func: findAllBuildTypeProjectsFromTable() valid values for sTable are:', lTables)
+            lProjects.append(sProjectName)
 
         return lProjects
 
     ###
-    def select(self, sSelectClause, sTable, sWhereClause='', sOrderByClause='', sLimitClause='', bDebug=False):
-
-        lRows = []
-
-        if sTable in (self.lTables + self.lViews):
-
-            lQueries = []
-
-            if not self.ready(): self.open()
-            else: lQueries.append('USE ' + self.db + ';')
-
-            if sSelectClause:
-    
-                sQuery = 'SELECT ' + sSelectClause + ' FROM ' + sTable
-
-            else:
-
-                warning('func: select() sSelectClause is not valid:', sSelectClause) 
+    # number of multi-type projects per combination of build types; returns [ (list of build types, project count) ]
+    ###
+    def countBuildTypeCombinations(self, sTable='buildTargets', bDebug=False):
 
-            if sWhereClause:
+        lCombinations = []
 
-                sQuery += ' WHERE ' + sWhereClause
+        sQuery = 'SELECT mask, COUNT(*) FROM (SELECT BIT_OR(buildType) AS mask FROM ' + sTable + ' GROUP BY projectName) t WHERE BIT_COUNT(mask) > 1 GROUP BY mask ORDER BY COUNT(*) DESC;'
 
-            if sOrderByClause:
+        for (iMask, iCount) in self.executeSelect('countBuildTypeCombinations()', sQuery, bDebug=bDebug):
 
-                sQuery += ' ORDER BY ' + sOrderByClause
+            lCombinations.append( (self.buildTypesFromMask(iMask), int(iCount)) )
 
-            if sLimitClause:
+        return lCombinations
 
-                sQuery += ' LIMIT ' + sLimitClause
+    ###
+    # runs a parameterized SELECT and returns all of its rows; sCaller names the calling method in warnings
+    ###
+    def executeSelect(self, sCaller, sQuery, tArgs=None, bDebug=False):
 
-            sQuery += ';'
+        lRows = []
 
-            lQueries.append(sQuery)
+        bUseDb = self.ready()
 
-            with closing( self.conn.cursor() ) as cursor:
+        if not bUseDb: self.open()
 
-                #execute mysql statements
-                try:
+        with closing( self.cursor(sMethod=sCaller) ) as cursor:
 
-                    for sQuery in lQueries:
+            try:
 
-                        if bDebug: debug('func: select()', sQuery) 
+                if bUseDb: cursor.execute('USE ' + self.db + ';')
 
-                        cursor.execute(sQuery)
+                if bDebug: debug('func: ' + sCaller, sQuery, tArgs) 
 
-                    for iCtr in range(cursor.rowcount):
+                cursor.execute(sQuery, tArgs)
 
-                        tRow = cursor.fetchone()
-                        lRows.append(tRow)
-                    
-                except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+                lRows = list( cursor.fetchall() )
             
-                    warning('func: select() statement failed to execute:', sQuery) 
-                    warning('func: select() Unexpected error:', e)
-
-        else:
-
-             warning('func: select() table provided sTable:', sTable)
-             warning('func: select() valid values for sTable are:', self.lTables + self.lViews)
+            except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+        
+                warning('func: ' + sCaller + ' statement failed to execute:', sQuery) 
+                warning('func: ' + sCaller + ' Unexpected error:', e)
 
         return lRows
 
@@ -1478,19 +3037,21 @@ class MuseProjectDB:
         if not self.ready(): self.open()
         else: lQueries.append('USE ' + self.db + ';')
 
+        # per type target counts from the bitmask; only projects with more than one type, or more targets than
+        # distinct types (a type seen twice), come back from mysql
         sQuery = 'SELECT projectName,'
 
         for sBuildType in self.lBuildTypes:
 
-            sQuery += ' SUM(' + sBuildType + '), '
+            sQuery += ' SUM((buildType >> ' + str(self.lAllTypes.index(sBuildType)) + ') & 1), '
 
         sQuery = sQuery[:-2] + ' '
 
-        sQuery += 'FROM buildTargets GROUP BY projectName;'
+        sQuery += 'FROM buildTargets GROUP BY projectName HAVING BIT_COUNT(BIT_OR(buildType)) > 1 OR COUNT(*) > BIT_COUNT(BIT_OR(buildType));'
 
         lQueries.append(sQuery)
 
-        with closing( self.conn.cursor() ) as cursor:
+        with closing( self.cursor() ) as cursor:
 
             #execute mysql statements
             try:
@@ -1559,10 +3120,11 @@ class MuseProjectDB:
         if not self.ready(): self.open()
         else: lQueries.append('USE ' + self.db + ';')
 
-        sQuery = 'SELECT projectName, projectPath, buildTargetPath, depth FROM buildTargets ORDER BY depth ASC;'
-        lQueries.append(sQuery)
+        # served by the buildTargets (projectName, depth) index
+        sQuery = 'SELECT projectName, projectPath, buildTargetPath, depth FROM buildTargets WHERE projectName = %s ORDER BY depth ASC;'
+        lQueries.append( (sQuery, (sProjectName, )) )
 
-        with closing( self.conn.cursor() ) as cursor:
+        with closing( self.cursor() ) as cursor:
 
             #execute mysql statements
             try:
@@ -1571,7 +3133,14 @@ class MuseProjectDB:
 
                     if bDebug: debug('func: getProjectBuildTargetsByDepth()', sQuery) 
 
-                    cursor.execute(sQuery)
+                    if isinstance(sQuery, tuple):
+
+                        (sQuery, tArgs) = sQuery
+                        cursor.execute(sQuery, tArgs)
+
+                    else:
+
+                        cursor.execute(sQuery)
 
                 for iCtr in range(cursor.rowcount):
 
@@ -1586,6 +3155,104 @@ class MuseProjectDB:
 
         return lRows
 
+    ###
+    # batched getProjectBuildTargetsByDepth(); returns a dictionary of projectName -> target rows sorted by depth
+    # projects are looked up with one IN query per iBatchSize names, projects without targets map to []
+    ###
+    def getBuildTargetsByDepth(self, lProjectNames, bDebug=False):
+
+        dTargets = {}
+
+        lProjectNames = list( set(lProjectNames) )
+
+        for sProjectName in lProjectNames:
+
+            dTargets[sProjectName] = []
+
+        if not lProjectNames: return dTargets
+
+        bUseDb = self.ready()
+
+        if not bUseDb: self.open()
+
+        sQuery = ''
+
+        with closing( self.cursor() ) as cursor:
+
+            try:
+
+                if bUseDb: cursor.execute('USE ' + self.db + ';')
+
+                for iStart in range(0, len(lProjectNames), self.iBatchSize):
+
+                    lChunk = lProjectNames[iStart:iStart + self.iBatchSize]
+
+                    sQuery = 'SELECT projectName, projectPath, buildTargetPath, depth FROM buildTargets WHERE projectName IN (' + ','.join( ['%s'] * len(lChunk) ) + ') ORDER BY projectName, depth ASC;'
+
+                    if bDebug: debug('func: getBuildTargetsByDepth()', sQuery, len(lChunk), 'projects') 
+
+                    cursor.execute(sQuery, lChunk)
+
+                    for tRow in cursor.fetchall():
+
+                        dRow = {}
+                        (dRow['projectName'], dRow['projectPath'], dRow['buildTargetPath'], dRow['depth']) = tRow
+                        dTargets.setdefault(dRow['projectName'], []).append(dRow)
+                
+            except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+        
+                warning('func: getBuildTargetsByDepth() statement failed to execute:', sQuery) 
+                warning('func: getBuildTargetsByDepth() Unexpected error:', e)
+
+        return dTargets
+
+    ###
+    # returns a dictionary of projectName -> largest recorded value of sCol (buildTime or numSources) across builds
+    ###
+    def getProjectBuildCosts(self, sCol, bDebug=False):
+
+        dCosts = {}
+
+        lCols = ['buildTime','numSources']
+
+        if sCol in lCols:
+
+            lQueries = []
+
+            if not self.ready(): self.open()
+            else: lQueries.append('USE ' + self.db + ';')
+
+            sQuery = 'SELECT projectName, MAX(' + sCol + ') FROM buildStatus GROUP BY projectName;'
+            lQueries.append(sQuery)
+
+            with closing( self.cursor() ) as cursor:
+
+                #execute mysql statements
+                try:
+
+                    for sQuery in lQueries:
+
+                        if bDebug: debug('func: getProjectBuildCosts()', sQuery)
+
+                        cursor.execute(sQuery)
+
+                    for iCtr in range(cursor.rowcount):
+
+                        (sProjectName, iCost) = cursor.fetchone()
+                        dCosts[sProjectName] = int(iCost)
+
+                except (MySQLdb.DataError, MySQLdb.IntegrityError, MySQLdb.InternalError, MySQLdb.NotSupportedError, MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+
+                    warning('func: getProjectBuildCosts() statement failed to execute:', sQuery)
+                    warning('func: getProjectBuildCosts() Unexpected error:', e)
+
+        else:
+
+             warning('func: getProjectBuildCosts() column provided sCol:', sCol)
+             warning('func: getProjectBuildCosts() valid values for sCol are:', lCols)
+
+        return dCosts
+
     ###
     def getBuildSuccessAllBuildTypes(self):
 
@@ -1603,30 +3270,137 @@ def depth(sPath, bDebug=False):
 
 ###
 def usage():
-    warning('Usage: projectDB.py --debug')
+    warning('Usage: projectDB.py --db=muse|sqlite:////tmp/muse.db --initialize --migrate-indexes --explain-views --dry-run --rebuild-summaries --count-rows --debug')
 
 ###
 def main(argv):
 
     bError = False
     bDebug = False
+    bDryRun = False
+    bExplain = False
+    bMigrate = False
+    bRebuildSummaries = False
+    bInitialize = False
+    bCountRows = False
+    sDb = 'muse'
 
     ### command line argument handling
-    options, remainder = getopt.getopt(sys.argv[1:], 'c:f:d', ['corpus-dir-path=','forks=','debug'])
+    options, remainder = getopt.getopt(sys.argv[1:], 'c:f:mensirb:d', ['corpus-dir-path=','forks=','migrate-indexes','explain-views','dry-run','rebuild-summaries','initialize','count-rows','db=','debug'])
 
     # debug('func: main()', 'options:', options)
     # debug('func: main()', 'remainder:', remainder)
 
     for opt, arg in options:
 
-        if opt in ('-d', '--debug'):
+        if opt in ('-m', '--migrate-indexes'):
+
+            bMigrate = True
+
+        elif opt in ('-e', '--explain-views'):
+
+            bExplain = True
+
+        elif opt in ('-n', '--dry-run'):
+
+            bDryRun = True
+
+        elif opt in ('-s', '--rebuild-summaries'):
+
+            bRebuildSummaries = True
+
+        elif opt in ('-i', '--initialize'):
+
+            bInitialize = True
+
+        elif opt in ('-r', '--count-rows'):
+
+            bCountRows = True
+
+        elif opt in ('-b', '--db'):
+
+            # database name or sqlite url
+            sDb = arg
+
+        elif opt in ('-d', '--debug'):
 
             bDebug = True
 
     if bError: usage()
+    elif bInitialize:
+
+        # (re)create the database: tables, indexes, triggers and views
+        dMp = MuseProjectDB(db=sDb)
+
+        dMp.initialize(bDebug=bDebug)
+        dMp.createViews(bDebug=bDebug)
+
+        dMp.close()
+
+    elif bMigrate or bExplain or bRebuildSummaries or bCountRows:
+
+        # schema maintenance against the existing database
+        dMp = MuseProjectDB(db=sDb)
+
+        if bRebuildSummaries:
+
+            dMp.createSummaryTables(bDebug=bDebug)
+            dMp.createViews(bDebug=bDebug)
+            dMp.rebuildSummaries(bDebug=bDebug)
+
+            for tRow in dMp.select(sSelectClause='site,os,builds,projectCount', sTable='buildStatusCounts', sWhereClause='site=\'*\'', sOrderByClause='os,builds', bDebug=bDebug):
+
+                printMsg('func: main()', 'os:', tRow[1], tRow[2] + ':', tRow[3])
+
+        if bMigrate:
+
+            if not bDryRun:
+
+                dMp.migrateBuildTypes(bDebug=bDebug)
+                dMp.migrateUniqueKeys(bDebug=bDebug)
+                dMp.migrateRowCounts(bDebug=bDebug)
+
+            dReport = dMp.migrateIndexes(bDryRun=bDryRun, bDebug=bDebug)
+
+            for sTable in sorted(dReport.keys()):
+
+                for sStatus in ['ok', 'added', 'rebuilt']:
+
+                    for sIndex in dReport[sTable][sStatus]:
+
+                        printMsg('func: main()', sTable, sIndex, sStatus + (' (dry run)' if bDryRun and sStatus != 'ok' else ''))
+
+        if bExplain:
+
+            dPlans = dMp.explainViews(bDebug=bDebug)
+
+            iProblems = 0
+
+            for sView in sorted(dPlans.keys()):
+
+                for dRow in dPlans[sView]:
+
+                    if 'detail' in dRow: printMsg('func: main()', sView, 'plan:', dRow['detail'])
+                    else: printMsg('func: main()', sView, 'table:', dRow.get('table'), 'type:', dRow.get('type'), 'key:', dRow.get('key'), 'rows:', dRow.get('rows'), 'extra:', dRow.get('Extra'))
+
+                    if dRow['problems']:
+
+                        iProblems += 1
+                        warning('func: main()', sView, 'table:', dRow.get('table', dRow.get('detail')), ', '.join(dRow['problems']))
+
+            printMsg('func: main()', len(dPlans), 'views explained,', iProblems, 'plan steps with full scans, temporary tables or filesorts')
+
+        if bCountRows:
+
+            for sTable in dMp.lCountedTables:
+
+                printMsg('func: main()', sTable, 'rows:', dMp.countRows(sTable, bDebug=bDebug), 'estimate:', dMp.countRows(sTable, bDebug=bDebug, bEstimate=True))
+
+        dMp.close()
+
     else:
 
-        dMp = MuseProjectDB()
+        dMp = MuseProjectDB(db=sDb)
 
         sProjectName = 'f604b7a8-de6b-4996-b8ff-a3ef56f86378'
         sProjectPath = '/data/corpus/f/6/0/4/b/7/a/8/f604b7a8-de6b-4996-b8ff-a3ef56f86378'
@@ -11,6 +11,7 @@ from __future__ import print_function
 
 import datetime
 import getopt
+import hashlib
 import json
 import multiprocessing
 import os
@@ -27,9 +28,16 @@ from locallibs import debug
 from locallibs import printMsg
 from locallibs import warning
 
+from redisHelper import QueueCodec
 from redisHelper import RedisQueue
+from redisHelper import RedisPriorityQueue
+from redisHelper import RedisStreamQueue
 #from redisHelper import RedisSet
 
+from corpusManifest import projectRoots
+from corpusWalker import queueProjectRoots
+
+from projectDB import configureQueryStats
 from projectDB import MuseProjectDB
 from projectDB import depth
 
@@ -127,6 +135,24 @@ def verifyEncoding(sOriginal):
 
     return sTransformed
 
+###
+# write a buffer of build/source targets to mysql; --bulk-load spools them through LOAD DATA instead of INSERTs
+# targets are upserted on their natural key so re-analyzing projects doesn't duplicate them
+###
+def storeTargets(dMp, sTable, lTargets, dConfig):
+
+    if dConfig['mysql-bulk-load']:
+
+        dMp.bulkLoad(sTable, lTargets, bUpsert=True, bDebug=dConfig['debug'])
+
+    elif sTable == 'buildTargets':
+
+        dMp.insertIntoBuildTargets(lTargets=lTargets, bUpsert=True, bDebug=dConfig['debug'])
+
+    else:
+
+        dMp.insertIntoSourceTargets(lTargets=lTargets, bUpsert=True, bDebug=dConfig['debug'])
+
 ###
 def indexSourceTargets(dConfig):
 
@@ -140,6 +166,8 @@ def indexSourceTargets(dConfig):
     # setup source targets queue
     qRedis = RedisQueue(dConfig['redis-queue-source-targets'], namespace='queue', host=dConfig['redis-loc'], port=dConfig['redis-port'])
 
+    iFlushSize = dConfig['mysql-bulk-load-size'] if dConfig['mysql-bulk-load'] else dConfig['mysql-bulk-statement-size']
+
     while 1:
 
         sQuery = qRedis.get(block=True, timeout=30)
@@ -218,9 +246,9 @@ def indexSourceTargets(dConfig):
 
                                 # causing es reads to time out
             
-                                if (len(lSourceFiles) > dConfig['mysql-bulk-statement-size']) and dConfig['mysql']:
+                                if (len(lSourceFiles) > iFlushSize) and dConfig['mysql']:
 
-                                    dMp.insertIntoSourceTargets(lTargets=lSourceFiles, bDebug=dConfig['debug'])
+                                    storeTargets(dMp, 'sourceTargets', lSourceFiles, dConfig)
                                     printMsg('func indexSourceTargets() loaded', iCtr, 'source targets')
 
                                     lSourceFiles = []
@@ -237,7 +265,7 @@ def indexSourceTargets(dConfig):
 
                 if (len(lSourceFiles) > 0) and dConfig['mysql']:
 
-                    dMp.insertIntoSourceTargets(lTargets=lSourceFiles, bDebug=dConfig['debug'])
+                    storeTargets(dMp, 'sourceTargets', lSourceFiles, dConfig)
                         
                     lSourceFiles = []
 
@@ -264,10 +292,9 @@ def initTargets(dConfig):
 
     dMp.open()
 
-    # truncate sourceTargets table before re-populating
+    # sourceTargets and buildTargets are no longer truncated before re-populating; targets are upserted on
+    # (projectName, buildTargetPath) so a re-run only refreshes the rows of the projects it re-analyzes
 #    dMp.flush(sTable='sourceTargets', bDebug=dConfig['debug'])
-
-    # truncate buildTargets table before re-populating
 #    dMp.flush(sTable='buildTargets', bDebug=dConfig['debug'])
 
     dMp.close()
@@ -292,6 +319,8 @@ def findSourceTargets(dConfig):
 
     iCtr = 0
 
+    lQueries = []
+
     for tProjectRow in lProjectRows:
 
         iCtr += 1
@@ -396,7 +425,14 @@ def findSourceTargets(dConfig):
             }
         }
 
-        qRedis.put( json.dumps(dQuery) ) 
+        lQueries.append( json.dumps(dQuery) )
+
+        if len(lQueries) >= dConfig['redis-bulk-chunk-size']:
+
+            qRedis.putMany(lQueries, chunk=dConfig['redis-bulk-chunk-size'])
+            lQueries = []
+
+    qRedis.putMany(lQueries, chunk=dConfig['redis-bulk-chunk-size'])
 
 ###
 # producer process; finds specific build targets from pre-existing elasticsearch files index
@@ -417,6 +453,8 @@ def findBuildTargets(dConfig):
 
     iCtr = 0
 
+    iFlushSize = dConfig['mysql-bulk-load-size'] if dConfig['mysql-bulk-load'] else dConfig['mysql-bulk-statement-size']
+
     dQuery = {
         "query": {
             "bool": {
@@ -520,9 +558,9 @@ def findBuildTargets(dConfig):
 
                         # causing es reads to time out
     
-                        if (len(lBuildFiles) > dConfig['mysql-bulk-statement-size']) and dConfig['mysql']:
+                        if (len(lBuildFiles) > iFlushSize) and dConfig['mysql']:
 
-                            dMp.insertIntoBuildTargets(lTargets=lBuildFiles, bDebug=dConfig['debug'])
+                            storeTargets(dMp, 'buildTargets', lBuildFiles, dConfig)
                             printMsg('func findBuildFiles() loaded', iCtr, 'build targets')
 
                             lBuildFiles = []
@@ -539,7 +577,7 @@ def findBuildTargets(dConfig):
 
         if (len(lBuildFiles) > 0) and dConfig['mysql']:
 
-            dMp.insertIntoBuildTargets(lTargets=lBuildFiles, bDebug=dConfig['debug'])
+            storeTargets(dMp, 'buildTargets', lBuildFiles, dConfig)
                 
             lBuildFiles = []
 
@@ -569,30 +607,16 @@ def initProjects(dConfig):
 ###
 def findProjects(sCorpusPath, dConfig):
 
-    qRedis = RedisQueue(dConfig['redis-queue-project-paths'], namespace='queue', host=dConfig['redis-loc'], port=dConfig['redis-port'])
+    # enqueue-once so a --resume crawl only queues roots not queued before
+    qRedis = RedisQueue(dConfig['redis-queue-project-paths'], namespace='queue', dedup=True, host=dConfig['redis-loc'], port=dConfig['redis-port'])
 
-    iCount = 0
+    # roots come from the manifest if there is one (see corpusManifest.py), otherwise shards of the corpus are walked in
+    # parallel (see corpusWalker.py); either way they're pushed in chunks so consumers can start right away
+    iterRoots = projectRoots(sCorpusPath, sManifest=dConfig['manifest'], iForks=dConfig['walker-forks'], bDebug=dConfig['debug'])
 
-    for sRoot, lDirs, lFiles in os.walk(sCorpusPath):
+    iCount = queueProjectRoots(qRedis, sCorpusPath, iChunk=dConfig['redis-bulk-chunk-size'], iLimit=(10 if dConfig['debug'] else None), iterRoots=iterRoots, bDebug=dConfig['debug'])
 
-        iLevel = sRoot.count(os.sep)
-
-        if iLevel >= 11:
-
-            del lDirs[:]
-
-        if iLevel == 11:
-
-            if dConfig['debug']: debug('func: findProjects()', 'projects-root:', sRoot, iLevel)
-            debug('func: findProjects()', 'projects-root:', sRoot, iLevel)
-            
-            qRedis.put(sRoot)
-            
-            iCount += 1
-
-            if dConfig['debug'] and iCount >= 10: break
-
-    printMsg('func: findProjects()', str(iCount), 'projects loaded into queue for processing')
+    printMsg('func: findProjects()', str(iCount), 'projects found,', qRedis.seen(), 'projects queued for processing in total')
 
 ###
 # consumer process that populates mysql('projects') with project names from /data/corpus_0to7 or 8tof
@@ -710,7 +734,7 @@ def processProjects(dConfig):
 
             if (iCount % dConfig['mysql-bulk-statement-size']) == 0: 
 
-                dMp.insertIntoProjects(lProjects=lProjects, bDebug=dConfig['debug'])
+                dMp.insertIntoProjects(lProjects=lProjects, bUpsert=True, bDebug=dConfig['debug'])
                 lProjects = []
 
             if dConfig['debug'] and iCount >= 100: break
@@ -723,7 +747,7 @@ def processProjects(dConfig):
 
         if len(lProjects) > 0:
 
-            dMp.insertIntoProjects(lProjects=lProjects, bDebug=dConfig['debug'])
+            dMp.insertIntoProjects(lProjects=lProjects, bUpsert=True, bDebug=dConfig['debug'])
             lProjects = []
 
         dMp.close()
@@ -741,19 +765,100 @@ def initBuildQueues(dConfig):
     qRedis = RedisQueue(dConfig['redis-queue-to-build'], namespace='queue', host=dConfig['redis-loc'], port=dConfig['redis-port'])
     qRedis.flush()
 
+    # purge priority to-build queue
+    qRedis = RedisPriorityQueue(dConfig['redis-queue-to-build-priority'], namespace='queue', host=dConfig['redis-loc'], port=dConfig['redis-port'])
+    qRedis.flush()
+
+    # purge to-build stream (and its consumer counters); streams need redis >= 6.2 so only touch it when it is used
+    if dConfig['queueStream']:
+
+        qRedis = RedisStreamQueue(dConfig['redis-stream-to-build'], group=dConfig['redis-stream-group'], host=dConfig['redis-loc'], port=dConfig['redis-port'])
+        qRedis.flush()
+
+###
+# returns the to-build queue; with --queue-priority projects go to a priority queue that hands out the most expensive builds first,
+# with --queue-stream they go to a stream read by a consumer group of builders (buildProjectsByType.py --stream-queue)
+# projects are encoded with --queue-codec (json by default)
+###
+def getToBuildQueue(dConfig):
+
+    oCodec = QueueCodec.fromName(dConfig['redis-queue-codec'], threshold=dConfig['redis-queue-codec-threshold'])
+
+    if dConfig['queueStream']:
+
+        return RedisStreamQueue(dConfig['redis-stream-to-build'], group=dConfig['redis-stream-group'], codec=oCodec, host=dConfig['redis-loc'], port=dConfig['redis-port'])
+
+    if dConfig['queuePriority']:
+
+        return RedisPriorityQueue(dConfig['redis-queue-to-build-priority'], namespace='queue', codec=oCodec, host=dConfig['redis-loc'], port=dConfig['redis-port'])
+
+    # enqueue-once so --resume only queues projects not queued before
+    return RedisQueue(dConfig['redis-queue-to-build'], namespace='queue', codec=oCodec, dedup=True, dedupKey=getProjectKey, host=dConfig['redis-loc'], port=dConfig['redis-port'])
+
+###
+# dedup key of a to-build project: its name plus a digest of its targets (a project may be queued once for build targets and once for source targets)
+###
+def getProjectKey(dProject):
+
+    sTargets = '\n'.join( sorted( dTarget['buildTargetPath'] for dTarget in dProject['targets'] ) )
+
+    # paths come back from mysql as unicode (use_unicode=True); sha1 wants bytes
+    if not isinstance(sTargets, bytes): sTargets = sTargets.encode('utf-8')
+
+    return dProject['projectName'] + ':' + hashlib.sha1(sTargets).hexdigest()
+
+###
+# returns (dCosts, iDefaultCost) -- historical per-project build cost for --queue-priority=buildTime|sources
+# projects without build history are given the average cost
+###
+def loadBuildCosts(dMp, dConfig):
+
+    dCosts = {}
+    iDefaultCost = 0
+
+    if dConfig['queuePriority'] in dConfig['queue-priority-cols']:
+
+        dCosts = dMp.getProjectBuildCosts(sCol=dConfig['queue-priority-cols'][ dConfig['queuePriority'] ], bDebug=dConfig['debug'])
+
+        if dCosts:
+
+            iDefaultCost = sum(dCosts.values()) / len(dCosts)
+
+        printMsg('func: loadBuildCosts()', len(dCosts), 'projects with', dConfig['queuePriority'], 'history, default cost:', iDefaultCost)
+
+    return (dCosts, iDefaultCost)
+
+###
+# to-build queue entry for project (encoded by the queue's codec); returns (dProject, score) tuples when queuing by priority
+###
+def queueEntry(dProject, dCosts, iDefaultCost, dConfig):
+
+    if dConfig['queuePriority'] == 'targets':
+
+        return (dProject, len(dProject['targets']))
+
+    elif dConfig['queuePriority']:
+
+        return (dProject, dCosts.get(dProject['projectName'], iDefaultCost))
+
+    return dProject
+
 ###
 def queueUpBuildTargets(dConfig):
 
     dMp = MuseProjectDB(db=dConfig['mysql-db'],port=dConfig['mysql-port'],user=dConfig['mysql-user'],passwd=dConfig['mysql-passwd'],loc=dConfig['mysql-loc'])
     
     # setup to-build queue
-    qRedis = RedisQueue(dConfig['redis-queue-to-build'], namespace='queue', host=dConfig['redis-loc'], port=dConfig['redis-port'])
+    qRedis = getToBuildQueue(dConfig)
 
     dMp.open()
 
+    (dCosts, iDefaultCost) = loadBuildCosts(dMp, dConfig)
+
     # get projects first to iterate through (makes it easier to build project specific dictionaries), limit if in debug mode
 
     iProjectCount = 0
+    iQueued = 0
     iTargetCount = 0
     iMultiTargets = 0
 
@@ -765,6 +870,9 @@ def queueUpBuildTargets(dConfig):
     
     dProject = {}
 
+    # serialized projects waiting to be pushed onto the to-build queue
+    lProjects = []
+
     dCodeDirLookup = {}
     lProjectRows = dMp.select(sSelectClause='projectName,codeDir', sTable='availableProjects', bDebug=dConfig['debug'])
     for tProjectRow in lProjectRows:
@@ -774,28 +882,50 @@ def queueUpBuildTargets(dConfig):
     
     lTargetRows = []
 
-    if dConfig['unBuiltProjectsOnly']:
+    bSummaries = dConfig['mysql-summaries']
+
+    if bSummaries:
+
+        sStaleness = dMp.topTargetsStaleness(bDebug=dConfig['debug'])
+
+        if sStaleness:
+
+            warning('func: queueUpBuildTargets()', sStaleness, '-- refreshing topTargets before queuing')
+
+            if not dMp.rebuildTopTargets(bDebug=dConfig['debug']):
+
+                warning('func: queueUpBuildTargets() unable to refresh topTargets, queuing from the views instead')
+                bSummaries = False
+
+    if bSummaries:
+
+        # precomputed top targets and build status instead of the view chain
+        sTable = 'unBuiltTopTargets' if dConfig['unBuiltProjectsOnly'] else 'availableTopTargets'
+        sWhereClause = 'site=\'' + dConfig['queueSite'] + '\'' if dConfig['queueSite'] else ''
+
+        lTargetRows = dMp.iselect(sSelectClause='projectName,projectPath,buildTargetPath', sTable=sTable, sWhereClause=sWhereClause, sOrderByClause='projectName,ranking', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
+
+    elif dConfig['unBuiltProjectsOnly']:
 
         if dConfig['queueSite']:
 
-            lTargetRows = dMp.select(sSelectClause='projectName,projectPath,buildTargetPath', sTable='unBuiltTargetsWithSite', sWhereClause='site=\'' + dConfig['queueSite'] + '\'', sOrderByClause='projectName,ranking', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
+            lTargetRows = dMp.iselect(sSelectClause='projectName,projectPath,buildTargetPath', sTable='unBuiltTargetsWithSite', sWhereClause='site=\'' + dConfig['queueSite'] + '\'', sOrderByClause='projectName,ranking', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
 
         else:
 
-            lTargetRows = dMp.select(sSelectClause='projectName,projectPath,buildTargetPath', sTable='unBuiltTargets', sOrderByClause='projectName,ranking', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
+            lTargetRows = dMp.iselect(sSelectClause='projectName,projectPath,buildTargetPath', sTable='unBuiltTargets', sOrderByClause='projectName,ranking', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
 
     else:
 
         if dConfig['queueSite']:
 
-            lTargetRows = dMp.select(sSelectClause='projectName,projectPath,buildTargetPath', sTable='availableTargetsWithSite', sWhereClause='site=\'' + dConfig['queueSite'] + '\'', sOrderByClause='projectName,ranking', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
+            lTargetRows = dMp.iselect(sSelectClause='projectName,projectPath,buildTargetPath', sTable='availableTargetsWithSite', sWhereClause='site=\'' + dConfig['queueSite'] + '\'', sOrderByClause='projectName,ranking', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
 
         else:
 
-            lTargetRows = dMp.select(sSelectClause='projectName,projectPath,buildTargetPath', sTable='availableTargets', sOrderByClause='projectName,ranking', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
-
-    dMp.close()
+            lTargetRows = dMp.iselect(sSelectClause='projectName,projectPath,buildTargetPath', sTable='availableTargets', sOrderByClause='projectName,ranking', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
 
+    # rows are streamed from mysql; the connection stays open until they have all been consumed
     for tTargetRow in lTargetRows:
 
         dTarget = {}
@@ -823,11 +953,16 @@ def queueUpBuildTargets(dConfig):
 
                 # new project encountered, push old project onto queue
                 if dConfig['debug']: debug('func: queueUpBuildTargets() queuing project:', json.dumps(dProject, indent=4))
-                qRedis.put(json.dumps(dProject))
+                lProjects.append( queueEntry(dProject, dCosts, iDefaultCost, dConfig) )
                 iProjectCount += 1
                 if len(lLeadingPaths) > 1:
                     iMultiTargets += 1
 
+                if len(lProjects) >= dConfig['redis-bulk-chunk-size']:
+
+                    iQueued += qRedis.putMany(lProjects, chunk=dConfig['redis-bulk-chunk-size'])
+                    lProjects = []
+
                 dProject = {
                     'projectName': sProjectName,
                     'projectPath': sProjectPath,
@@ -863,14 +998,19 @@ def queueUpBuildTargets(dConfig):
 
             lLeadingPaths = [ sLeadingPath ]
 
+    dMp.close()
+
     if dConfig['debug']: debug('func: queueUpBuildTargets() queuing project:', json.dumps(dProject, indent=4))
 
-    qRedis.put(json.dumps(dProject))
+    lProjects.append( queueEntry(dProject, dCosts, iDefaultCost, dConfig) )
     iProjectCount += 1        
     if len(lLeadingPaths) > 1:
         iMultiTargets += 1
 
+    iQueued += qRedis.putMany(lProjects, chunk=dConfig['redis-bulk-chunk-size'])
+
     printMsg('func: queueUpBuildTargets()', str(iProjectCount), 'projects queued', str(iTargetCount), 'targets queued', str(iMultiTargets), 'multi-target projects queued')
+    printMsg('func: queueUpBuildTargets()', str(iQueued), 'projects pushed,', str(iProjectCount - iQueued), 'skipped as already queued')
     printMsg('func: queueUpBuildTargets()', qRedis.size(), 'projects reported by redis')
 
 ###
@@ -881,12 +1021,15 @@ def queueUpSourceTargets(dConfig):
         dMp = MuseProjectDB(db=dConfig['mysql-db'],port=dConfig['mysql-port'],user=dConfig['mysql-user'],passwd=dConfig['mysql-passwd'],loc=dConfig['mysql-loc'])
         
         # setup to-build queue
-        qRedis = RedisQueue(dConfig['redis-queue-to-build'], namespace='queue', host=dConfig['redis-loc'], port=dConfig['redis-port'])
+        qRedis = getToBuildQueue(dConfig)
         
         dMp.open()
 
+        (dCosts, iDefaultCost) = loadBuildCosts(dMp, dConfig)
+
         # get projects first to iterate through (makes it easier to build project specific dictionaries), limit if in debug mode
         iProjectCount = 0
+        iQueued = 0
         iTargetCount = 0
         iMultiTargets = 0
 
@@ -898,6 +1041,9 @@ def queueUpSourceTargets(dConfig):
         
         dProject = {}
 
+        # serialized projects waiting to be pushed onto the to-build queue
+        lProjects = []
+
         dCodeDirLookup = {}
         lProjectRows = dMp.select(sSelectClause='projectName,codeDir', sTable='availableProjects', bDebug=dConfig['debug'])
         for tProjectRow in lProjectRows:
@@ -911,24 +1057,23 @@ def queueUpSourceTargets(dConfig):
 
             if dConfig['queueSite']:
 
-                lTargetRows = dMp.select(sSelectClause='projectName,projectPath,buildTargetPath', sTable='unBuiltSourceTargetsWithSite', sWhereClause='site=\'' + dConfig['queueSite'] + '\'', sOrderByClause='projectName', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
+                lTargetRows = dMp.iselect(sSelectClause='projectName,projectPath,buildTargetPath', sTable='unBuiltSourceTargetsWithSite', sWhereClause='site=\'' + dConfig['queueSite'] + '\'', sOrderByClause='projectName', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
 
             else:
 
-                lTargetRows = dMp.select(sSelectClause='projectName,projectPath,buildTargetPath', sTable='unBuiltSourceTargets', sOrderByClause='projectName', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
+                lTargetRows = dMp.iselect(sSelectClause='projectName,projectPath,buildTargetPath', sTable='unBuiltSourceTargets', sOrderByClause='projectName', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
 
         else:
 
             if dConfig['queueSite']:
 
-                lTargetRows = dMp.select(sSelectClause='projectName,projectPath,buildTargetPath', sTable='availableSourceTargetsWithSite', sWhereClause='site=\'' + dConfig['queueSite'] + '\'', sOrderByClause='projectName', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
+                lTargetRows = dMp.iselect(sSelectClause='projectName,projectPath,buildTargetPath', sTable='availableSourceTargetsWithSite', sWhereClause='site=\'' + dConfig['queueSite'] + '\'', sOrderByClause='projectName', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
 
             else:
 
-                lTargetRows = dMp.select(sSelectClause='projectName,projectPath,buildTargetPath', sTable='availableSourceTargets', sOrderByClause='projectName', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
-
-        dMp.close()
+                lTargetRows = dMp.iselect(sSelectClause='projectName,projectPath,buildTargetPath', sTable='availableSourceTargets', sOrderByClause='projectName', sLimitClause=sLimitClause, bDebug=dConfig['debug'])
 
+        # rows are streamed from mysql; the connection stays open until they have all been consumed
         for tTargetRow in lTargetRows:
 
             dTarget = {}
@@ -964,11 +1109,16 @@ def queueUpSourceTargets(dConfig):
 
                             # new project encountered, push old project onto queue
                             if dConfig['debug']: debug('func: queueUpSourceTargets() queuing project:', json.dumps(dProject, indent=4))
-                            qRedis.put(json.dumps(dProject))
+                            lProjects.append( queueEntry(dProject, dCosts, iDefaultCost, dConfig) )
                             iProjectCount += 1
                             if len(lLeadingPaths) > 1:
                                 iMultiTargets += 1
 
+                            if len(lProjects) >= dConfig['redis-bulk-chunk-size']:
+
+                                iQueued += qRedis.putMany(lProjects, chunk=dConfig['redis-bulk-chunk-size'])
+                                lProjects = []
+
                             dProject = {
                                 'projectName': sProjectName,
                                 'projectPath': sProjectPath,
@@ -1012,20 +1162,24 @@ def queueUpSourceTargets(dConfig):
 
                 warning('func: queueUpSourceTargets() missing file extension encountered file-path:') #,dTarget['buildTargetPath'],'for project:', sProjectName)
 
+        dMp.close()
 
         if dConfig['debug']: debug('func: queueUpSourceTargets() queuing project:', json.dumps(dProject, indent=4))
 
-        qRedis.put(json.dumps(dProject))
+        lProjects.append( queueEntry(dProject, dCosts, iDefaultCost, dConfig) )
         iProjectCount += 1        
         if len(lLeadingPaths) > 1:
             iMultiTargets += 1
 
+        iQueued += qRedis.putMany(lProjects, chunk=dConfig['redis-bulk-chunk-size'])
+
         printMsg('func: queueUpSourceTargets()', str(iProjectCount), 'projects queued', str(iTargetCount), 'targets queued', str(iMultiTargets), 'multi-target projects queued')
+        printMsg('func: queueUpSourceTargets()', str(iQueued), 'projects pushed,', str(iProjectCount - iQueued), 'skipped as already queued')
         printMsg('func: queueUpSourceTargets()', qRedis.size(), 'projects reported by redis')
         
 ###
 def usage():
-    warning('Usage: queueProjectsToBuildByType.py --corpus-dir-path=/data/corpus_0to7 --forks=5 --analyze-projects --crawl-projects --unbuilt-projects-only --queue-projects --debug')
+    warning('Usage: queueProjectsToBuildByType.py --corpus-dir-path=/data/corpus_0to7 --forks=5 --analyze-projects --crawl-projects --unbuilt-projects-only --queue-projects --queue-priority=targets|sources|buildTime --queue-stream --queue-codec=json|msgpack|msgpack-zstd --resume --bulk-load --use-summaries --mysql-db=muse|sqlite:////tmp/muse.db --slow-query=5 --query-stats-interval=600 --walker-forks=16 --manifest=/data/crawl/corpus.manifest --debug')
 
 ###
 def main(argv):
@@ -1060,12 +1214,42 @@ def main(argv):
     dConfig['mysql-loc'] = 'muse2-int'
     dConfig['mysql-port'] = 54321 
     dConfig['mysql'] = True
-    dConfig['mysql-bulk-statement-size'] = 100
+    dConfig['mysql-bulk-statement-size'] = 1000
+
+    # --bulk-load: analyze phase loads targets with LOAD DATA LOCAL INFILE, secondary indexes are dropped for the fill and rebuilt after
+    dConfig['mysql-bulk-load'] = False
+    dConfig['mysql-bulk-load-size'] = 50000
+    dConfig['mysql-bulk-load-tables'] = ['buildTargets', 'sourceTargets']
+
+    # --use-summaries: queue build targets from the materialized summary tables (topTargets is refreshed by --analyze-projects,
+    # and before queuing if buildTargets changed since)
+    dConfig['mysql-summaries'] = False
 
     dConfig['queueUpFilesForBuilding'] = False
     dConfig['queueSite'] = ''
 
+    # --queue-priority: score projects by expected build cost so the longest builds are handed out first
+    dConfig['queuePriority'] = ''
+    dConfig['queue-priority-cols'] = {
+        'buildTime' : 'buildTime',
+        'sources' : 'numSources'
+    }
+
+    # --resume: don't flush queues first; producers only queue what they haven't queued before (list queues only)
+    dConfig['resume'] = False
+
+    # --queue-stream: queue projects on a redis stream instead of a list
+    dConfig['queueStream'] = False
+
+    # --queue-codec: to-build queue payload encoding, <json|msgpack>[-<zlib|zstd>]; compression applies to items of at least threshold bytes
+    dConfig['redis-queue-codec'] = 'json'
+    dConfig['redis-queue-codecs'] = ['json', 'json-zlib', 'json-zstd', 'msgpack', 'msgpack-zlib', 'msgpack-zstd']
+    dConfig['redis-queue-codec-threshold'] = 1024
+
     dConfig['redis-queue-to-build'] = 'muse-to-build'
+    dConfig['redis-queue-to-build-priority'] = 'muse-to-build-priority'
+    dConfig['redis-stream-to-build'] = 'muse-to-build'
+    dConfig['redis-stream-group'] = 'muse-builders'
     dConfig['redis-queue-building'] = 'muse-building'
     # dConfig['redis-queue-build-targets'] = 'muse-build-targets'
     dConfig['redis-queue-project-paths'] = 'muse-project-paths'
@@ -1073,6 +1257,13 @@ def main(argv):
     dConfig['redis-loc'] = 'muse2-int'
     dConfig['redis-port'] = '12345'
     dConfig['redis'] = True
+    dConfig['redis-bulk-chunk-size'] = 1000
+
+    # processes walking the corpus for project roots (--crawl-projects)
+    dConfig['walker-forks'] = 16
+
+    # project-root manifest read instead of walking the corpus (--crawl-projects, see corpusManifest.py)
+    dConfig['manifest'] = None
 
     dConfig['time-stamp'] = datetime.datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
     dConfig['unBuiltProjectsOnly'] = False
@@ -1097,7 +1288,7 @@ def main(argv):
     }
 
     ### command line argument handling
-    options, remainder = getopt.getopt(sys.argv[1:], 'c:f:apuqs:d', ['corpus-dir-path=','forks=','analyze-projects','crawl-projects','unbuilt-projects-only','queue-projects','queue-site=','debug'])
+    options, remainder = getopt.getopt(sys.argv[1:], 'c:f:apuqs:d', ['corpus-dir-path=','forks=','analyze-projects','crawl-projects','unbuilt-projects-only','queue-projects','queue-site=','queue-priority=','queue-stream','queue-codec=','resume','bulk-load','use-summaries','mysql-db=','slow-query=','query-stats-interval=','walker-forks=','manifest=','debug'])
 
     debug('func: main()', 'options:', options)
     debug('func: main()', 'remainder:', remainder)
@@ -1128,6 +1319,66 @@ def main(argv):
 
             dConfig['queueSite'] = arg
 
+        elif opt == '--queue-priority':
+
+            if arg == 'targets' or arg in dConfig['queue-priority-cols']:
+
+                dConfig['queuePriority'] = arg
+
+            else:
+
+                bError = True
+
+        elif opt == '--queue-stream':
+
+            dConfig['queueStream'] = True
+
+        elif opt == '--queue-codec':
+
+            if arg in dConfig['redis-queue-codecs']:
+
+                dConfig['redis-queue-codec'] = arg
+
+            else:
+
+                bError = True
+
+        elif opt == '--resume':
+
+            dConfig['resume'] = True
+
+        elif opt == '--bulk-load':
+
+            dConfig['mysql-bulk-load'] = True
+
+        elif opt == '--use-summaries':
+
+            dConfig['mysql-summaries'] = True
+
+        elif opt == '--mysql-db':
+
+            # database name, or a sqlite url to run against a local file instead of the mysql server
+            dConfig['mysql-db'] = arg
+
+        elif opt == '--slow-query':
+
+            # log mysql statements slower than this many seconds
+            configureQueryStats(fSlowQuery=arg)
+
+        elif opt == '--query-stats-interval':
+
+            # also write the per method / table query summary every this many seconds, not just on close
+            configureQueryStats(iInterval=arg)
+
+        elif opt == '--walker-forks':
+
+            if arg.isdigit(): dConfig['walker-forks'] = int(arg)
+            else: bError = True
+
+        elif opt == '--manifest':
+
+            dConfig['manifest'] = arg
+
         elif opt in ('-u', '--unbuilt-projects-only'):
 
             dConfig['unBuiltProjectsOnly'] = True
@@ -1139,6 +1390,13 @@ def main(argv):
     # debug(json.dumps(dConfig, indent=4))
 
     if dConfig['crawl-projects'] and not os.path.isdir(sCorpusPath): bError = True
+    if dConfig['manifest'] and not os.path.isfile(dConfig['manifest']): bError = True
+
+    # stream entries are consumed in insertion order; they can't be scored
+    if dConfig['queueStream'] and dConfig['queuePriority']: bError = True
+
+    # only the to-build list queue is enqueue-once
+    if dConfig['resume'] and dConfig['queueUpFilesForBuilding'] and (dConfig['queueStream'] or dConfig['queuePriority']): bError = True
 
     if bError: usage()
     else:
@@ -1149,8 +1407,8 @@ def main(argv):
 
         if dConfig['crawl-projects']:
 
-            # initialize projects table/queue
-            initProjects(dConfig)
+            # initialize projects table/queue (kept when resuming; already queued roots are skipped)
+            if not dConfig['resume']: initProjects(dConfig)
 
             # call producer process that populates mysql with project names from sCorpusPath 
             pfindProjects = multiprocessing.Process( target=findProjects, args=(sCorpusPath, dConfig) )
@@ -1178,34 +1436,65 @@ def main(argv):
             # initialize targets table/queue
             initTargets(dConfig)
 
-            pBuildTargets = multiprocessing.Process( target=findBuildTargets, args=(dConfig, ) )
-            pBuildTargets.start()
+            if dConfig['mysql-bulk-load']:
+
+                dMp = MuseProjectDB(db=dConfig['mysql-db'],port=dConfig['mysql-port'],user=dConfig['mysql-user'],passwd=dConfig['mysql-passwd'],loc=dConfig['mysql-loc'])
+
+                for sTable in dConfig['mysql-bulk-load-tables']:
+
+                    dMp.disableIndexes(sTable, bDebug=dConfig['debug'])
+
+                # the dropped index definitions stay on dMp for the rebuild; don't carry the connection across the forks
+                dMp.close()
+
+            try:
+
+                pBuildTargets = multiprocessing.Process( target=findBuildTargets, args=(dConfig, ) )
+                pBuildTargets.start()
         
-            pBuildTargets.join()
+                pBuildTargets.join()
 
-            pSourceTargets = multiprocessing.Process( target=findSourceTargets, args=(dConfig, ) )
-            pSourceTargets.start()
+                pSourceTargets = multiprocessing.Process( target=findSourceTargets, args=(dConfig, ) )
+                pSourceTargets.start()
 
-            # create pool of workers
-            oSourceTargetIndexerPool = multiprocessing.Pool(processes=dConfig['forks'])
+                # create pool of workers
+                oSourceTargetIndexerPool = multiprocessing.Pool(processes=dConfig['forks'])
 
-            lArgs = []
+                lArgs = []
 
-            for i in range(0, dConfig['forks']):
+                for i in range(0, dConfig['forks']):
 
-                lArgs.append(dConfig)
+                    lArgs.append(dConfig)
 
-            ### do work -- use pool of workers to index source targets
-            oSourceTargetIndexerPool.map(indexSourceTargets, lArgs)
+                ### do work -- use pool of workers to index source targets
+                oSourceTargetIndexerPool.map(indexSourceTargets, lArgs)
+
+                pSourceTargets.join()
+
+                oSourceTargetIndexerPool.close()
+                oSourceTargetIndexerPool.join()
+
+            finally:
 
-            pSourceTargets.join()
+                if dConfig['mysql-bulk-load']:
 
-            oSourceTargetIndexerPool.close()
-            oSourceTargetIndexerPool.join()
+                    # rebuilt even if the analysis failed; indexes lost with an earlier, killed run come back from the declared ones
+                    for sTable in dConfig['mysql-bulk-load-tables']:
+
+                        dMp.rebuildIndexes(sTable, bDebug=dConfig['debug'])
+
+                    dMp.close()
+
+            # topTargets (--use-summaries) from the build targets just found
+            dMp = MuseProjectDB(db=dConfig['mysql-db'],port=dConfig['mysql-port'],user=dConfig['mysql-user'],passwd=dConfig['mysql-passwd'],loc=dConfig['mysql-loc'])
+            dMp.rebuildTopTargets(bDebug=dConfig['debug'])
+            dMp.close()
 
         elif dConfig['queueUpFilesForBuilding']:
 
-            initBuildQueues(dConfig=dConfig)
+            # keep the to-build queue when resuming; already queued projects are skipped
+            if not dConfig['resume']: initBuildQueues(dConfig=dConfig)
+
             queueUpBuildTargets(dConfig=dConfig)
             queueUpSourceTargets(dConfig=dConfig)
 
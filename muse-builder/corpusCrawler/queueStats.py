@@ -0,0 +1,273 @@
+#!/usr/bin/python
+##
+## Copyright (c) 2014-2017 Leidos.
+## 
+## License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+##
+##
+## Developed under contract #FA8750-14-C-0241
+##
+from __future__ import print_function
+
+import getopt
+import json
+import sys
+import time
+
+from locallibs import debug
+from locallibs import printMsg
+from locallibs import warning
+
+from redisHelper import getRedis
+from redisHelper import getTelemetryKeys
+
+###################
+
+###
+# returns [(sKey, sType)] for the queues, sets and streams matching lPatterns
+# (helper keys such as lease sets, dedup seen sets, set version counters and stream consumer counters are skipped)
+###
+def findKeys(oRedis, dConfig):
+
+    lKeys = []
+
+    for sPattern in dConfig['patterns']:
+
+        lKeys.extend( sKey for sKey in oRedis.scan_iter(match=sPattern, count=1000) if not sKey.endswith( (':leases', ':seen') ) )
+
+    lKeys = sorted( set(lKeys) )
+
+    oPipe = oRedis.pipeline(transaction=False)
+
+    for sKey in lKeys:
+
+        oPipe.type(sKey)
+
+    lTypes = oPipe.execute()
+
+    return [ (sKey, sType) for (sKey, sType) in zip(lKeys, lTypes) if sType in dConfig['depth-commands'] ]
+
+###
+# returns { sKey : (iDepth, iIn, iOut) } -- iIn/iOut are the telemetry counters, None if telemetry is off for sKey
+###
+def sampleKeys(oRedis, lKeys, dConfig):
+
+    dSample = {}
+
+    oPipe = oRedis.pipeline(transaction=False)
+
+    for (sKey, sType) in lKeys:
+
+        oPipe.execute_command(dConfig['depth-commands'][sType], sKey)
+        oPipe.hmget(getTelemetryKeys(sKey)[0], 'in', 'out')
+
+    lResults = oPipe.execute()
+
+    for (iCtr, (sKey, sType)) in enumerate(lKeys):
+
+        iDepth = lResults[2 * iCtr]
+        (sIn, sOut) = lResults[2 * iCtr + 1]
+
+        dSample[sKey] = (iDepth, int(sIn) if sIn is not None else None, int(sOut) if sOut is not None else None)
+
+    return dSample
+
+###
+# returns the fPct percentile of sorted list lValues (None if empty)
+###
+def percentile(lValues, fPct):
+
+    if not lValues:
+
+        return None
+
+    return lValues[ min( len(lValues) - 1, int(fPct * len(lValues)) ) ]
+
+###
+# samples every key twice, dConfig['interval'] seconds apart, and returns a list of per-key stats
+###
+def collectStats(oRedis, dConfig):
+
+    lStats = []
+
+    lKeys = findKeys(oRedis, dConfig)
+
+    if dConfig['debug']: debug('func: collectStats() keys:', json.dumps(lKeys))
+
+    fStart = time.time()
+    dStart = sampleKeys(oRedis, lKeys, dConfig)
+
+    time.sleep(dConfig['interval'])
+
+    fElapsed = time.time() - fStart
+    dEnd = sampleKeys(oRedis, lKeys, dConfig)
+
+    for (sKey, sType) in lKeys:
+
+        (iDepth, iIn, iOut) = dEnd[sKey]
+
+        dStats = {
+            'key' : sKey,
+            'type' : sType,
+            'depth' : iDepth,
+            'net/s' : (iDepth - dStart[sKey][0]) / fElapsed,
+            'in/s' : None,
+            'out/s' : None,
+            'p50' : None,
+            'p99' : None
+        }
+
+        # counters only exist for queues with telemetry on
+        if iIn is not None and dStart[sKey][1] is not None:
+
+            dStats['in/s'] = (iIn - dStart[sKey][1]) / fElapsed
+            dStats['out/s'] = (iOut - dStart[sKey][2]) / fElapsed
+
+            lWaits = sorted( float(sWait) for sWait in oRedis.lrange(getTelemetryKeys(sKey)[2], 0, -1) )
+
+            dStats['p50'] = percentile(lWaits, 0.50)
+            dStats['p99'] = percentile(lWaits, 0.99)
+
+        lStats.append(dStats)
+
+    return lStats
+
+###
+# format a rate / duration column, '-' if unknown
+###
+def formatValue(fValue):
+
+    return '-' if fValue is None else '%.1f' %(fValue)
+
+###
+def printStats(lStats, dConfig):
+
+    if dConfig['json']:
+
+        printMsg( json.dumps(lStats, indent=4, sort_keys=True) )
+        return
+
+    sFormat = '%-48s %-6s %12s %10s %10s %10s %10s %10s'
+
+    printMsg( sFormat %('key', 'type', 'depth', 'net/s', 'in/s', 'out/s', 'p50 (s)', 'p99 (s)') )
+
+    for dStats in lStats:
+
+        printMsg( sFormat %(dStats['key'], dStats['type'], dStats['depth'], formatValue(dStats['net/s']), formatValue(dStats['in/s']), formatValue(dStats['out/s']), formatValue(dStats['p50']), formatValue(dStats['p99'])) )
+
+###
+# turn RedisQueue telemetry on for queue sKey; producers and consumers started afterwards record to it
+###
+def enableTelemetry(oRedis, sKey):
+
+    sStatsKey = getTelemetryKeys(sKey)[0]
+
+    oRedis.hsetnx(sStatsKey, 'in', 0)
+    oRedis.hsetnx(sStatsKey, 'out', 0)
+
+    printMsg('func: enableTelemetry() telemetry enabled for', sKey, '-- time in queue is accurate once items queued from now on reach the head of the queue')
+
+###
+# turn RedisQueue telemetry off for queue sKey (processes that already have it on keep recording until restarted)
+###
+def disableTelemetry(oRedis, sKey):
+
+    oRedis.delete( *getTelemetryKeys(sKey) )
+
+    printMsg('func: disableTelemetry() telemetry removed for', sKey)
+
+###
+def usage():
+    warning('Usage: queueStats.py --interval=10 --pattern="queue:*" --enable-telemetry=queue:muse-to-build --disable-telemetry=queue:muse-to-build --json --debug')
+
+###
+def main(argv):
+
+    # defaults
+    bError = False
+
+    dConfig = {}
+
+    dConfig['debug'] = False
+
+    # seconds between the two samples rates are computed from
+    dConfig['interval'] = 10
+
+    dConfig['json'] = False
+
+    dConfig['patterns'] = ['queue:*', 'set:*', 'stream:*']
+
+    # depth command per key type reported on
+    dConfig['depth-commands'] = {
+        'list' : 'LLEN',
+        'zset' : 'ZCARD',
+        'set' : 'SCARD',
+        'stream' : 'XLEN'
+    }
+
+    dConfig['redis-loc'] = 'muse2-int'
+    dConfig['redis-port'] = '12345'
+
+    lEnable = []
+    lDisable = []
+    lPatterns = []
+
+    ### command line argument handling
+    options, remainder = getopt.getopt(sys.argv[1:], 'i:p:e:x:jd', ['interval=','pattern=','enable-telemetry=','disable-telemetry=','json','debug'])
+
+    for opt, arg in options:
+
+        if opt in ('-i', '--interval'):
+
+            try:
+
+                dConfig['interval'] = float(arg)
+
+            except ValueError as e:
+
+                bError = True
+
+        elif opt in ('-p', '--pattern'):
+
+            lPatterns.append(arg)
+
+        elif opt in ('-e', '--enable-telemetry'):
+
+            lEnable.append(arg)
+
+        elif opt in ('-x', '--disable-telemetry'):
+
+            lDisable.append(arg)
+
+        elif opt in ('-j', '--json'):
+
+            dConfig['json'] = True
+
+        elif opt in ('-d', '--debug'):
+
+            dConfig['debug'] = True
+
+    if lPatterns: dConfig['patterns'] = lPatterns
+
+    if dConfig['debug']: debug('func: main()', 'dConfig:', json.dumps(dConfig, indent=4))
+
+    if bError: usage()
+    else:
+
+        oRedis = getRedis(host=dConfig['redis-loc'], port=dConfig['redis-port'])
+
+        for sKey in lEnable:
+
+            enableTelemetry(oRedis, sKey)
+
+        for sKey in lDisable:
+
+            disableTelemetry(oRedis, sKey)
+
+        if not lEnable and not lDisable:
+
+            printStats( collectStats(oRedis, dConfig), dConfig )
+
+###
+if __name__ == "__main__":
+    main(sys.argv[1:])
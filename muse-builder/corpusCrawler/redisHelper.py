@@ -11,25 +11,940 @@ from __future__ import print_function
 
 # redisQueue.py
 
+import collections
+import json
 import multiprocessing
+import os
 import redis
+import socket
 import sys
+import threading
+import time
+import uuid
+import zlib
+
+# optional payload codecs (see QueueCodec)
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 from locallibs import debug
 from locallibs import printMsg
 from locallibs import warning
 
+###
+# lua scripts backing the lease mode of RedisQueue (KEYS[1] = queue, KEYS[2] = lease sorted set, KEYS[3] = leased items hash)
+#
+# every lease has its own token (scored by its deadline in the sorted set, mapped to the stored item in the hash), so
+# identical items in flight at the same time hold separate leases. KEYS[4] counts per stored item how often its lease
+# expired; an item reaped ARGV[3] times is moved to the dead letter list KEYS[5] instead of being queued again
+###
+
+# pop the next item and lease it under token ARGV[2] until ARGV[1]
+LEASE_CLAIM_SCRIPT = """
+local item = redis.call('RPOP', KEYS[1])
+if item then
+    redis.call('ZADD', KEYS[2], ARGV[1], ARGV[2])
+    redis.call('HSET', KEYS[3], ARGV[2], item)
+end
+return item
+"""
+
+# extend the lease deadline of token ARGV[2] to ARGV[1]; returns 0 if the lease was already lost
+LEASE_HEARTBEAT_SCRIPT = """
+if redis.call('ZSCORE', KEYS[2], ARGV[2]) then
+    redis.call('ZADD', KEYS[2], ARGV[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# release the lease with token ARGV[1] and reset its item's reap count; returns 0 if the lease was already lost
+LEASE_ACK_SCRIPT = """
+if redis.call('ZREM', KEYS[2], ARGV[1]) == 0 then
+    return 0
+end
+local item = redis.call('HGET', KEYS[3], ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+if item then
+    redis.call('HDEL', KEYS[4], item)
+end
+return 1
+"""
+
+# move up to ARGV[2] leases that expired before ARGV[1] back to the consuming end of the queue, or to the dead letter
+# list once their item has been reaped ARGV[3] times (0 never dead letters); returns {re-queued, dead lettered}
+# (KEYS[6], if given, is the queue's enqueue timestamps list which has to stay aligned with the queue, see RedisQueue telemetry)
+LEASE_REAP_SCRIPT = """
+local tokens = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+local requeued = 0
+local dead = 0
+for i, token in ipairs(tokens) do
+    redis.call('ZREM', KEYS[2], token)
+    -- leases taken before lease tokens were introduced are keyed by the item itself
+    local item = redis.call('HGET', KEYS[3], token) or token
+    redis.call('HDEL', KEYS[3], token)
+    local reaps = redis.call('HINCRBY', KEYS[4], item, 1)
+    if tonumber(ARGV[3]) > 0 and reaps >= tonumber(ARGV[3]) then
+        redis.call('HDEL', KEYS[4], item)
+        redis.call('LPUSH', KEYS[5], item)
+        dead = dead + 1
+    else
+        redis.call('RPUSH', KEYS[1], item)
+        if KEYS[6] then
+            redis.call('RPUSH', KEYS[6], ARGV[1])
+        end
+        requeued = requeued + 1
+    end
+end
+return {requeued, dead}
+"""
+
+###
+# lua script backing the dedup (enqueue-once) mode of RedisQueue (KEYS[1] = queue, KEYS[2] = seen set,
+# optional KEYS[3] = telemetry enqueue timestamps, KEYS[4] = telemetry counters)
+###
+
+# push each item of the ARGV[2..] (key, item) pairs whose key is not yet in the seen set; ARGV[1] is the
+# enqueue time; returns the number of items pushed
+DEDUP_PUSH_SCRIPT = """
+local pushed = 0
+for i = 2, #ARGV, 2 do
+    if redis.call('SADD', KEYS[2], ARGV[i]) == 1 then
+        redis.call('LPUSH', KEYS[1], ARGV[i + 1])
+        if KEYS[3] then
+            redis.call('LPUSH', KEYS[3], ARGV[1])
+        end
+        pushed = pushed + 1
+    end
+end
+if KEYS[4] and pushed > 0 then
+    redis.call('HINCRBY', KEYS[4], 'in', pushed)
+end
+return pushed
+"""
+
+###
+# lua script backing RedisQueue telemetry (KEYS[1] = enqueue timestamps list, KEYS[2] = counters hash,
+# KEYS[3] = time-in-queue samples list)
+###
+
+# pop the enqueue timestamps of ARGV[1] dequeued items, record their time in queue as of ARGV[2] (keeping the
+# latest ARGV[3] samples) and count them out
+STATS_DEQUEUE_SCRIPT = """
+for i = 1, tonumber(ARGV[1]) do
+    local enqueued = redis.call('RPOP', KEYS[1])
+    if not enqueued then
+        break
+    end
+    redis.call('LPUSH', KEYS[3], tostring(tonumber(ARGV[2]) - tonumber(enqueued)))
+end
+redis.call('LTRIM', KEYS[3], 0, tonumber(ARGV[3]) - 1)
+redis.call('HINCRBY', KEYS[2], 'out', ARGV[1])
+return 1
+"""
+
+###
+# lua scripts backing RedisPriorityQueue (KEYS[1] = queue sorted set)
+###
+
+# pop the highest scoring item; if KEYS[2] is given, lease it there under token ARGV[2] until ARGV[1] (KEYS[3] = leased items hash)
+PRIORITY_POP_SCRIPT = """
+local items = redis.call('ZREVRANGE', KEYS[1], 0, 0)
+local item = items[1]
+if item then
+    redis.call('ZREM', KEYS[1], item)
+    if KEYS[2] then
+        redis.call('ZADD', KEYS[2], ARGV[1], ARGV[2])
+        redis.call('HSET', KEYS[3], ARGV[2], item)
+    end
+end
+return item
+"""
+
+# pop the highest scoring item and push it onto the secondary list KEYS[2]
+PRIORITY_POPNPUSH_SCRIPT = """
+local items = redis.call('ZREVRANGE', KEYS[1], 0, 0)
+local item = items[1]
+if item then
+    redis.call('ZREM', KEYS[1], item)
+    redis.call('LPUSH', KEYS[2], item)
+end
+return item
+"""
+
+# move up to ARGV[2] leases that expired before ARGV[1] back to the queue ahead of everything else, or to the dead
+# letter list (see LEASE_REAP_SCRIPT); returns {re-queued, dead lettered}
+PRIORITY_REAP_SCRIPT = """
+local tokens = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+local requeued = 0
+local dead = 0
+for i, token in ipairs(tokens) do
+    redis.call('ZREM', KEYS[2], token)
+    local item = redis.call('HGET', KEYS[3], token) or token
+    redis.call('HDEL', KEYS[3], token)
+    local reaps = redis.call('HINCRBY', KEYS[4], item, 1)
+    if tonumber(ARGV[3]) > 0 and reaps >= tonumber(ARGV[3]) then
+        redis.call('HDEL', KEYS[4], item)
+        redis.call('LPUSH', KEYS[5], item)
+        dead = dead + 1
+    else
+        redis.call('ZADD', KEYS[1], '+inf', item)
+        requeued = requeued + 1
+    end
+end
+return {requeued, dead}
+"""
+
+###
+# lua scripts backing RedisStreamQueue (KEYS[1] = stream, KEYS[2] = per-consumer counters hash,
+# ARGV[1] = consumer group, ARGV[2] = consumer)
+###
+
+# claim an entry stalled longer than ARGV[3] ms from a dead consumer, otherwise read the next new entry; returns {id, {field, value}}.
+# an entry that has stalled ARGV[4] times (0 = no limit) is moved to the dead letter list KEYS[3] instead of being claimed
+STREAM_CLAIM_SCRIPT = """
+local claimed = redis.call('XAUTOCLAIM', KEYS[1], ARGV[1], ARGV[2], ARGV[3], '0-0', 'COUNT', 1)
+local entry = claimed[2][1]
+if entry then
+    if entry[2] then
+        local pending = redis.call('XPENDING', KEYS[1], ARGV[1], entry[1], entry[1], 1)
+        if tonumber(ARGV[4]) > 0 and pending[1] and pending[1][4] - 1 >= tonumber(ARGV[4]) then
+            for i = 1, #entry[2], 2 do
+                if entry[2][i] == 'item' then
+                    redis.call('LPUSH', KEYS[3], entry[2][i + 1])
+                end
+            end
+        else
+            redis.call('HINCRBY', KEYS[2], ARGV[2] .. ':reclaimed', 1)
+            return entry
+        end
+    end
+    redis.call('XACK', KEYS[1], ARGV[1], entry[1])
+    redis.call('XDEL', KEYS[1], entry[1])
+end
+local streams = redis.call('XREADGROUP', 'GROUP', ARGV[1], ARGV[2], 'COUNT', 1, 'STREAMS', KEYS[1], '>')
+if streams then
+    return streams[1][2][1]
+end
+return false
+"""
+
+# reset the idle time of entry ARGV[3] if it is still owned by ARGV[2]; returns 0 if it was reclaimed by another consumer
+STREAM_HEARTBEAT_SCRIPT = """
+local pending = redis.call('XPENDING', KEYS[1], ARGV[1], ARGV[3], ARGV[3], 1)
+if pending[1] and pending[1][2] == ARGV[2] then
+    redis.call('XCLAIM', KEYS[1], ARGV[1], ARGV[2], 0, ARGV[3], 'JUSTID')
+    return 1
+end
+return 0
+"""
+
+# acknowledge and delete entry ARGV[3], crediting ARGV[2] in the counters; returns 0 if the entry was not pending
+STREAM_ACK_SCRIPT = """
+local acked = redis.call('XACK', KEYS[1], ARGV[1], ARGV[3])
+if acked == 1 then
+    redis.call('XDEL', KEYS[1], ARGV[3])
+    redis.call('HINCRBY', KEYS[2], ARGV[2], 1)
+end
+return acked
+"""
+
+###
+# per-process registry of redis connection pools shared by all queue and set helpers
+#
+# pools are keyed by host/port/db (plus any other connection kwargs) and the registry
+# is dropped whenever the pid changes so that workers forked by multiprocessing.Pool
+# never reuse sockets inherited from their parent
+###
+dConnectionPools = {}
+iConnectionPoolsPid = None
+oConnectionPoolsLock = threading.Lock()
+
+###
+def getConnectionPool(**redis_kwargs):
+
+    global iConnectionPoolsPid
+
+    dKwargs = dict(redis_kwargs)
+    dKwargs['host'] = dKwargs.get('host', 'localhost')
+    dKwargs['port'] = int(dKwargs.get('port', 6379))
+    dKwargs['db'] = int(dKwargs.get('db', 0))
+
+    tKey = ( dKwargs['host'], dKwargs['port'], dKwargs['db'] ) + tuple( sorted( (sKey, sValue) for (sKey, sValue) in dKwargs.items() if sKey not in ('host', 'port', 'db') ) )
+
+    with oConnectionPoolsLock:
+
+        if iConnectionPoolsPid != os.getpid():
+
+            dConnectionPools.clear()
+            iConnectionPoolsPid = os.getpid()
+
+        if tKey not in dConnectionPools:
+
+            dConnectionPools[tKey] = redis.ConnectionPool(**dKwargs)
+
+        return dConnectionPools[tKey]
+
+###
+# redis client backed by the shared connection pool for the given connection parameters
+###
+def getRedis(**redis_kwargs):
+
+    return redis.Redis(connection_pool=getConnectionPool(**redis_kwargs))
+
+###
+# telemetry keys of queue sKey: (counters hash, enqueue timestamps list, time-in-queue samples list)
+###
+def getTelemetryKeys(sKey):
+
+    sStatsKey = 'stats:%s' %(sKey)
+
+    return (sStatsKey, '%s:enqueued' %(sStatsKey), '%s:waits' %(sStatsKey))
+
+###
+# Codec for queue payloads
+#
+# Items are encoded as plain json (the historical wire format) or msgpack, optionally
+# compressed with zlib or zstd when the encoded item is at least threshold bytes.
+# Anything other than plain json is prefixed with a one byte header naming its
+# format, so decode() needs no configuration and consumers can read queues written
+# with any codec settings (including plain json strings queued by older producers).
+###
+class QueueCodec(object):
+
+    # header byte for each (format, compression) pair; plain json has no header
+    dHeaders = {
+        ('msgpack', None) : b'\x00',
+        ('msgpack', 'zlib') : b'\x01',
+        ('msgpack', 'zstd') : b'\x02',
+        ('json', 'zlib') : b'\x03',
+        ('json', 'zstd') : b'\x04'
+    }
+
+    dFormats = dict( (sHeader, tFormat) for (tFormat, sHeader) in dHeaders.items() )
+
+    ###
+    # format is 'json' or 'msgpack', compression is None, 'zlib' or 'zstd'; missing
+    # optional packages fall back to json / zlib
+    ###
+    def __init__(self, format='json', compression=None, threshold=1024, level=3):
+
+        if format not in ('json', 'msgpack') or compression not in (None, 'zlib', 'zstd'):
+
+            raise ValueError('QueueCodec: unsupported format/compression: %s/%s' %(format, compression))
+
+        if format == 'msgpack' and msgpack is None:
+
+            warning('func: QueueCodec() msgpack is not installed, falling back to json')
+            format = 'json'
+
+        if compression == 'zstd' and zstandard is None:
+
+            warning('func: QueueCodec() zstandard is not installed, falling back to zlib')
+            compression = 'zlib'
+
+        self.sFormat = format
+        self.sCompression = compression
+        self.iThreshold = threshold
+        self.iLevel = level
+
+    ###
+    # build a codec from a name of the form <format>[-<compression>], e.g. json, msgpack, msgpack-zstd
+    ###
+    @classmethod
+    def fromName(cls, sName, **kwargs):
+
+        (sFormat, sSep, sCompression) = sName.partition('-')
+
+        return cls(format=sFormat, compression=(sCompression if sCompression else None), **kwargs)
+
+    ###
+    def encode(self, item):
+
+        if self.sFormat == 'msgpack':
+
+            sData = msgpack.packb(item, use_bin_type=True)
+
+        else:
+
+            sData = json.dumps(item)
+
+        # compressors and the header need bytes (json.dumps returns text on python 3)
+        if not isinstance(sData, bytes):
+
+            sData = sData.encode('utf-8')
+
+        if self.sCompression and len(sData) >= self.iThreshold:
+
+            if self.sCompression == 'zstd':
+
+                sData = zstandard.ZstdCompressor(level=self.iLevel).compress(sData)
+
+            else:
+
+                sData = zlib.compress(sData, self.iLevel)
+
+            return self.dHeaders[ (self.sFormat, self.sCompression) ] + sData
+
+        if self.sFormat == 'msgpack':
+
+            return self.dHeaders[ (self.sFormat, None) ] + sData
+
+        return sData
+
+    ###
+    def decode(self, data):
+
+        tFormat = self.dFormats.get( data[:1] )
+
+        if not tFormat:
+
+            return json.loads(data)
+
+        (sFormat, sCompression) = tFormat
+        sData = data[1:]
+
+        if sCompression == 'zstd':
+
+            if zstandard is None:
+
+                raise ImportError('QueueCodec: zstandard is required to decode this item')
+
+            sData = zstandard.ZstdDecompressor().decompress(sData)
+
+        elif sCompression == 'zlib':
+
+            sData = zlib.decompress(sData)
+
+        if sFormat == 'msgpack':
+
+            if msgpack is None:
+
+                raise ImportError('QueueCodec: msgpack is required to decode this item')
+
+            return msgpack.unpackb(sData, raw=False)
+
+        return json.loads(sData)
+
+###
+# Item encoding shared by RedisQueue, RedisPriorityQueue and asyncRedisHelper.AsyncRedisQueue
+#
+# Items go through codec (a QueueCodec) on the way in and out, or are stored as given
+# without one. getnpush hands out decoded items but done() has to LREM the exact value
+# stored on the secondary list, so the stored form of each item handed out is remembered
+# (by id) until done() -- at most maxTracked of them, oldest dropped first, so items that
+# are never done (e.g. failed builds) don't pile up. An item that isn't remembered is
+# re-encoded, which only matches the stored value if the codec reproduces it.
+###
+class QueueItems(object):
+
+    ###
+    def __init__(self, codec=None, maxTracked=10000):
+
+        self.oCodec = codec
+        self.iMaxTracked = maxTracked
+
+        # id(item) -> (item, stored form), in the order the items were handed out
+        self.dStored = collections.OrderedDict()
+
+    ###
+    # encode item for storage
+    ###
+    def encode(self, item):
+
+        return self.oCodec.encode(item) if self.oCodec else item
+
+    ###
+    # decode item read from redis; bTrack remembers its stored form for stored()
+    ###
+    def decode(self, data, bTrack=False):
+
+        if not self.oCodec or data is None:
+
+            return data
+
+        item = self.oCodec.decode(data)
+
+        if bTrack:
+
+            self.dStored[ id(item) ] = (item, data)
+
+            while len(self.dStored) > self.iMaxTracked:
+
+                self.dStored.popitem(last=False)
+
+        return item
+
+    ###
+    # return (and forget) the stored form of an item handed out by decode(bTrack=True)
+    ###
+    def stored(self, item):
+
+        if not self.oCodec:
+
+            return item
+
+        tStored = self.dStored.pop(id(item), None)
+
+        if tStored and tStored[0] is item:
+
+            return tStored[1]
+
+        return self.encode(item)
+
+    ###
+    # forget every item handed out (e.g. when the queue is flushed)
+    ###
+    def clear(self):
+
+        self.dStored.clear()
+
 ###
 # Simple Queue with Redis Backend
 ###
-class RedisQueue(object):
+class RedisQueue(object):
+
+    ###
+    # The default connection parameters are: host='localhost', port=6379, db=0
+    #
+    # leaseTimeout is the number of seconds a claimed item (see getLease) may go
+    # without a heartbeat before the reaper puts it back in the queue; an item whose
+    # leases expire maxReaps times (e.g. a project that keeps crashing its builders)
+    # is moved to the <queue>:dead list instead (0 re-queues it forever)
+    #
+    # codec (a QueueCodec) encodes items on put and decodes them on get; by default
+    # items are stored as given
+    #
+    # telemetry records enqueue/dequeue counters and time-in-queue samples under
+    # stats:<queue> (reported by queueStats.py). By default (None) it is on if the
+    # queue's stats:<queue> counters exist, so enabling it once for a queue (telemetry=True
+    # or queueStats.py --enable-telemetry) makes every producer and consumer record.
+    # Time in queue assumes FIFO order and is approximate with several consumers.
+    #
+    # dedup makes the queue enqueue-once: put/putMany skip items whose key is in the
+    # companion <queue>:seen set (kept until flush or forget), so producers can be re-run
+    # after a partial failure without queuing duplicates. dedupKey(item) gives the key
+    # of an item (before encoding); by default the stored item itself is the key.
+    ###
+    def __init__(self, name, name2=None, namespace='queue', leaseTimeout=600, maxReaps=3, codec=None, telemetry=None, dedup=False, dedupKey=None, **redis_kwargs):
+
+        self.__db= getRedis(**redis_kwargs)
+        self.sKey = '%s:%s' %(namespace, name)
+
+        self.sKey2 = None
+
+        if name2:
+
+            self.sKey2 = '%s:%s' %(namespace, name2)
+
+        # sorted set of lease tokens scored by lease deadline (epoch seconds), hash of token -> leased item,
+        # hash of item -> expired lease count and the dead letter list
+        self.sLeaseKey = '%s:%s:leases' %(namespace, name)
+        self.sLeasedKey = '%s:%s:leased' %(namespace, name)
+        self.sReapsKey = '%s:%s:reaps' %(namespace, name)
+        self.sDeadKey = '%s:%s:dead' %(namespace, name)
+        self.iLeaseTimeout = leaseTimeout
+        self.iMaxReaps = maxReaps
+
+        self.__claim = self.__db.register_script(LEASE_CLAIM_SCRIPT)
+        self.__heartbeat = self.__db.register_script(LEASE_HEARTBEAT_SCRIPT)
+        self.__ack = self.__db.register_script(LEASE_ACK_SCRIPT)
+        self.__reap = self.__db.register_script(LEASE_REAP_SCRIPT)
+
+        self.oCodec = codec
+        self.oItems = QueueItems(codec)
+
+        # telemetry: counters hash (in/out), enqueue timestamps (aligned with the queue) and time-in-queue samples
+        (self.sStatsKey, self.sEnqueuedKey, self.sWaitsKey) = getTelemetryKeys(self.sKey)
+        self.iWaitSamples = 10000
+
+        self.__dequeued = self.__db.register_script(STATS_DEQUEUE_SCRIPT)
+
+        # dedup: set of the keys of every item ever queued
+        self.bDedup = dedup
+        self.fDedupKey = dedupKey
+        self.sSeenKey = '%s:%s:seen' %(namespace, name)
+
+        self.__dedupPush = self.__db.register_script(DEDUP_PUSH_SCRIPT)
+
+        if telemetry is None:
+
+            self.bTelemetry = bool( self.__db.exists(self.sStatsKey) )
+
+        else:
+
+            self.bTelemetry = telemetry
+
+            if telemetry:
+
+                self.__db.hsetnx(self.sStatsKey, 'in', 0)
+                self.__db.hsetnx(self.sStatsKey, 'out', 0)
+
+    ###
+    # dedup key of item (and its stored form sData)
+    ###
+    def __dedupKey(self, item, sData):
+
+        return self.fDedupKey(item) if self.fDedupKey else sData
+
+    ###
+    # push (encoded) items onto the queue, recording their enqueue time if telemetry is on;
+    # lKeys are the items' dedup keys in dedup mode. Returns the number of items pushed
+    ###
+    def __push(self, lItems, lKeys=None):
+
+        if self.bDedup:
+
+            lArgs = [ '%.3f' %(time.time()) ]
+
+            for (sKey, sData) in zip(lKeys, lItems):
+
+                lArgs.extend( [sKey, sData] )
+
+            lScriptKeys = [self.sKey, self.sSeenKey]
+
+            if self.bTelemetry:
+
+                lScriptKeys.extend( [self.sEnqueuedKey, self.sStatsKey] )
+
+            return self.__dedupPush(keys=lScriptKeys, args=lArgs)
+
+        if not self.bTelemetry:
+
+            self.__db.lpush(self.sKey, *lItems)
+            return len(lItems)
+
+        oPipe = self.__db.pipeline(transaction=True)
+        oPipe.lpush(self.sKey, *lItems)
+        oPipe.lpush(self.sEnqueuedKey, *( [ '%.3f' %(time.time()) ] * len(lItems) ))
+        oPipe.hincrby(self.sStatsKey, 'in', len(lItems))
+        oPipe.execute()
+
+        return len(lItems)
+
+    ###
+    # record iCount items leaving the queue if telemetry is on
+    ###
+    def __recordDequeue(self, iCount):
+
+        if self.bTelemetry and iCount:
+
+            self.__dequeued(keys=[self.sEnqueuedKey, self.sStatsKey, self.sWaitsKey], args=[iCount, '%.3f' %(time.time()), self.iWaitSamples])
+
+    ###
+    # dunder method for size function; returns length of queue
+    ###
+    def __len__(self):
+
+        return self.size()
+
+    ###
+    # dunder method for determining if the queue is not empty or None
+    ###
+    def __nonzero__(self):
+
+        return not self.isEmpty()
+
+    ###
+    # clear redis queue (and any outstanding leases on it, its dead letters and its dedup seen set)
+    ###
+    def flush(self):
+
+        self.__db.delete(self.sKey, self.sLeaseKey, self.sLeasedKey, self.sReapsKey, self.sDeadKey, self.sEnqueuedKey, self.sSeenKey)
+        self.oItems.clear()
+
+    ###
+    # dedup mode: allow item to be queued again
+    ###
+    def forget(self, item):
+
+        return bool( self.__db.srem(self.sSeenKey, self.__dedupKey(item, self.oItems.encode(item))) )
+
+    ###
+    # dedup mode: return the number of item keys ever queued (since the last flush)
+    ###
+    def seen(self):
+
+        return self.__db.scard(self.sSeenKey)
+
+    ###
+    # Return the approximate size of the queue.
+    ###
+    def size(self):
+        
+        return self.__db.llen(self.sKey)
+
+    ###
+    # Return True if the queue is empty, False otherwise.
+    ###
+    def isEmpty(self):
+
+        return self.size() == 0
+
+    ###
+    # Peek at head item in queue.
+    ###
+    def peek(self):
+
+        item = self.__db.lrange(self.sKey, 0, 0)
+
+        if item:
+        
+            item = self.oItems.decode(item[0])
+
+        return item
+
+    ###
+    # Put item into the queue; returns False if dedup mode skipped it as a duplicate
+    ###
+    def put(self, item):
+
+        sData = self.oItems.encode(item)
+
+        return self.__push( [ sData ], [ self.__dedupKey(item, sData) ] ) > 0
+
+    ###
+    # Put items from an iterable into the queue, chunk items per variadic LPUSH 
+    # (one round trip per chunk instead of one per item). Items keep FIFO order.
+    # Returns the number of items queued (duplicates skipped in dedup mode are not counted).
+    ###
+    def putMany(self, items, chunk=1000):
+
+        iCount = 0
+        lChunk = []
+        lKeys = []
+
+        for item in items:
+
+            sData = self.oItems.encode(item)
+
+            lChunk.append(sData)
+            lKeys.append( self.__dedupKey(item, sData) )
+
+            if len(lChunk) >= chunk:
+
+                iCount += self.__push(lChunk, lKeys)
+                lChunk = []
+                lKeys = []
+
+        if lChunk:
+
+            iCount += self.__push(lChunk, lKeys)
+
+        return iCount
+
+    ###
+    # Remove and return an item from the queue. 
+    # 
+    # If optional args block is true and timeout is None (the default), block
+    # if necessary until an item is available."""
+    ###
+    def get(self, block=True, timeout=None):
+    
+        item = None
+
+        if block:
+
+            item = self.__db.brpop(self.sKey, timeout=timeout)
+
+        else:
+            
+            item = self.__db.rpop(self.sKey)
+
+        if item:
+        
+            item = self.oItems.decode(item[1])
+            self.__recordDequeue(1)
+        
+        return item
+
+    ###
+    # Remove and return up to n items from the queue (in the order get() would 
+    # return them) in a single MULTI/EXEC round trip.
+    #
+    # If optional args block is true, block until at least one item is available
+    # (or timeout expires); returns an empty list if the queue is empty.
+    ###
+    def getMany(self, n, block=False, timeout=None):
+
+        lItems = []
+
+        if n <= 0:
+
+            return lItems
+
+        if block:
+
+            item = self.get(block=True, timeout=timeout)
+
+            if not item:
+
+                return lItems
+
+            lItems.append(item)
+            n -= 1
+
+            if n == 0:
+
+                return lItems
+
+        oPipe = self.__db.pipeline(transaction=True)
+        oPipe.lrange(self.sKey, -n, -1)
+        oPipe.ltrim(self.sKey, 0, -(n + 1))
+        (lTail, _) = oPipe.execute()
+
+        # items are popped from the right end of the list
+        lTail.reverse()
+        self.__recordDequeue( len(lTail) )
+        lItems.extend( self.oItems.decode(item) for item in lTail )
+
+        return lItems
+
+    ###
+    # Remove and return an item from the queue. 
+    # 
+    # If optional args block is true and timeout is None (the default), block
+    # if necessary until an item is available."""
+    ###
+    def getnpush(self, block=True, timeout=None):
+    
+        item = None
+
+        if block:
+
+            item = self.__db.brpoplpush(src=self.sKey, dst=self.sKey2, timeout=timeout)
+
+        else:
+            
+            item = self.__db.rpoplpush(src=self.sKey, dst=self.sKey2)
+
+        if item:
+
+            self.__recordDequeue(1)
+        
+        return self.oItems.decode(item, bTrack=True)
+
+    ###
+    # Removes item from secondary list when we're done processing
+    ###
+    def done(self, value, num=0):
+    
+        self.__db.lrem(name=self.sKey2, value=self.oItems.stored(value), num=num)
+
+    ###
+    # Remove an item from the queue, leasing it to the caller until now + leaseTimeout;
+    # returns (item, lease) or None. The caller must heartbeat(lease) while working on
+    # the item and ack(lease) when done; otherwise reapLeases() puts it back in the queue.
+    #
+    # If optional args block is true and timeout is None (the default), block
+    # if necessary until an item is available (polling every interval seconds).
+    ###
+    def getLease(self, block=True, timeout=None, interval=1):
+
+        fExpires = None
+
+        if timeout:
+
+            fExpires = time.time() + timeout
+
+        while 1:
+
+            sLease = uuid.uuid4().hex
+
+            item = self.__claim(keys=[self.sKey, self.sLeaseKey, self.sLeasedKey], args=[time.time() + self.iLeaseTimeout, sLease])
+
+            if item:
+
+                self.__recordDequeue(1)
+
+                return (self.oItems.decode(item), sLease)
+
+            if not block:
+
+                return None
+
+            if fExpires and time.time() >= fExpires:
+
+                return None
+
+            time.sleep(interval)
+
+    ###
+    # Extend a lease returned by getLease; returns False if the lease has already
+    # expired and been reaped (another worker may now own the item)
+    ###
+    def heartbeat(self, lease):
+
+        return bool( self.__heartbeat(keys=[self.sKey, self.sLeaseKey], args=[time.time() + self.iLeaseTimeout, lease]) )
+
+    ###
+    # Release a lease returned by getLease once processing has completed
+    ###
+    def ack(self, lease):
+
+        return bool( self.__ack(keys=[self.sKey, self.sLeaseKey, self.sLeasedKey, self.sReapsKey], args=[lease]) )
+
+    ###
+    # Re-enqueue (atomically) up to limit items whose leases have expired so 
+    # they are the next items returned, dead lettering those reaped maxReaps times;
+    # returns the number of items re-enqueued
+    ###
+    def reapLeases(self, limit=1000):
+
+        lKeys = [self.sKey, self.sLeaseKey, self.sLeasedKey, self.sReapsKey, self.sDeadKey]
+
+        if self.bTelemetry:
+
+            lKeys.append(self.sEnqueuedKey)
+
+        (iReaped, iDead) = self.__reap(keys=lKeys, args=[time.time(), limit, self.iMaxReaps or 0])
+
+        if self.bTelemetry and iReaped:
+
+            self.__db.hincrby(self.sStatsKey, 'in', iReaped)
+
+        if iDead:
+
+            warning('func: reapLeases()', iDead, 'items whose leases expired', self.iMaxReaps, 'times moved to', self.sDeadKey)
+
+        return iReaped
+
+    ###
+    # Return the number of items currently leased out
+    ###
+    def leased(self):
+
+        return self.__db.zcard(self.sLeaseKey)
+
+    ###
+    # Return the number of items on the dead letter list
+    ###
+    def deadLetters(self):
+
+        return self.__db.llen(self.sDeadKey)
+
+###
+# Priority Queue with Redis Backend (sorted set); highest score is returned first
+#
+# Note: identical items are stored once (the latest score wins)
+###
+class RedisPriorityQueue(object):
 
     ###
     # The default connection parameters are: host='localhost', port=6379, db=0
+    #
+    # leaseTimeout, maxReaps and codec: see RedisQueue
     ###
-    def __init__(self, name, name2=None, namespace='queue', **redis_kwargs):
+    def __init__(self, name, name2=None, namespace='queue', leaseTimeout=600, maxReaps=3, codec=None, **redis_kwargs):
 
-        self.__db= redis.Redis(**redis_kwargs)
+        self.__db= getRedis(**redis_kwargs)
         self.sKey = '%s:%s' %(namespace, name)
 
         self.sKey2 = None
@@ -38,6 +953,23 @@ class RedisQueue(object):
 
             self.sKey2 = '%s:%s' %(namespace, name2)
 
+        # lease tokens, leased items, expired lease counts and dead letters (see RedisQueue)
+        self.sLeaseKey = '%s:%s:leases' %(namespace, name)
+        self.sLeasedKey = '%s:%s:leased' %(namespace, name)
+        self.sReapsKey = '%s:%s:reaps' %(namespace, name)
+        self.sDeadKey = '%s:%s:dead' %(namespace, name)
+        self.iLeaseTimeout = leaseTimeout
+        self.iMaxReaps = maxReaps
+
+        self.__pop = self.__db.register_script(PRIORITY_POP_SCRIPT)
+        self.__popnpush = self.__db.register_script(PRIORITY_POPNPUSH_SCRIPT)
+        self.__heartbeat = self.__db.register_script(LEASE_HEARTBEAT_SCRIPT)
+        self.__ack = self.__db.register_script(LEASE_ACK_SCRIPT)
+        self.__reap = self.__db.register_script(PRIORITY_REAP_SCRIPT)
+
+        self.oCodec = codec
+        self.oItems = QueueItems(codec)
+
     ###
     # dunder method for size function; returns length of queue
     ###
@@ -53,18 +985,19 @@ class RedisQueue(object):
         return not self.isEmpty()
 
     ###
-    # clear redis queue
+    # clear redis queue (and any outstanding leases on it and its dead letters)
     ###
     def flush(self):
 
-        self.__db.delete(self.sKey)
+        self.__db.delete(self.sKey, self.sLeaseKey, self.sLeasedKey, self.sReapsKey, self.sDeadKey)
+        self.oItems.clear()
 
     ###
     # Return the approximate size of the queue.
     ###
     def size(self):
         
-        return self.__db.llen(self.sKey)
+        return self.__db.zcard(self.sKey)
 
     ###
     # Return True if the queue is empty, False otherwise.
@@ -74,75 +1007,395 @@ class RedisQueue(object):
         return self.size() == 0
 
     ###
-    # Peek at head item in queue.
+    # Peek at head (highest scoring) item in queue.
     ###
     def peek(self):
 
-        item = self.__db.lrange(self.sKey, 0, 0)
+        item = self.__db.zrevrange(self.sKey, 0, 0)
 
         if item:
         
-            item = item[0]
+            item = self.oItems.decode(item[0])
 
         return item
 
     ###
-    # Put item into the queue.
+    # Put item into the queue with priority score.
     ###
-    def put(self, item):
+    def put(self, item, score=0):
 
-        self.__db.lpush(self.sKey, item)
+        # raw ZADD keeps the (score, member) argument order independent of the redis-py client version
+        self.__db.execute_command('ZADD', self.sKey, score, self.oItems.encode(item))
 
     ###
-    # Remove and return an item from the queue. 
-    # 
-    # If optional args block is true and timeout is None (the default), block
-    # if necessary until an item is available."""
+    # Put (item, score) tuples from an iterable into the queue, chunk items per 
+    # variadic ZADD. Returns the number of items sent.
     ###
-    def get(self, block=True, timeout=None):
-    
-        item = None
+    def putMany(self, items, chunk=1000):
 
-        if block:
+        iCount = 0
+        lArgs = []
 
-            item = self.__db.brpop(self.sKey, timeout=timeout)
+        for (item, score) in items:
 
-        else:
-            
-            item = self.__db.rpop(self.sKey)
+            lArgs.extend( [score, self.oItems.encode(item)] )
 
-        if item:
-        
-            item = item[1]
-        
-        return item
+            if len(lArgs) >= 2 * chunk:
+
+                self.__db.execute_command('ZADD', self.sKey, *lArgs)
+                iCount += len(lArgs) // 2
+                lArgs = []
+
+        if lArgs:
+
+            self.__db.execute_command('ZADD', self.sKey, *lArgs)
+            iCount += len(lArgs) // 2
+
+        return iCount
 
     ###
-    # Remove and return an item from the queue. 
+    # pop helper; polls every interval seconds while blocking since sorted sets 
+    # have no blocking pop before redis 5
+    ###
+    def __poll(self, fPop, block, timeout, interval):
+
+        fExpires = None
+
+        if timeout:
+
+            fExpires = time.time() + timeout
+
+        while 1:
+
+            item = fPop()
+
+            if item or not block:
+
+                return item
+
+            if fExpires and time.time() >= fExpires:
+
+                return None
+
+            time.sleep(interval)
+
+    ###
+    # Remove and return the highest scoring item from the queue. 
     # 
     # If optional args block is true and timeout is None (the default), block
-    # if necessary until an item is available."""
+    # if necessary until an item is available.
     ###
-    def getnpush(self, block=True, timeout=None):
-    
-        item = None
+    def get(self, block=True, timeout=None, interval=1):
 
-        if block:
+        return self.oItems.decode( self.__poll(lambda: self.__pop(keys=[self.sKey]), block, timeout, interval) )
 
-            item = self.__db.brpoplpush(src=self.sKey, dst=self.sKey2, timeout=timeout)
+    ###
+    # Remove and return the highest scoring item from the queue, pushing it onto
+    # the secondary list.
+    # 
+    # If optional args block is true and timeout is None (the default), block
+    # if necessary until an item is available.
+    ###
+    def getnpush(self, block=True, timeout=None, interval=1):
 
-        else:
-            
-            item = self.__db.rpoplpush(src=self.sKey, dst=self.sKey2)
-        
-        return item
+        return self.oItems.decode( self.__poll(lambda: self.__popnpush(keys=[self.sKey, self.sKey2]), block, timeout, interval), bTrack=True )
 
     ###
     # Removes item from secondary list when we're done processing
     ###
     def done(self, value, num=0):
     
-        self.__db.lrem(name=self.sKey2, value=value, num=num)
+        self.__db.lrem(name=self.sKey2, value=self.oItems.stored(value), num=num)
+
+    ###
+    # Remove the highest scoring item from the queue, leasing it to the caller;
+    # returns (item, lease) or None (see RedisQueue.getLease)
+    ###
+    def getLease(self, block=True, timeout=None, interval=1):
+
+        sLease = uuid.uuid4().hex
+
+        item = self.__poll(lambda: self.__pop(keys=[self.sKey, self.sLeaseKey, self.sLeasedKey], args=[time.time() + self.iLeaseTimeout, sLease]), block, timeout, interval)
+
+        if item is None:
+
+            return None
+
+        return (self.oItems.decode(item), sLease)
+
+    ###
+    # Extend a lease returned by getLease; returns False if the lease has already
+    # expired and been reaped
+    ###
+    def heartbeat(self, lease):
+
+        return bool( self.__heartbeat(keys=[self.sKey, self.sLeaseKey], args=[time.time() + self.iLeaseTimeout, lease]) )
+
+    ###
+    # Release a lease returned by getLease once processing has completed
+    ###
+    def ack(self, lease):
+
+        return bool( self.__ack(keys=[self.sKey, self.sLeaseKey, self.sLeasedKey, self.sReapsKey], args=[lease]) )
+
+    ###
+    # Re-enqueue (atomically) up to limit items whose leases have expired with
+    # the highest possible score, dead lettering those reaped maxReaps times;
+    # returns the number of items re-enqueued
+    ###
+    def reapLeases(self, limit=1000):
+
+        (iReaped, iDead) = self.__reap(keys=[self.sKey, self.sLeaseKey, self.sLeasedKey, self.sReapsKey, self.sDeadKey], args=[time.time(), limit, self.iMaxReaps or 0])
+
+        if iDead:
+
+            warning('func: reapLeases()', iDead, 'items whose leases expired', self.iMaxReaps, 'times moved to', self.sDeadKey)
+
+        return iReaped
+
+    ###
+    # Return the number of items currently leased out
+    ###
+    def leased(self):
+
+        return self.__db.zcard(self.sLeaseKey)
+
+    ###
+    # Return the number of items on the dead letter list
+    ###
+    def deadLetters(self):
+
+        return self.__db.llen(self.sDeadKey)
+
+###
+# Work queue backed by a redis stream and consumer group
+#
+# Producers XADD items; each consumer reads new entries with XREADGROUP under its own
+# name (e.g. hostname + container id) so the group tracks who holds what. Entries held
+# by a consumer that stops heartbeating for leaseTimeout seconds are taken over by the
+# next consumer to call getLease (XAUTOCLAIM), so any number of hosts can share the
+# queue without extra coordination; an entry that stalls maxReaps times is moved to the
+# <stream>:dead list instead. Acked entries are deleted from the stream and
+# credited to the consumer in a counters hash (see throughput).
+#
+# Note: requires redis >= 6.2 (XAUTOCLAIM)
+###
+class RedisStreamQueue(object):
+
+    ###
+    # The default connection parameters are: host='localhost', port=6379, db=0
+    #
+    # consumer defaults to hostname_pid
+    #
+    # maxReaps and codec: see RedisQueue
+    ###
+    def __init__(self, name, group='workers', consumer=None, namespace='stream', leaseTimeout=600, maxReaps=3, codec=None, **redis_kwargs):
+
+        self.__db= getRedis(**redis_kwargs)
+        self.sKey = '%s:%s' %(namespace, name)
+
+        # hash of per-consumer counters: <consumer> = entries acked, <consumer>:reclaimed = stalled entries taken over
+        self.sCountersKey = '%s:%s:consumers' %(namespace, name)
+
+        # items of the entries that stalled maxReaps times
+        self.sDeadKey = '%s:%s:dead' %(namespace, name)
+
+        self.sGroup = group
+        self.sConsumer = consumer if consumer else socket.gethostname().replace('.','') + '_' + str( os.getpid() )
+        self.iLeaseTimeout = leaseTimeout
+        self.iMaxReaps = maxReaps
+
+        self.oCodec = codec
+        self.oItems = QueueItems(codec)
+
+        self.__claim = self.__db.register_script(STREAM_CLAIM_SCRIPT)
+        self.__heartbeat = self.__db.register_script(STREAM_HEARTBEAT_SCRIPT)
+        self.__ack = self.__db.register_script(STREAM_ACK_SCRIPT)
+
+        self.__createGroup()
+
+    ###
+    # create the consumer group (and the stream) if they don't exist yet
+    ###
+    def __createGroup(self):
+
+        try:
+
+            self.__db.execute_command('XGROUP', 'CREATE', self.sKey, self.sGroup, '0', 'MKSTREAM')
+
+        except redis.exceptions.ResponseError as e:
+
+            if 'BUSYGROUP' not in str(e):
+
+                raise
+
+    ###
+    # dunder method for size function; returns length of queue
+    ###
+    def __len__(self):
+
+        return self.size()
+
+    ###
+    # dunder method for determining if the queue is not empty or None
+    ###
+    def __nonzero__(self):
+
+        return not self.isEmpty()
+
+    ###
+    # Remove stream, consumer group, counters and dead letters
+    ###
+    def flush(self):
+
+        self.__db.delete(self.sKey, self.sCountersKey, self.sDeadKey)
+
+        self.__createGroup()
+
+    ###
+    # Return the number of entries in the stream (new and leased)
+    ###
+    def size(self):
+
+        return self.__db.execute_command('XLEN', self.sKey)
+
+    ###
+    # Return True if the stream is empty, False otherwise.
+    ###
+    def isEmpty(self):
+
+        return self.size() == 0
+
+    ###
+    # Put item into the stream.
+    ###
+    def put(self, item):
+
+        self.__db.execute_command('XADD', self.sKey, '*', 'item', self.oItems.encode(item))
+
+    ###
+    # Put items into the stream, chunk entries per round trip; returns the number of items added
+    ###
+    def putMany(self, items, chunk=1000):
+
+        iCount = 0
+        pipe = self.__db.pipeline(transaction=False)
+
+        for item in items:
+
+            pipe.execute_command('XADD', self.sKey, '*', 'item', self.oItems.encode(item))
+            iCount += 1
+
+            if iCount % chunk == 0:
+
+                pipe.execute()
+
+        pipe.execute()
+
+        return iCount
+
+    ###
+    # Lease the next item to this consumer: a stalled entry from a dead consumer if
+    # there is one, otherwise the next new entry. Returns (item, lease) or None; the
+    # lease (the entry id) must be ack'ed when done.
+    # 
+    # If optional args block is true and timeout is None (the default), block
+    # if necessary until an item is available.
+    ###
+    def getLease(self, block=True, timeout=None, interval=1):
+
+        fExpires = None
+
+        if timeout:
+
+            fExpires = time.time() + timeout
+
+        while 1:
+
+            lEntry = self.__claim(keys=[self.sKey, self.sCountersKey, self.sDeadKey], args=[self.sGroup, self.sConsumer, int(self.iLeaseTimeout * 1000), self.iMaxReaps or 0])
+
+            if lEntry:
+
+                (sId, lFields) = lEntry
+                dFields = dict( zip(lFields[::2], lFields[1::2]) )
+
+                return (self.oItems.decode( dFields.get(b'item') ), sId)
+
+            if not block:
+
+                return None
+
+            if fExpires and time.time() >= fExpires:
+
+                return None
+
+            time.sleep(interval)
+
+    ###
+    # Reset a lease returned by getLease; returns False if the lease has been lost
+    # (the entry was reclaimed by another consumer)
+    ###
+    def heartbeat(self, lease):
+
+        return bool( self.__heartbeat(keys=[self.sKey, self.sCountersKey], args=[self.sGroup, self.sConsumer, lease]) )
+
+    ###
+    # Acknowledge a lease returned by getLease once processing has completed; the entry is removed from the stream
+    ###
+    def ack(self, lease):
+
+        return bool( self.__ack(keys=[self.sKey, self.sCountersKey], args=[self.sGroup, self.sConsumer, lease]) )
+
+    ###
+    # Stalled entries are reclaimed one at a time by getLease (XAUTOCLAIM) so there
+    # is nothing to reap up front; kept for compatibility with the lease-mode queues
+    ###
+    def reapLeases(self, limit=1000):
+
+        return 0
+
+    ###
+    # Return the number of entries currently leased out across all consumers
+    ###
+    def leased(self):
+
+        oPending = self.__db.execute_command('XPENDING', self.sKey, self.sGroup)
+
+        # newer redis-py clients parse the summary into a dict
+        if isinstance(oPending, dict):
+
+            return oPending['pending']
+
+        return oPending[0]
+
+    ###
+    # Return the number of items on the dead letter list
+    ###
+    def deadLetters(self):
+
+        return self.__db.llen(self.sDeadKey)
+
+    ###
+    # Return per-consumer counters: { consumer : { 'acked' : n, 'reclaimed' : n } }
+    ###
+    def throughput(self):
+
+        dThroughput = {}
+
+        for (sField, sValue) in self.__db.hgetall(self.sCountersKey).items():
+
+            # field names come back as bytes on python 3
+            if not isinstance(sField, str): sField = sField.decode('utf-8')
+
+            (sConsumer, sSep, sCounter) = sField.partition(':')
+
+            if sConsumer not in dThroughput:
+
+                dThroughput[sConsumer] = { 'acked' : 0, 'reclaimed' : 0 }
+
+            dThroughput[sConsumer][sCounter if sCounter else 'acked'] = int(sValue)
+
+        return dThroughput
 
 ###
 # Simple Queue with Redis Backend
@@ -154,9 +1407,20 @@ class RedisSet(object):
     ###
     def __init__(self, name, namespace='set', **redis_kwargs):
 
-        self.__db= redis.Redis(**redis_kwargs)
+        self.__db= getRedis(**redis_kwargs)
         self.sKey = '%s:%s' %(namespace, name)
 
+        # counter bumped on every change made through this class; used to tell if a local snapshot is stale
+        self.sVersionKey = '%s:%s:version' %(namespace, name)
+
+        # local snapshot state (see snapshot())
+        self.fsSnapshot = None
+        self.tSnapshotVersion = None
+        self.fSnapshotTime = 0
+
+        # SMISMEMBER requires redis >= 6.2, fall back to pipelined SISMEMBERs if unavailable
+        self.bSmismember = True
+
     ###
     # dunder method for set membership; returns if item is in the set
     ###
@@ -184,7 +1448,10 @@ class RedisSet(object):
     ###
     def flush(self):
 
-        self.__db.delete(self.sKey)
+        oPipe = self.__db.pipeline(transaction=False)
+        oPipe.delete(self.sKey)
+        oPipe.incr(self.sVersionKey)
+        oPipe.execute()
 
     ###
     # Return the approximate size of the set.
@@ -205,17 +1472,125 @@ class RedisSet(object):
     ###
     def put(self, item):
 
-        self.__db.sadd(self.sKey, item)
+        oPipe = self.__db.pipeline(transaction=False)
+        oPipe.sadd(self.sKey, item)
+        oPipe.incr(self.sVersionKey)
+        oPipe.execute()
+
+    ###
+    # Put items from an iterable into the set, chunk items per variadic SADD.
+    # Returns the number of items sent (duplicates included).
+    ###
+    def putMany(self, items, chunk=1000):
+
+        iCount = 0
+        lChunk = []
+
+        for item in items:
+
+            lChunk.append(item)
+
+            if len(lChunk) >= chunk:
+
+                self.__sadd(lChunk)
+                iCount += len(lChunk)
+                lChunk = []
+
+        if lChunk:
+
+            self.__sadd(lChunk)
+            iCount += len(lChunk)
+
+        return iCount
+
+    ###
+    # variadic SADD and version bump in one round trip
+    ###
+    def __sadd(self, lItems):
+
+        oPipe = self.__db.pipeline(transaction=False)
+        oPipe.sadd(self.sKey, *lItems)
+        oPipe.incr(self.sVersionKey)
+        oPipe.execute()
 
     ###
     # Remove and return an item from the set. 
     ###
     def get(self):
     
-        item = self.__db.spop(self.sKey)
+        oPipe = self.__db.pipeline(transaction=False)
+        oPipe.spop(self.sKey)
+        oPipe.incr(self.sVersionKey)
+        (item, _) = oPipe.execute()
         
         return item
 
+    ###
+    # Return a list of booleans, one per item, for membership of items in the set
+    # (one round trip for all items)
+    ###
+    def containsMany(self, items):
+
+        lItems = list(items)
+
+        if not lItems:
+
+            return []
+
+        if self.bSmismember:
+
+            try:
+
+                return [ bool(iMember) for iMember in self.__db.execute_command('SMISMEMBER', self.sKey, *lItems) ]
+
+            except redis.exceptions.ResponseError as e:
+
+                # unknown command -- older redis server
+                self.bSmismember = False
+
+        oPipe = self.__db.pipeline(transaction=False)
+
+        for item in lItems:
+
+            oPipe.sismember(self.sKey, item)
+
+        return [ bool(iMember) for iMember in oPipe.execute() ]
+
+    ###
+    # Return a local frozenset copy of the set. 
+    #
+    # The copy is only re-fetched when the set's version counter or cardinality
+    # changed since the last call (the cardinality check catches writes made 
+    # outside this class, e.g. redis-cli SADD). If maxAge is given, a snapshot
+    # younger than maxAge seconds is returned without contacting redis at all.
+    ###
+    def snapshot(self, maxAge=None):
+
+        if self.fsSnapshot is not None and maxAge and (time.time() - self.fSnapshotTime) < maxAge:
+
+            return self.fsSnapshot
+
+        oPipe = self.__db.pipeline(transaction=False)
+        oPipe.get(self.sVersionKey)
+        oPipe.scard(self.sKey)
+        tVersion = tuple( oPipe.execute() )
+
+        if self.fsSnapshot is None or tVersion != self.tSnapshotVersion:
+
+            # fetch members and version atomically so the snapshot matches the version it is tagged with
+            oPipe = self.__db.pipeline(transaction=True)
+            oPipe.get(self.sVersionKey)
+            oPipe.scard(self.sKey)
+            oPipe.smembers(self.sKey)
+            (sVersion, iCard, setMembers) = oPipe.execute()
+
+            self.fsSnapshot = frozenset(setMembers)
+            self.tSnapshotVersion = (sVersion, iCard)
+
+        self.fSnapshotTime = time.time()
+
+        return self.fsSnapshot
+
 ###
 # simple test producer
 ###
@@ -0,0 +1,667 @@
+#!/usr/bin/python
+##
+## Copyright (c) 2014-2017 Leidos.
+##
+## License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+##
+##
+## Developed under contract #FA8750-14-C-0241
+##
+
+# sqliteDB.py -- embedded SQLite stand-in for the MySQLdb connection used by MuseProjectDB
+#
+# MuseProjectDB(db='sqlite:////tmp/muse.db') opens a SqliteConnection instead of a MySQL server connection.
+# The connection and cursors look like MySQLdb's (buffered cursors with rowcount, streaming cursors for SSCursor,
+# MySQLdb exceptions), and each statement is rewritten from the MySQL dialect MuseProjectDB emits:
+#
+#   USE / CREATE DATABASE           dropped; DROP DATABASE drops every table and view in the file
+#   CREATE TABLE                    AUTO_INCREMENT id -> INTEGER PRIMARY KEY AUTOINCREMENT, no CHARACTER SET / UNSIGNED,
+#                                   keyHash column + unique key -> UNIQUE on the natural key columns (no index length limit)
+#   CREATE INDEX / ALTER ... INDEX  CREATE/DROP INDEX IF [NOT] EXISTS without prefix lengths or USING BTREE
+#   CREATE OR REPLACE VIEW          DROP VIEW + CREATE VIEW with the parenthesized UNION members unwrapped
+#   CREATE TRIGGER ... SET NEW.x    AFTER trigger running UPDATE ... WHERE rowid = NEW.rowid
+#   CREATE TRIGGER ... AFTER        single statement body wrapped in BEGIN ... END
+#   ON DUPLICATE KEY UPDATE         ON CONFLICT (<table's unique key>) DO UPDATE SET ..., VALUES(x) -> excluded.x
+#   TRUNCATE TABLE / FOR UPDATE     DELETE FROM / dropped
+#   SHOW COLUMNS / SHOW INDEX       emulated from PRAGMA table_info / index_list / index_info
+#   EXPLAIN SELECT                  EXPLAIN QUERY PLAN SELECT
+#
+# SHA1, UNHEX, CONCAT_WS, ELT, BIT_COUNT, BIT_OR and CONNECTION_ID (always 0) are registered as sqlite functions. Upserts need sqlite >= 3.24.
+
+import binascii
+import hashlib
+import re
+import sqlite3
+import sys
+
+# optional, only the MySQL backend needs mysqlclient (see MySQLdbStandIn)
+try:
+    import MySQLdb
+    import MySQLdb.cursors
+except ImportError:
+    MySQLdb = None
+
+###
+# stand-in for the MySQLdb module when mysqlclient isn't installed: its DB-API exception hierarchy (so the MySQLdb
+# except clauses in MuseProjectDB and the errors raised below keep working) and an SSCursor placeholder for cursorclass.
+# connect() fails like an unreachable server would, so only the sqlite backend is usable
+###
+class MySQLdbStandIn(object):
+
+    class Warning(Exception): pass
+
+    class Error(Exception): pass
+
+    class InterfaceError(Error): pass
+
+    class DatabaseError(Error): pass
+
+    class DataError(DatabaseError): pass
+
+    class OperationalError(DatabaseError): pass
+
+    class IntegrityError(DatabaseError): pass
+
+    class InternalError(DatabaseError): pass
+
+    class ProgrammingError(DatabaseError): pass
+
+    class NotSupportedError(DatabaseError): pass
+
+    class cursors(object):
+
+        class SSCursor(object): pass
+
+    ###
+    @staticmethod
+    def connect(*args, **kwargs):
+
+        raise MySQLdbStandIn.OperationalError('mysqlclient (MySQLdb) is not installed, only sqlite:// databases are available')
+
+if MySQLdb is None: MySQLdb = MySQLdbStandIn
+
+###
+# sqlite exception -> MySQLdb exception raised in its place, so callers' MySQLdb except clauses keep working
+###
+lErrorMap = [
+    (sqlite3.IntegrityError, MySQLdb.IntegrityError),
+    (sqlite3.ProgrammingError, MySQLdb.ProgrammingError),
+    (sqlite3.NotSupportedError, MySQLdb.NotSupportedError),
+    (sqlite3.DataError, MySQLdb.DataError),
+    (sqlite3.InternalError, MySQLdb.InternalError),
+    (sqlite3.InterfaceError, MySQLdb.InterfaceError),
+    (sqlite3.Error, MySQLdb.OperationalError)
+]
+
+###
+def mysqlError(e):
+
+    for (sqliteError, mysqlError) in lErrorMap:
+
+        if isinstance(e, sqliteError): return mysqlError(str(e))
+
+    return MySQLdb.OperationalError(str(e))
+
+###
+# sqlite://<path> urls, as understood by sqlalchemy: sqlite:///muse.db (relative), sqlite:////tmp/muse.db (absolute),
+# sqlite:// (in memory; every open() gets a fresh database)
+###
+def isSqliteUrl(sDb):
+
+    return bool(sDb) and sDb.startswith('sqlite://')
+
+###
+def sqlitePath(sUrl):
+
+    sPath = sUrl[len('sqlite://'):]
+
+    if not sPath: return ':memory:'
+
+    if sPath.startswith('/'): sPath = sPath[1:]
+
+    return sPath
+
+###
+# split sText on commas outside of parentheses and quotes
+###
+def splitTopLevel(sText):
+
+    lParts = []
+    iDepth = 0
+    sQuote = None
+    iStart = 0
+
+    for (iPos, sChar) in enumerate(sText):
+
+        if sQuote:
+
+            if sChar == sQuote: sQuote = None
+
+        elif sChar in '\'"`':
+
+            sQuote = sChar
+
+        elif sChar == '(':
+
+            iDepth += 1
+
+        elif sChar == ')':
+
+            iDepth -= 1
+
+        elif sChar == ',' and iDepth == 0:
+
+            lParts.append( sText[iStart:iPos].strip() )
+            iStart = iPos + 1
+
+    lParts.append( sText[iStart:].strip() )
+
+    return [sPart for sPart in lParts if sPart]
+
+###
+def stripPrefixLengths(sCols):
+
+    return re.sub(r'(`?\w+`?)\s*\(\d+\)', r'\1', sCols)
+
+###
+# mysql functions used by MuseProjectDB's queries, views and triggers
+###
+def sqlSha1(value):
+
+    if value is None: return None
+
+    if not isinstance(value, bytes): value = value.encode('utf-8')
+
+    return hashlib.sha1(value).hexdigest()
+
+###
+def sqlUnhex(value):
+
+    if value is None: return None
+
+    return sqlite3.Binary( binascii.unhexlify(value) )
+
+###
+def sqlConcatWs(sSep, *args):
+
+    if sSep is None: return None
+
+    return sSep.join( [u'%s' % (value, ) for value in args if value is not None] )
+
+###
+def sqlElt(iIndex, *args):
+
+    if iIndex is None or iIndex < 1 or iIndex > len(args): return None
+
+    return args[iIndex - 1]
+
+###
+def sqlBitCount(iValue):
+
+    if iValue is None: return None
+
+    return bin( int(iValue) & 0xFFFFFFFFFFFFFFFF ).count('1')
+
+###
+class BitOr:
+
+    def __init__(self):
+
+        self.iValue = 0
+
+    def step(self, iValue):
+
+        if iValue is not None: self.iValue |= int(iValue)
+
+    def finalize(self):
+
+        return self.iValue
+
+###
+# translates one MySQL statement into the list of sqlite statements that implement it
+###
+class SqliteTranslator:
+
+    ###
+    # dNaturalKeys: { table: [cols] } for tables whose keyHash unique key stands in for a natural key
+    # dUpsertKeys: { table: [cols] } conflict target used for ON DUPLICATE KEY UPDATE
+    ###
+    def __init__(self, dNaturalKeys=None, dUpsertKeys=None):
+
+        self.dNaturalKeys = dNaturalKeys or {}
+        self.dUpsertKeys = dUpsertKeys or {}
+
+    ###
+    def translate(self, sQuery):
+
+        sQuery = sQuery.strip().rstrip(';').strip()
+        sUpper = sQuery.upper()
+
+        if not sQuery: return []
+
+        if re.match(r'USE\s', sUpper) or re.match(r'CREATE\s+DATABASE\s', sUpper): return []
+
+        sQuery = re.sub(r'\s+CHARACTER\s+SET\s+\w+', '', sQuery, flags=re.I)
+
+        if re.match(r'TRUNCATE\s+(TABLE\s+)?', sUpper): return [ re.sub(r'^TRUNCATE\s+(TABLE\s+)?', 'DELETE FROM ', sQuery, flags=re.I) ]
+        if re.match(r'CREATE\s+TABLE\s', sUpper): return [ self.createTable(sQuery) ]
+        if re.match(r'CREATE\s+(UNIQUE\s+)?INDEX\s', sUpper): return [ self.createIndex(sQuery) ]
+        if re.match(r'CREATE\s+OR\s+REPLACE\s+VIEW\s', sUpper): return self.createView(sQuery)
+        if re.match(r'CREATE\s+TRIGGER\s', sUpper): return [ self.createTrigger(sQuery) ]
+        if re.match(r'ALTER\s+TABLE\s', sUpper): return self.alterTable(sQuery)
+        if re.match(r'EXPLAIN\s+SELECT\s', sUpper): return [ re.sub(r'^EXPLAIN\s+', 'EXPLAIN QUERY PLAN ', sQuery, flags=re.I) ]
+
+        if re.match(r'SELECT\s', sUpper): sQuery = re.sub(r'\s+FOR\s+UPDATE$', '', sQuery, flags=re.I)
+        if ' ON DUPLICATE KEY UPDATE ' in sUpper: sQuery = self.upsert(sQuery)
+
+        return [sQuery]
+
+    ###
+    def columnType(self, sDefinition):
+
+        sDefinition = re.sub(r'\s+UNSIGNED\b', '', sDefinition, flags=re.I)
+        sDefinition = re.sub(r'\bDEFAULT\s+FALSE\b', 'DEFAULT 0', sDefinition, flags=re.I)
+        sDefinition = re.sub(r'\bDEFAULT\s+TRUE\b', 'DEFAULT 1', sDefinition, flags=re.I)
+
+        return sDefinition
+
+    ###
+    def createTable(self, sQuery):
+
+        oMatch = re.match(r'CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?\s*\((.*)\)\s*$', sQuery, flags=re.I | re.S)
+
+        if not oMatch: return sQuery
+
+        sTable = oMatch.group(2)
+        lDefinitions = []
+        sAutoIncrement = None
+
+        for sDefinition in splitTopLevel( oMatch.group(3) ):
+
+            sDefinition = self.columnType(sDefinition)
+
+            oAuto = re.match(r'(`?(\w+)`?)\s+\w*INT\b.*\bAUTO_INCREMENT\b', sDefinition, flags=re.I)
+            oUnique = re.match(r'UNIQUE\s+(KEY|INDEX)\s+`?(\w+)`?\s*\((.*)\)$', sDefinition, flags=re.I)
+
+            if oAuto:
+
+                sAutoIncrement = oAuto.group(2)
+                lDefinitions.append(oAuto.group(1) + ' INTEGER PRIMARY KEY AUTOINCREMENT')
+
+            elif re.match(r'`?keyHash`?\s', sDefinition) and sTable in self.dNaturalKeys:
+
+                # no key length limit in sqlite, the natural key is indexed directly
+                continue
+
+            elif oUnique:
+
+                if '`keyHash`' in oUnique.group(3) or oUnique.group(3).strip() == 'keyHash':
+
+                    if sTable in self.dNaturalKeys: lDefinitions.append('CONSTRAINT ' + oUnique.group(2) + ' UNIQUE (' + ','.join(self.dNaturalKeys[sTable]) + ')')
+
+                else:
+
+                    lDefinitions.append('CONSTRAINT ' + oUnique.group(2) + ' UNIQUE (' + stripPrefixLengths( oUnique.group(3) ) + ')')
+
+            elif sAutoIncrement and re.match(r'PRIMARY\s+KEY\s*\(\s*`?' + sAutoIncrement + r'`?\s*\)$', sDefinition, flags=re.I):
+
+                continue
+
+            else:
+
+                lDefinitions.append(sDefinition)
+
+        return 'CREATE TABLE ' + (oMatch.group(1) or '') + sTable + ' (' + ','.join(lDefinitions) + ')'
+
+    ###
+    def createIndex(self, sQuery):
+
+        oMatch = re.match(r'CREATE\s+(UNIQUE\s+)?INDEX\s+`?(\w+)`?\s+ON\s+`?(\w+)`?\s*\((.*)\)(\s+USING\s+\w+)?$', sQuery, flags=re.I | re.S)
+
+        if not oMatch: return sQuery
+
+        return 'CREATE ' + (oMatch.group(1) or '') + 'INDEX IF NOT EXISTS ' + oMatch.group(2) + ' ON ' + oMatch.group(3) + ' (' + stripPrefixLengths( oMatch.group(4) ) + ')'
+
+    ###
+    def createView(self, sQuery):
+
+        oMatch = re.match(r'CREATE\s+OR\s+REPLACE\s+VIEW\s+`?(\w+)`?\s+AS\s+(.*)$', sQuery, flags=re.I | re.S)
+
+        sView = oMatch.group(1)
+        sBody = oMatch.group(2).strip()
+
+        # (SELECT ...) UNION (SELECT ...) -> SELECT ... UNION SELECT ...; "word" is a string literal in mysql
+        sBody = re.sub(r'\)\s+UNION\s+\(', ' UNION ', sBody, flags=re.I)
+        sBody = re.sub(r'"(\w+)"', r"'\1'", sBody)
+
+        if sBody.startswith('(') and sBody.endswith(')'): sBody = sBody[1:-1].strip()
+
+        return ['DROP VIEW IF EXISTS ' + sView, 'CREATE VIEW ' + sView + ' AS ' + sBody]
+
+    ###
+    def createTrigger(self, sQuery):
+
+        oMatch = re.match(r'CREATE\s+TRIGGER\s+`?(\w+)`?\s+BEFORE\s+(INSERT|UPDATE)\s+ON\s+`?(\w+)`?\s+FOR\s+EACH\s+ROW\s+SET\s+(.*)$', sQuery, flags=re.I | re.S)
+
+        if not oMatch:
+
+            # mysql takes a bare statement as the body, sqlite wants it in BEGIN ... END
+            oAfter = re.match(r'(CREATE\s+TRIGGER\s+`?\w+`?\s+AFTER\s+(INSERT|UPDATE|DELETE)\s+ON\s+`?\w+`?\s+FOR\s+EACH\s+ROW)\s+(?!BEGIN\b)(.*)$', sQuery, flags=re.I | re.S)
+
+            if oAfter: return oAfter.group(1) + ' BEGIN ' + oAfter.group(3) + '; END'
+
+            return sQuery
+
+        # sqlite can't assign NEW.x, so the derived columns are written back once the row is stored
+        lAssignments = [re.sub(r'^NEW\.', '', sAssignment) for sAssignment in splitTopLevel( oMatch.group(4) )]
+
+        sQuery = 'CREATE TRIGGER ' + oMatch.group(1) + ' AFTER ' + oMatch.group(2).upper() + ' ON ' + oMatch.group(3) + ' FOR EACH ROW BEGIN '
+        sQuery += 'UPDATE ' + oMatch.group(3) + ' SET ' + ', '.join(lAssignments) + ' WHERE rowid = NEW.rowid; END'
+
+        return sQuery
+
+    ###
+    def alterTable(self, sQuery):
+
+        oMatch = re.match(r'ALTER\s+TABLE\s+`?(\w+)`?\s+(.*)$', sQuery, flags=re.I | re.S)
+
+        sTable = oMatch.group(1)
+        lQueries = []
+
+        for sClause in splitTopLevel( oMatch.group(2) ):
+
+            oAdd = re.match(r'ADD\s+(UNIQUE\s+)?(INDEX|KEY)\s+`?(\w+)`?\s*\((.*)\)(\s+USING\s+\w+)?$', sClause, flags=re.I | re.S)
+            oDrop = re.match(r'DROP\s+(INDEX|KEY)\s+`?(\w+)`?$', sClause, flags=re.I)
+
+            if oAdd:
+
+                lQueries.append('CREATE ' + (oAdd.group(1) or '') + 'INDEX IF NOT EXISTS ' + oAdd.group(3) + ' ON ' + sTable + ' (' + stripPrefixLengths( oAdd.group(4) ) + ')')
+
+            elif oDrop:
+
+                lQueries.append('DROP INDEX IF EXISTS ' + oDrop.group(2))
+
+            else:
+
+                # ADD COLUMN and the like go through one clause at a time
+                lQueries.append('ALTER TABLE ' + sTable + ' ' + self.columnType(sClause))
+
+        return lQueries
+
+    ###
+    def upsert(self, sQuery):
+
+        oMatch = re.match(r'(INSERT\s+INTO\s+`?(\w+)`?\s.*?)\s+ON\s+DUPLICATE\s+KEY\s+UPDATE\s+(.*)$', sQuery, flags=re.I | re.S)
+
+        if not oMatch or oMatch.group(2) not in self.dUpsertKeys: return sQuery
+
+        sAssignments = re.sub(r'\bVALUES\s*\(\s*`?(\w+)`?\s*\)', r'excluded.\1', oMatch.group(3), flags=re.I)
+
+        return oMatch.group(1) + ' ON CONFLICT (' + ','.join( self.dUpsertKeys[ oMatch.group(2) ] ) + ') DO UPDATE SET ' + sAssignments
+
+###
+# MySQLdb-like cursor; buffered (rowcount = rows selected) unless opened as a streaming (SSCursor) cursor
+###
+class SqliteCursor:
+
+    def __init__(self, oConnection, bBuffered=True):
+
+        self.oConnection = oConnection
+        self.cursor = oConnection.conn.cursor()
+        self.bBuffered = bBuffered
+        self.lRows = None
+        self.description = None
+        self.rowcount = -1
+
+    ###
+    def value(self, value):
+
+        # python 2 byte strings are utf-8 text here, sqlite only takes unicode
+        if sys.version_info[0] < 3 and isinstance(value, str): return value.decode('utf-8', 'replace')
+
+        return value
+
+    ###
+    def args(self, tArgs):
+
+        if tArgs is None: return ()
+
+        return tuple( [self.value(value) for value in tArgs] )
+
+    ###
+    def placeholders(self, sQuery):
+
+        return sQuery.replace('%%', '\0').replace('%s', '?').replace('\0', '%')
+
+    ###
+    def execute(self, sQuery, tArgs=None):
+
+        self.lRows = None
+        self.description = None
+        self.rowcount = -1
+
+        sUpper = sQuery.strip().upper()
+
+        try:
+
+            if sUpper.startswith('SHOW '): return self.show(sQuery)
+            if sUpper.startswith('DROP DATABASE'): return self.dropAll()
+
+            lQueries = self.oConnection.oTranslator.translate(sQuery)
+
+            for (iQuery, sStatement) in enumerate(lQueries):
+
+                if tArgs is not None and iQuery == len(lQueries) - 1:
+
+                    self.cursor.execute( self.placeholders(sStatement), self.args(tArgs) )
+
+                else:
+
+                    self.cursor.execute(sStatement)
+
+            self.description = self.cursor.description
+            self.rowcount = self.cursor.rowcount
+
+            if self.description is not None and self.bBuffered:
+
+                self.lRows = self.cursor.fetchall()
+                self.rowcount = len(self.lRows)
+
+        except sqlite3.Error as e:
+
+            raise mysqlError(e)
+
+        return self.rowcount
+
+    ###
+    def executemany(self, sQuery, lArgs):
+
+        self.lRows = None
+        self.description = None
+
+        try:
+
+            for sStatement in self.oConnection.oTranslator.translate(sQuery):
+
+                self.cursor.executemany( self.placeholders(sStatement), [self.args(tArgs) for tArgs in lArgs] )
+
+            self.rowcount = self.cursor.rowcount
+
+        except sqlite3.Error as e:
+
+            raise mysqlError(e)
+
+        return self.rowcount
+
+    ###
+    def results(self, lNames, lRows):
+
+        self.description = tuple( [(sName, None, None, None, None, None, None) for sName in lNames] )
+        self.lRows = lRows
+        self.rowcount = len(lRows)
+
+        return self.rowcount
+
+    ###
+    # SHOW COLUMNS FROM t [LIKE 'x'] and SHOW INDEX FROM t [WHERE Key_name = 'x'] in mysql's column layout
+    ###
+    def show(self, sQuery):
+
+        oColumns = re.match(r'\s*SHOW\s+COLUMNS\s+FROM\s+`?(\w+)`?(\s+LIKE\s+\'([^\']*)\')?\s*;?\s*$', sQuery, flags=re.I)
+        oIndex = re.match(r'\s*SHOW\s+INDEX\s+FROM\s+`?(\w+)`?(\s+WHERE\s+Key_name\s*=\s*\'([^\']*)\')?\s*;?\s*$', sQuery, flags=re.I)
+
+        if oColumns:
+
+            lRows = []
+
+            # cid, name, type, notnull, dflt_value, pk
+            for tRow in self.cursor.execute('PRAGMA table_info(' + oColumns.group(1) + ')').fetchall():
+
+                if oColumns.group(3) is not None and tRow[1] != oColumns.group(3): continue
+
+                lRows.append( (tRow[1], tRow[2], 'NO' if tRow[3] else 'YES', 'PRI' if tRow[5] else '', tRow[4], '') )
+
+            return self.results(['Field','Type','Null','Key','Default','Extra'], lRows)
+
+        if oIndex:
+
+            sTable = oIndex.group(1)
+            lRows = []
+
+            for tRow in self.cursor.execute('PRAGMA table_info(' + sTable + ')').fetchall():
+
+                if tRow[5]: lRows.append( (sTable, 0, 'PRIMARY', tRow[5], tRow[1], 'A', None, None, None, '', 'BTREE', '', '') )
+
+            # seq, name, unique, origin, partial
+            for tIndex in self.cursor.execute('PRAGMA index_list(' + sTable + ')').fetchall():
+
+                # the automatic index behind a non-integer primary key is already reported as PRIMARY
+                if tIndex[3] == 'pk': continue
+
+                # seqno, cid, name
+                for tCol in self.cursor.execute('PRAGMA index_info(' + tIndex[1] + ')').fetchall():
+
+                    lRows.append( (sTable, 0 if tIndex[2] else 1, tIndex[1], tCol[0] + 1, tCol[2], 'A', None, None, None, '', 'BTREE', '', '') )
+
+            if oIndex.group(3) is not None: lRows = [tRow for tRow in lRows if tRow[2] == oIndex.group(3)]
+
+            return self.results(['Table','Non_unique','Key_name','Seq_in_index','Column_name','Collation','Cardinality','Sub_part','Packed','Null','Index_type','Comment','Index_comment'], lRows)
+
+        raise MySQLdb.NotSupportedError('sqlite backend does not support: ' + sQuery)
+
+    ###
+    def dropAll(self):
+
+        lObjects = self.cursor.execute('SELECT type, name FROM sqlite_master WHERE type IN (\'view\', \'table\') AND name NOT LIKE \'sqlite_%\'').fetchall()
+
+        for (sType, sName) in sorted(lObjects, key=lambda tObject: tObject[0] != 'view'):
+
+            self.cursor.execute('DROP ' + sType.upper() + ' IF EXISTS ' + sName)
+
+        self.oConnection.conn.commit()
+
+        return 0
+
+    ###
+    def fetchone(self):
+
+        if self.lRows is None: return self.cursor.fetchone()
+
+        if not self.lRows: return None
+
+        return self.lRows.pop(0)
+
+    ###
+    def fetchmany(self, iSize=None):
+
+        if iSize is None: iSize = self.cursor.arraysize
+
+        if self.lRows is None: return self.cursor.fetchmany(iSize)
+
+        lRows = self.lRows[:iSize]
+        self.lRows = self.lRows[iSize:]
+
+        return lRows
+
+    ###
+    def fetchall(self):
+
+        if self.lRows is None: return self.cursor.fetchall()
+
+        lRows = self.lRows
+        self.lRows = []
+
+        return lRows
+
+    ###
+    def close(self):
+
+        self.cursor.close()
+
+###
+# MySQLdb-like connection to a sqlite file
+###
+class SqliteConnection:
+
+    def __init__(self, sPath, dNaturalKeys=None, dUpsertKeys=None, iTimeout=60):
+
+        self.oTranslator = SqliteTranslator(dNaturalKeys=dNaturalKeys, dUpsertKeys=dUpsertKeys)
+
+        try:
+
+            # the crawl/analyze workers write concurrently; WAL lets readers through and the timeout queues the writers
+            self.conn = sqlite3.connect(sPath, timeout=iTimeout)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+
+        except sqlite3.Error as e:
+
+            raise mysqlError(e)
+
+        self.conn.create_function('SHA1', 1, sqlSha1)
+        self.conn.create_function('UNHEX', 1, sqlUnhex)
+        self.conn.create_function('CONCAT_WS', -1, sqlConcatWs)
+        self.conn.create_function('ELT', -1, sqlElt)
+        self.conn.create_function('BIT_COUNT', 1, sqlBitCount)
+        self.conn.create_aggregate('BIT_OR', 1, BitOr)
+
+        # MuseProjectDB shards its row counters by connection; one file, one shard
+        self.conn.create_function('CONNECTION_ID', 0, lambda: 0)
+
+        self.open = 1
+
+    ###
+    def cursor(self, cursorclass=None):
+
+        return SqliteCursor(self, bBuffered=(cursorclass is None or 'SSCursor' not in getattr(cursorclass, '__name__', '')))
+
+    ###
+    def commit(self):
+
+        try:
+
+            self.conn.commit()
+
+        except sqlite3.Error as e:
+
+            raise mysqlError(e)
+
+    ###
+    def rollback(self):
+
+        self.conn.rollback()
+
+    ###
+    def ping(self):
+
+        if not self.open: raise MySQLdb.InterfaceError('connection closed')
+
+        return True
+
+    ###
+    def close(self):
+
+        if self.open:
+
+            self.conn.close()
+            self.open = 0
@@ -0,0 +1,247 @@
+#!/usr/bin/python
+##
+## Copyright (c) 2014-2017 Leidos.
+##
+## License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+##
+##
+## Developed under contract #FA8750-14-C-0241
+##
+
+# test_buildProjectsByType.py -- the build status writer's spill file and its replay, against the embedded sqlite backend
+# (skipped where buildProjectsByType.py can't be imported: under python 3, or without the elasticsearch and redis clients)
+#
+#   python -m pytest tests/test_buildProjectsByType.py      (or python -m unittest discover tests, from muse-builder/corpusCrawler)
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath(__file__) ) ) )
+
+try:
+
+    import buildProjectsByType
+
+except (ImportError, SyntaxError):
+
+    # python 2 only, and needs the elasticsearch client
+    buildProjectsByType = None
+
+from projectDB import closeProjectDBs
+from projectDB import getProjectDB
+from projectDB import MySQLdb
+
+from test_projectDB import SqliteProjectDBTestCase
+
+###
+# dConfig for the writer functions, pointed at the test's sqlite database; records are written in batches of two
+###
+@unittest.skipIf(buildProjectsByType is None, 'buildProjectsByType.py needs python 2 and its dependencies (elasticsearch, redis) installed')
+class BuildStatusSpillTestCase(SqliteProjectDBTestCase):
+
+    def setUp(self):
+
+        SqliteProjectDBTestCase.setUp(self)
+
+        self.dConfig = {
+            'debug': False, 'mysql-db': 'sqlite:///' + os.path.join(self.sDir, 'muse.db'), 'mysql-port': 0, 'mysql-user': 'muse', 'mysql-passwd': 'muse',
+            'mysql-loc': 'localhost', 'mysql-writer-batch-size': 2, 'mysql-writer-interval': 10, 'mysql-writer-spill': os.path.join(self.sDir, 'spill.json')
+        }
+
+    def tearDown(self):
+
+        closeProjectDBs()
+
+        SqliteProjectDBTestCase.tearDown(self)
+
+    def builds(self, iBuilds):
+
+        return [ self.build('p' + str(i), 'ubuntu14', 0) for i in range(iBuilds) ]
+
+    def spilled(self):
+
+        if not os.path.exists(self.dConfig['mysql-writer-spill']): return None
+
+        with open(self.dConfig['mysql-writer-spill']) as fSpill:
+
+            return [ json.loads(sLine)['projectName'] for sLine in fSpill ]
+
+    def statuses(self):
+
+        return sorted( tRow[0] for tRow in self.dMp.select('projectName', 'buildStatus') )
+
+    # make dMp.insertIntoBuildStatusBatch() fail the batches whose (1-based) number is in dFailures: False or the exception to raise
+    def failBatches(self, dMp, dFailures):
+
+        fInsert = dMp.insertIntoBuildStatusBatch
+        lCalls = []
+
+        def insertIntoBuildStatusBatch(lBuilds, bUpsert=False, bDebug=False):
+
+            lCalls.append(len(lBuilds))
+
+            oFailure = dFailures.get(len(lCalls))
+
+            if oFailure is False: return False
+            if oFailure is not None: raise oFailure
+
+            return fInsert(lBuilds, bUpsert=bUpsert, bDebug=bDebug)
+
+        dMp.insertIntoBuildStatusBatch = insertIntoBuildStatusBatch
+
+        return lCalls
+
+###
+class BuildStatusSpillTest(BuildStatusSpillTestCase):
+
+    def testSpillAppends(self):
+
+        lBuilds = self.builds(3)
+
+        buildProjectsByType.spillBuildStatus(lBuilds[:2], self.dConfig)
+        buildProjectsByType.spillBuildStatus(lBuilds[2:], self.dConfig)
+
+        self.assertEqual(self.spilled(), ['p0', 'p1', 'p2'])
+
+    def testRewriteReplacesSpill(self):
+
+        lBuilds = self.builds(3)
+
+        buildProjectsByType.spillBuildStatus(lBuilds, self.dConfig)
+        buildProjectsByType.rewriteBuildStatusSpill(lBuilds[1:2], self.dConfig)
+
+        self.assertEqual(self.spilled(), ['p1'])
+        self.assertFalse( os.path.exists(self.dConfig['mysql-writer-spill'] + '.tmp') )
+
+    def testReplayWithoutSpill(self):
+
+        self.assertTrue( buildProjectsByType.replayBuildStatus(self.dMp, self.dConfig) )
+
+    def testReplayWritesAndRemovesSpill(self):
+
+        buildProjectsByType.spillBuildStatus(self.builds(5), self.dConfig)
+
+        self.assertTrue( buildProjectsByType.replayBuildStatus(self.dMp, self.dConfig) )
+
+        self.assertEqual(self.statuses(), ['p0', 'p1', 'p2', 'p3', 'p4'])
+        self.assertIsNone( self.spilled() )
+
+    def testReplaySkipsTornLine(self):
+
+        buildProjectsByType.spillBuildStatus(self.builds(2), self.dConfig)
+
+        with open(self.dConfig['mysql-writer-spill'], 'a') as fSpill:
+
+            fSpill.write('{"projectName": "p')
+
+        self.assertTrue( buildProjectsByType.replayBuildStatus(self.dMp, self.dConfig) )
+
+        self.assertEqual(self.statuses(), ['p0', 'p1'])
+
+    def testReplayKeepsFailedBatchSpilled(self):
+
+        buildProjectsByType.spillBuildStatus(self.builds(5), self.dConfig)
+
+        # the connection still pings after the second batch fails, so the third is tried (and goes in)
+        lCalls = self.failBatches(self.dMp, {2: False})
+
+        self.assertFalse( buildProjectsByType.replayBuildStatus(self.dMp, self.dConfig) )
+
+        self.assertEqual(lCalls, [2, 2, 1])
+        self.assertEqual(self.statuses(), ['p0', 'p1', 'p4'])
+        self.assertEqual(self.spilled(), ['p2', 'p3'])
+
+    def testReplayStopsOnMySQLError(self):
+
+        buildProjectsByType.spillBuildStatus(self.builds(5), self.dConfig)
+
+        lCalls = self.failBatches(self.dMp, {2: MySQLdb.OperationalError(2006, 'MySQL server has gone away')})
+
+        self.assertFalse( buildProjectsByType.replayBuildStatus(self.dMp, self.dConfig) )
+
+        self.assertEqual(lCalls, [2, 2])
+        self.assertEqual(self.statuses(), ['p0', 'p1'])
+        self.assertEqual(self.spilled(), ['p2', 'p3', 'p4'])
+
+        # the next replay picks up where this one left off
+        del self.dMp.insertIntoBuildStatusBatch
+
+        self.assertTrue( buildProjectsByType.replayBuildStatus(self.dMp, self.dConfig) )
+
+        self.assertEqual(self.statuses(), ['p0', 'p1', 'p2', 'p3', 'p4'])
+        self.assertIsNone( self.spilled() )
+
+###
+class FlushBuildStatusTest(BuildStatusSpillTestCase):
+
+    def pooledProjectDB(self):
+
+        return getProjectDB(db=self.dConfig['mysql-db'], port=self.dConfig['mysql-port'], user=self.dConfig['mysql-user'], passwd=self.dConfig['mysql-passwd'], loc=self.dConfig['mysql-loc'])
+
+    def testFlushWrites(self):
+
+        buildProjectsByType.flushBuildStatus(self.builds(2), self.dConfig)
+
+        self.assertEqual(self.statuses(), ['p0', 'p1'])
+        self.assertIsNone( self.spilled() )
+
+    def testFlushSpillsRejectedBatch(self):
+
+        self.failBatches(self.pooledProjectDB(), {1: False})
+
+        buildProjectsByType.flushBuildStatus(self.builds(2), self.dConfig)
+
+        self.assertEqual(self.statuses(), [])
+        self.assertEqual(self.spilled(), ['p0', 'p1'])
+
+    def testFlushSpillsOnMySQLError(self):
+
+        self.failBatches(self.pooledProjectDB(), {1: MySQLdb.OperationalError(2013, 'Lost connection to MySQL server during query')})
+
+        buildProjectsByType.flushBuildStatus(self.builds(2), self.dConfig)
+
+        self.assertEqual(self.statuses(), [])
+        self.assertEqual(self.spilled(), ['p0', 'p1'])
+
+    def testFlushReplaysSpillFirst(self):
+
+        lBuilds = self.builds(4)
+
+        buildProjectsByType.spillBuildStatus(lBuilds[:2], self.dConfig)
+        buildProjectsByType.flushBuildStatus(lBuilds[2:], self.dConfig)
+
+        self.assertEqual(self.statuses(), ['p0', 'p1', 'p2', 'p3'])
+        self.assertIsNone( self.spilled() )
+
+    def testFlushSpillsBehindPendingSpill(self):
+
+        lBuilds = self.builds(4)
+
+        buildProjectsByType.spillBuildStatus(lBuilds[:2], self.dConfig)
+
+        # the spilled records can't be replayed, so the new batch goes to disk behind them rather than into mysql ahead of them
+        self.failBatches(self.pooledProjectDB(), {1: False})
+
+        buildProjectsByType.flushBuildStatus(lBuilds[2:], self.dConfig)
+
+        self.assertEqual(self.statuses(), [])
+        self.assertEqual(self.spilled(), ['p0', 'p1', 'p2', 'p3'])
+
+    def testWriterFlushesOnSentinel(self):
+
+        qStatus = buildProjectsByType.Queue.Queue()
+
+        for dBuildArgs in self.builds(3): qStatus.put(dBuildArgs)
+
+        qStatus.put(None)
+
+        buildProjectsByType.writeBuildStatus(qStatus, self.dConfig)
+
+        self.assertEqual(self.statuses(), ['p0', 'p1', 'p2'])
+        self.assertIsNone( self.spilled() )
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,260 @@
+#!/usr/bin/python
+##
+## Copyright (c) 2014-2017 Leidos.
+##
+## License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+##
+##
+## Developed under contract #FA8750-14-C-0241
+##
+
+# test_corpusManifest.py -- manifest builds, prefix lookups and incremental refreshes over a small temporary corpus
+#
+#   python -m pytest tests/test_corpusManifest.py      (or python -m unittest discover tests, from muse-builder/corpusCrawler)
+
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath(__file__) ) ) )
+
+from corpusManifest import bisectManifest
+from corpusManifest import manifestRange
+from corpusManifest import projectRoots
+from corpusManifest import refreshManifest
+from corpusManifest import refreshShard
+
+###
+# a corpus with 4 hex levels above the project roots (instead of 8), sharded at its first 2
+###
+class CorpusManifestTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.sDir = tempfile.mkdtemp(prefix='muse_test_')
+        self.sCorpus = os.path.join(self.sDir, 'corpus')
+        self.sManifest = os.path.join(self.sDir, 'corpus.manifest')
+
+        self.iLevel = self.sCorpus.count(os.sep) + 5
+
+        for sProject in ('0/1/2/3/p1', '0/1/2/4/p2', '0/2/0/0/p3', 'a/b/c/d/p4', 'a/b/c/d/p5'):
+
+            self.addProject(self.sCorpus, sProject)
+
+        # hex directories with no project below them (yet)
+        os.makedirs( os.path.join(self.sCorpus, 'a', 'c', 'e') )
+        os.makedirs( os.path.join(self.sCorpus, 'f', '0') )
+
+        self.ageCorpus()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.sDir)
+
+    def addProject(self, sCorpus, sProject):
+
+        sRoot = os.path.join( sCorpus, *sProject.split('/') )
+
+        os.makedirs(sRoot)
+
+        return sRoot
+
+    # back-date every directory, so any change a test makes afterwards moves an mtime however coarse the filesystem's clock
+    def ageCorpus(self):
+
+        fOld = time.time() - 3600
+
+        for sDir, lDirs, lFiles in os.walk(self.sDir):
+
+            os.utime(sDir, (fOld, fOld))
+
+    def refresh(self, lCorpusPaths=None, bFull=False):
+
+        return refreshManifest(self.sManifest, lCorpusPaths=lCorpusPaths, iForks=2, iLevel=self.iLevel, bFull=bFull)
+
+    def roots(self, sCorpus=None):
+
+        return [ os.path.relpath(sRoot, self.sCorpus) for sRoot in manifestRange(self.sManifest, sCorpus) ]
+
+###
+class CorpusManifestTest(CorpusManifestTestCase):
+
+    def testBuild(self):
+
+        dShards = self.refresh([self.sCorpus])
+
+        self.assertEqual(self.roots(), ['0/1/2/3/p1', '0/1/2/4/p2', '0/2/0/0/p3', 'a/b/c/d/p4', 'a/b/c/d/p5'])
+
+        self.assertEqual( sorted( os.path.relpath(sShard, self.sCorpus) for sShard in dShards['shards'] ), ['0/1', '0/2', 'a/b', 'a/c', 'f/0'] )
+        self.assertEqual( dShards['shards'][ os.path.join(self.sCorpus, '0', '1') ]['roots'], 2 )
+        self.assertEqual( dShards['shards'][ os.path.join(self.sCorpus, 'f', '0') ]['roots'], 0 )
+
+        with open(self.sManifest + '.shards') as fShards:
+
+            self.assertEqual(json.load(fShards), dShards)
+
+        # the directories above the roots, the empty ones included
+        with open(self.sManifest + '.dirs') as fDirs:
+
+            lDirs = [ os.path.relpath(sLine.rstrip('\n'), self.sCorpus) for sLine in fDirs ]
+
+        self.assertIn('a/c/e', lDirs)
+        self.assertIn('0/1/2', lDirs)
+        self.assertNotIn('0/1/2/3/p1', lDirs)
+
+    def testManifestRange(self):
+
+        self.refresh([self.sCorpus])
+
+        self.assertEqual(self.roots(self.sCorpus), self.roots())
+        self.assertEqual(self.roots( os.path.join(self.sCorpus, '0', '1') ), ['0/1/2/3/p1', '0/1/2/4/p2'])
+        self.assertEqual(self.roots( os.path.join(self.sCorpus, 'a', 'b', 'c', 'd', 'p5') + os.sep ), [])
+        self.assertEqual(self.roots( os.path.join(self.sCorpus, 'a', 'b', 'c', 'd') ), ['a/b/c/d/p4', 'a/b/c/d/p5'])
+        self.assertEqual(self.roots( os.path.join(self.sCorpus, 'f') ), [])
+        self.assertEqual(self.roots( os.path.join(self.sCorpus, '9') ), [])
+
+    def testManifestRangeMatchesWholeDirectories(self):
+
+        sOther = self.sCorpus + '1'
+
+        self.addProject(sOther, '0/0/0/0/q1')
+
+        self.refresh([self.sCorpus, sOther])
+
+        self.assertEqual(len( self.roots(self.sCorpus) ), 5)
+        self.assertEqual(list( manifestRange(self.sManifest, sOther) ), [ os.path.join(sOther, '0', '0', '0', '0', 'q1') ])
+
+    def testBisectManifest(self):
+
+        with open(self.sManifest, 'wb') as fManifest:
+
+            fManifest.write(b'/c/0/a\n/c/0/b\n/c/1/a\n/c/2/a\n')
+
+        with open(self.sManifest, 'rb') as fManifest:
+
+            oMap = mmap.mmap(fManifest.fileno(), 0, access=mmap.ACCESS_READ)
+
+            try:
+
+                self.assertEqual(bisectManifest(oMap, b''), 0)
+                self.assertEqual(bisectManifest(oMap, b'/c/0/b'), 7)
+                self.assertEqual(bisectManifest(oMap, b'/c/1/'), 14)
+                self.assertEqual(bisectManifest(oMap, b'/c/3/'), len(oMap))
+
+            finally:
+
+                oMap.close()
+
+    def testEmptyManifest(self):
+
+        sEmpty = os.path.join(self.sDir, 'empty')
+        os.makedirs(sEmpty)
+
+        self.refresh([sEmpty])
+
+        self.assertEqual(self.roots(), [])
+
+    def testProjectRoots(self):
+
+        self.refresh([self.sCorpus])
+
+        sShard = os.path.join(self.sCorpus, 'a')
+
+        self.assertEqual( list( projectRoots(sShard, sManifest=self.sManifest) ), [ os.path.join(self.sCorpus, 'a', 'b', 'c', 'd', 'p' + s) for s in '45' ] )
+
+###
+class CorpusManifestRefreshTest(CorpusManifestTestCase):
+
+    def setUp(self):
+
+        CorpusManifestTestCase.setUp(self)
+
+        self.dShards = self.refresh([self.sCorpus])
+
+    def testUnchangedShardIsNotWalked(self):
+
+        for sShard, dEntry in self.dShards['shards'].items():
+
+            (sDone, lRoots, lDirs, dNew) = refreshShard( (sShard, self.iLevel, self.sManifest, dEntry) )
+
+            self.assertIsNone(lRoots, sShard)
+            self.assertIs(dNew, dEntry)
+
+    def testRefreshUnchanged(self):
+
+        dShards = self.refresh()
+
+        self.assertEqual(dShards['shards'], self.dShards['shards'])
+        self.assertEqual(dShards['corpus-dir-paths'], [self.sCorpus])
+        self.assertEqual(len( self.roots() ), 5)
+
+    def testProjectAddedUnderEmptyDirectory(self):
+
+        sShard = os.path.join(self.sCorpus, 'a', 'c')
+
+        # a/c/e had nothing below it, so only its own mtime moves
+        self.addProject(self.sCorpus, 'a/c/e/7/p6')
+
+        (sDone, lRoots, lDirs, dEntry) = refreshShard( (sShard, self.iLevel, self.sManifest, self.dShards['shards'][sShard]) )
+
+        self.assertEqual(lRoots, [ os.path.join(sShard, 'e', '7', 'p6') ])
+
+        self.refresh()
+
+        self.assertEqual(self.roots( os.path.join(self.sCorpus, 'a') ), ['a/b/c/d/p4', 'a/b/c/d/p5', 'a/c/e/7/p6'])
+
+    def testProjectAddedDeepInShard(self):
+
+        self.addProject(self.sCorpus, '0/1/2/3/p0')
+
+        self.refresh()
+
+        self.assertEqual(self.roots( os.path.join(self.sCorpus, '0') ), ['0/1/2/3/p0', '0/1/2/3/p1', '0/1/2/4/p2', '0/2/0/0/p3'])
+
+    def testProjectRemoved(self):
+
+        os.rmdir( os.path.join(self.sCorpus, 'a', 'b', 'c', 'd', 'p4') )
+
+        dShards = self.refresh()
+
+        self.assertEqual(self.roots( os.path.join(self.sCorpus, 'a') ), ['a/b/c/d/p5'])
+        self.assertEqual(dShards['shards'][ os.path.join(self.sCorpus, 'a', 'b') ]['roots'], 1)
+
+    def testShardAddedAndRemoved(self):
+
+        shutil.rmtree( os.path.join(self.sCorpus, 'f') )
+
+        self.addProject(self.sCorpus, '5/5/5/5/p7')
+
+        dShards = self.refresh()
+
+        self.assertIn(os.path.join(self.sCorpus, '5', '5'), dShards['shards'])
+        self.assertNotIn(os.path.join(self.sCorpus, 'f', '0'), dShards['shards'])
+        self.assertIn('5/5/5/5/p7', self.roots())
+
+    def testManifestWithoutDirsIsWalkedInFull(self):
+
+        os.remove(self.sManifest + '.dirs')
+
+        self.addProject(self.sCorpus, 'f/0/1/2/p8')
+
+        self.refresh()
+
+        self.assertTrue( os.path.exists(self.sManifest + '.dirs') )
+        self.assertEqual(len( self.roots() ), 6)
+
+    def testLevelChangeRebuilds(self):
+
+        dShards = refreshManifest(self.sManifest, lCorpusPaths=[self.sCorpus], iForks=2, iLevel=self.iLevel - 1)
+
+        self.assertEqual(dShards['level'], self.iLevel - 1)
+        self.assertEqual(self.roots( os.path.join(self.sCorpus, '0', '1') ), ['0/1/2/3', '0/1/2/4'])
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,257 @@
+#!/usr/bin/python
+##
+## Copyright (c) 2014-2017 Leidos.
+##
+## License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+##
+##
+## Developed under contract #FA8750-14-C-0241
+##
+
+# test_projectDB.py -- MuseProjectDB round trips on the embedded sqlite backend (no MySQL server or mysqlclient needed)
+#
+#   python -m pytest tests/test_projectDB.py      (or python -m unittest discover tests, from muse-builder/corpusCrawler)
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from contextlib import closing
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath(__file__) ) ) )
+
+from projectDB import MuseProjectDB
+
+from sqliteDB import SqliteTranslator
+
+###
+class SqliteTranslatorTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.oTranslator = SqliteTranslator(dNaturalKeys={'buildTargets': ['projectName','buildTargetPath']}, dUpsertKeys={'buildTargets': ['projectName','buildTargetPath'], 'projects': ['projectName']})
+
+    def testDroppedStatements(self):
+
+        self.assertEqual(self.oTranslator.translate('USE muse;'), [])
+        self.assertEqual(self.oTranslator.translate('CREATE DATABASE IF NOT EXISTS muse;'), [])
+
+    def testTruncateAndForUpdate(self):
+
+        self.assertEqual(self.oTranslator.translate('TRUNCATE TABLE projects;'), ['DELETE FROM projects'])
+        self.assertEqual(self.oTranslator.translate('SELECT status FROM projectBuildStatus WHERE projectName = %s FOR UPDATE;'), ['SELECT status FROM projectBuildStatus WHERE projectName = %s'])
+
+    def testCreateTable(self):
+
+        sQuery = 'CREATE TABLE IF NOT EXISTS buildTargets (`id` INT UNSIGNED NOT NULL AUTO_INCREMENT,`projectName` VARCHAR(255) CHARACTER SET utf8 NOT NULL,'
+        sQuery += '`buildTargetPath` VARCHAR(2048) NOT NULL,`keyHash` BINARY(20),PRIMARY KEY(`id`),UNIQUE KEY buildTargets_keyHash (`keyHash`));'
+
+        sTranslated = self.oTranslator.translate(sQuery)[0]
+
+        self.assertIn('`id` INTEGER PRIMARY KEY AUTOINCREMENT', sTranslated)
+        self.assertIn('CONSTRAINT buildTargets_keyHash UNIQUE (projectName,buildTargetPath)', sTranslated)
+        self.assertNotIn('keyHash`', sTranslated)
+        self.assertNotIn('CHARACTER SET', sTranslated)
+        self.assertNotIn('UNSIGNED', sTranslated)
+
+    def testUpsert(self):
+
+        lQueries = self.oTranslator.translate('INSERT INTO projects (projectName,site) VALUES (%s,%s) ON DUPLICATE KEY UPDATE projectName=VALUES(projectName),site=VALUES(site)')
+
+        self.assertEqual(lQueries, ['INSERT INTO projects (projectName,site) VALUES (%s,%s) ON CONFLICT (projectName) DO UPDATE SET projectName=excluded.projectName,site=excluded.site'])
+
+    def testIndexes(self):
+
+        self.assertEqual(self.oTranslator.translate('CREATE INDEX buildTargets_path ON buildTargets (buildTargetPath(255)) USING BTREE;'), ['CREATE INDEX IF NOT EXISTS buildTargets_path ON buildTargets (buildTargetPath)'])
+        self.assertEqual(self.oTranslator.translate('ALTER TABLE buildTargets ADD INDEX a (projectName), DROP INDEX b;'), ['CREATE INDEX IF NOT EXISTS a ON buildTargets (projectName)', 'DROP INDEX IF EXISTS b'])
+
+###
+# a fresh sqlite database per test, initialized like projectDB.py --initialize
+###
+class SqliteProjectDBTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.sDir = tempfile.mkdtemp(prefix='muse_test_')
+
+        self.dMp = MuseProjectDB(db='sqlite:///' + os.path.join(self.sDir, 'muse.db'))
+        self.dMp.initialize()
+        self.dMp.createViews()
+
+    def tearDown(self):
+
+        self.dMp.close()
+
+        shutil.rmtree(self.sDir)
+
+    def buildTarget(self, sProjectName, sBuildTargetPath, sBuildType='makefileBuildType', iRanking=1):
+
+        dTarget = {'projectName': sProjectName, 'projectPath': '/corpus/' + sProjectName, 'buildTargetPath': sBuildTargetPath, 'ranking': iRanking, 'depth': sBuildTargetPath.count('/')}
+
+        for sType in self.dMp.lBuildTypes:
+
+            dTarget[sType] = sType == sBuildType
+
+        return dTarget
+
+    def build(self, sProjectName, sOS, iReturnCode, iObjects=0, sBuildTarPath=None):
+
+        return {
+            'projectName': sProjectName, 'projectPath': '/corpus/' + sProjectName, 'buildTarPath': sBuildTarPath or '/builds/' + sProjectName + '_' + sOS + '.tgz',
+            'builder': 'builder-1', 'buildTime': 10, 'version': '1', 'os': sOS, 'numObjectsPreBuild': 0, 'numObjectsPostBuild': iObjects,
+            'numObjectsGenerated': iObjects, 'numSources': 3, 'returnCode': iReturnCode,
+            'targets': [ {'buildTargetPath': 'Makefile', 'buildType': 'makefileBuildType', 'returnCode': iReturnCode} ]
+        }
+
+    def count(self, sTable):
+
+        with closing( self.dMp.cursor() ) as cursor:
+
+            cursor.execute('SELECT COUNT(*) FROM ' + sTable + ';')
+
+            return cursor.fetchone()[0]
+
+###
+class SqliteProjectDBTest(SqliteProjectDBTestCase):
+
+    def testInitializeCreatesEmptyTables(self):
+
+        for sTable in self.dMp.lTables:
+
+            self.assertEqual(self.dMp.countRows(sTable), 0, sTable)
+
+    def testInsertAndUpsertBuildTargets(self):
+
+        lTargets = [ self.buildTarget('p1', 'Makefile'), self.buildTarget('p1', 'src/Makefile', iRanking=2) ]
+
+        self.assertEqual(self.dMp.insertIntoBuildTargets(lTargets), 2)
+
+        # plain inserts of existing natural keys are rejected
+        self.assertEqual(self.dMp.insertIntoBuildTargets( lTargets[:1] ), 0)
+
+        # upserts rewrite them in place
+        lTargets[1]['ranking'] = 5
+
+        self.assertEqual(self.dMp.insertIntoBuildTargets(lTargets, bUpsert=True), 2)
+        self.assertEqual(self.count('buildTargets'), 2)
+        self.assertEqual(self.dMp.select('ranking', 'buildTargets', sWhereClause='buildTargetPath = \'src/Makefile\''), [(5, )])
+
+        # buildType bitmask kept by trigger
+        self.assertEqual(self.dMp.findProjectsByBuildTypeMask( self.dMp.buildTypeMask(['makefileBuildType']) ), ['p1'])
+
+    def testUpsertProjects(self):
+
+        self.assertEqual(self.dMp.insertIntoProjects( [{'_source': {'name': 'p1', 'site': 'github', 'c': True}}] ), 1)
+        self.assertEqual(self.dMp.insertIntoProjects( [{'_source': {'name': 'p1', 'site': 'sourceforge', 'c': True}}, {'_source': {'name': 'p2'}}], bUpsert=True ), 2)
+
+        self.assertEqual(sorted( self.dMp.select('projectName, site', 'projects') ), [('p1', 'sourceforge'), ('p2', None)])
+
+    def testBulkLoadUpserts(self):
+
+        self.assertEqual(self.dMp.bulkLoad('buildTargets', [ self.buildTarget('p1', 'Makefile') ]), 1)
+        self.assertEqual(self.dMp.bulkLoad('buildTargets', [ self.buildTarget('p1', 'Makefile', iRanking=3), self.buildTarget('p2', 'Makefile') ], bUpsert=True), 2)
+
+        self.assertEqual(sorted( self.dMp.select('projectName, ranking', 'buildTargets') ), [('p1', 3), ('p2', 1)])
+
+    def testBuildSummaries(self):
+
+        self.dMp.insertIntoProjects( [{'_source': {'name': 'p1', 'site': 'github'}}, {'_source': {'name': 'p2', 'site': 'github'}}] )
+
+        lBuilds = [ self.build('p1', 'ubuntu14', 2), self.build('p1', 'fedora21', 0), self.build('p2', 'ubuntu14', 2, iObjects=4) ]
+
+        self.assertTrue( self.dMp.insertIntoBuildStatusBatch(lBuilds, bUpsert=True) )
+
+        # a project's best status over every os: p1 succeeded on fedora21, p2 partially built
+        self.assertEqual(sorted( self.dMp.select('projectName, status', 'projectBuildStatus') ), [('p1', 0), ('p2', 1)])
+        self.assertEqual(sorted( self.dMp.select('projectName, os, status', 'projectOSBuildStatus') ), [('p1', 'fedora21', 0), ('p1', 'ubuntu14', 2), ('p2', 'ubuntu14', 1)])
+
+        dCounts = dict( ((sSite, sOS, sBuilds), iCount) for (sSite, sOS, sBuilds, iCount) in self.dMp.select('site, os, builds, projectCount', 'buildStatusCounts') )
+
+        self.assertEqual(dCounts[('*', '*', 'totals')], 2)
+        self.assertEqual(dCounts[('*', '*', 'successes')], 1)
+        self.assertEqual(dCounts[('github', 'ubuntu14', 'fails')], 1)
+        self.assertEqual(dCounts[('github', 'ubuntu14', 'partials')], 1)
+
+        # the incremental counts agree with a full rebuild (which drops the zero rows)
+        lIncremental = sorted( [tRow for tRow in self.dMp.select('site, os, builds, projectCount', 'buildStatusCounts') if tRow[3]] )
+
+        self.dMp.rebuildSummaries()
+
+        self.assertEqual(sorted( self.dMp.select('site, os, builds, projectCount', 'buildStatusCounts') ), lIncremental)
+
+    def testTopTargetsRefresh(self):
+
+        self.dMp.insertIntoProjects( [{'_source': {'name': 'p1', 'site': 'github'}}] )
+        self.dMp.insertIntoBuildTargets( [ self.buildTarget('p1', 'Makefile'), self.buildTarget('p1', 'src/Makefile') ] )
+
+        self.assertNotEqual(self.dMp.topTargetsStaleness(), None)
+        self.assertTrue( self.dMp.rebuildTopTargets() )
+        self.assertEqual(self.dMp.topTargetsStaleness(), None)
+
+        self.assertEqual(self.dMp.select('projectName, buildTargetPath', 'topTargets'), [('p1', 'Makefile')])
+
+        self.dMp.insertIntoBuildTargets( [ self.buildTarget('p2', 'Makefile') ] )
+
+        self.assertNotEqual(self.dMp.topTargetsStaleness(), None)
+
+###
+class SqliteRowCountsTest(SqliteProjectDBTestCase):
+
+    def assertCounted(self, sTable):
+
+        self.assertEqual(self.dMp.countRows(sTable), self.count(sTable), sTable)
+
+    def testInsertsAreCounted(self):
+
+        self.dMp.insertIntoBuildTargets( [ self.buildTarget('p1', 'Makefile'), self.buildTarget('p1', 'src/Makefile') ] )
+        self.assertCounted('buildTargets')
+
+        # failed chunk retried row by row: only the new row counts
+        self.dMp.insertIntoBuildTargets( [ self.buildTarget('p1', 'Makefile'), self.buildTarget('p1', 'lib/Makefile') ] )
+        self.assertCounted('buildTargets')
+
+        # upserts count the keys that weren't there yet, once each
+        self.dMp.insertIntoBuildTargets( [ self.buildTarget('p1', 'Makefile'), self.buildTarget('p2', 'Makefile'), self.buildTarget('p2', 'Makefile') ], bUpsert=True )
+        self.assertCounted('buildTargets')
+
+        self.dMp.bulkLoad('buildTargets', [ self.buildTarget('p3', 'Makefile'), self.buildTarget('p1', 'Makefile') ], bUpsert=True)
+        self.assertCounted('buildTargets')
+
+        self.assertEqual(self.dMp.countRows('buildTargets'), 5)
+
+    def testBuildStatusIsCounted(self):
+
+        dBuild = self.build('p1', 'ubuntu14', 0)
+
+        self.dMp.insertIntoBuildStatus(dBuild, bUpsert=True)
+        self.dMp.insertIntoBuildStatus(dBuild, bUpsert=True)
+        self.dMp.insertIntoBuildStatusBatch( [ dBuild, self.build('p1', 'fedora21', 0) ], bUpsert=True )
+
+        self.assertEqual(self.dMp.countRows('buildStatus'), 2)
+        self.assertCounted('buildStatus')
+        self.assertCounted('buildStatusTargets')
+
+    def testFlushAndReseed(self):
+
+        self.dMp.insertIntoBuildTargets( [ self.buildTarget('p1', 'Makefile') ] )
+
+        self.dMp.flush('buildTargets')
+        self.assertEqual(self.dMp.countRows('buildTargets'), 0)
+
+        self.dMp.insertIntoBuildTargets( [ self.buildTarget('p1', 'Makefile'), self.buildTarget('p2', 'Makefile') ] )
+
+        # counters that drifted (e.g. rows written by hand) are reseeded from COUNT(*)
+        with closing( self.dMp.cursor() ) as cursor:
+
+            cursor.execute('UPDATE rowCounts SET numRows = 7;')
+            self.dMp.conn.commit()
+
+        self.dMp.migrateRowCounts()
+
+        self.assertEqual(self.dMp.countRows('buildTargets'), 2)
+        self.assertCounted('projects')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,408 @@
+#!/usr/bin/python
+##
+## Copyright (c) 2014-2017 Leidos.
+##
+## License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+##
+##
+## Developed under contract #FA8750-14-C-0241
+##
+
+# test_redisHelper.py -- redisHelper queues against fakeredis (needs fakeredis and lupa for the lua scripts)
+#
+#   python -m pytest tests/test_redisHelper.py      (or python -m unittest discover tests, from muse-builder/corpusCrawler)
+
+import json
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath(__file__) ) ) )
+
+try:
+    import fakeredis
+    import lupa
+except ImportError:
+    fakeredis = None
+
+import redisHelper
+
+from redisHelper import QueueCodec
+from redisHelper import QueueItems
+from redisHelper import RedisPriorityQueue
+from redisHelper import RedisQueue
+
+###
+# every queue of a test talks to one in-memory redis server, through the shared-pool getRedis() seam
+###
+@unittest.skipIf(fakeredis is None, 'fakeredis and lupa are required')
+class FakeRedisTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.oServer = fakeredis.FakeServer()
+        self.fnGetRedis = redisHelper.getRedis
+
+        redisHelper.getRedis = lambda **redis_kwargs: fakeredis.FakeStrictRedis(server=self.oServer)
+
+    def tearDown(self):
+
+        redisHelper.getRedis = self.fnGetRedis
+
+    ###
+    # let leases taken with leaseTimeout=0 expire
+    ###
+    def expire(self):
+
+        time.sleep(0.01)
+
+###
+# lease, heartbeat, reap and dead letter behaviour shared by RedisQueue and RedisPriorityQueue
+###
+class LeaseTests(object):
+
+    def put(self, q, item):
+
+        raise NotImplementedError
+
+    def testExpiredLeaseIsRequeuedOnce(self):
+
+        q = self.queue(leaseTimeout=0)
+        self.put(q, 'a')
+
+        (item, sLease) = q.getLease(block=False)
+
+        self.assertEqual(item, 'a')
+        self.assertEqual(q.leased(), 1)
+        self.assertEqual(q.size(), 0)
+
+        self.expire()
+
+        self.assertEqual(q.reapLeases(), 1)
+        self.assertEqual(q.reapLeases(), 0)
+        self.assertEqual(q.leased(), 0)
+        self.assertEqual(q.size(), 1)
+
+        # the reaped lease is gone, its holder must not ack or extend it
+        self.assertFalse( q.heartbeat(sLease) )
+        self.assertFalse( q.ack(sLease) )
+
+        self.assertEqual(q.getLease(block=False)[0], 'a')
+
+    def testAckedLeaseIsNotReaped(self):
+
+        q = self.queue(leaseTimeout=0)
+        self.put(q, 'a')
+
+        (item, sLease) = q.getLease(block=False)
+
+        self.assertTrue( q.ack(sLease) )
+
+        self.expire()
+
+        self.assertEqual(q.reapLeases(), 0)
+        self.assertEqual(q.leased(), 0)
+        self.assertEqual(q.size(), 0)
+        self.assertEqual(q.deadLetters(), 0)
+
+    def testHeartbeatKeepsLease(self):
+
+        q = self.queue(leaseTimeout=600)
+        self.put(q, 'a')
+
+        (item, sLease) = q.getLease(block=False)
+
+        self.assertTrue( q.heartbeat(sLease) )
+        self.assertEqual(q.reapLeases(), 0)
+        self.assertEqual(q.leased(), 1)
+
+    def testDeadLetterAfterMaxReaps(self):
+
+        q = self.queue(leaseTimeout=0, maxReaps=2)
+        self.put(q, 'a')
+
+        q.getLease(block=False)
+        self.expire()
+
+        self.assertEqual(q.reapLeases(), 1)
+        self.assertEqual(q.deadLetters(), 0)
+
+        q.getLease(block=False)
+        self.expire()
+
+        # second expiry: dead lettered, not re-queued
+        self.assertEqual(q.reapLeases(), 0)
+        self.assertEqual(q.deadLetters(), 1)
+        self.assertEqual(q.size(), 0)
+        self.assertEqual(q.leased(), 0)
+        self.assertEqual(q.getLease(block=False), None)
+
+    def testAckResetsReapCount(self):
+
+        q = self.queue(leaseTimeout=0, maxReaps=2)
+        self.put(q, 'a')
+
+        q.getLease(block=False)
+        self.expire()
+        q.reapLeases()
+
+        (item, sLease) = q.getLease(block=False)
+        q.ack(sLease)
+
+        # queued again later (e.g. a rebuild), it gets its full maxReaps again
+        self.put(q, 'a')
+
+        q.getLease(block=False)
+        self.expire()
+
+        self.assertEqual(q.reapLeases(), 1)
+        self.assertEqual(q.deadLetters(), 0)
+
+    def testNoDeadLettersWithoutMaxReaps(self):
+
+        q = self.queue(leaseTimeout=0, maxReaps=0)
+        self.put(q, 'a')
+
+        for i in range(4):
+
+            q.getLease(block=False)
+            self.expire()
+
+            self.assertEqual(q.reapLeases(), 1)
+
+        self.assertEqual(q.deadLetters(), 0)
+
+###
+class RedisQueueLeaseTest(FakeRedisTestCase, LeaseTests):
+
+    def queue(self, **kwargs):
+
+        return RedisQueue('lease-test', codec=QueueCodec(), **kwargs)
+
+    def put(self, q, item):
+
+        q.put(item)
+
+    def testIdenticalItemsHaveTheirOwnLeases(self):
+
+        q = self.queue(leaseTimeout=0)
+        q.putMany(['a', 'a'])
+
+        (item1, sLease1) = q.getLease(block=False)
+        (item2, sLease2) = q.getLease(block=False)
+
+        self.assertNotEqual(sLease1, sLease2)
+        self.assertTrue( q.ack(sLease1) )
+
+        self.expire()
+
+        # the copy that wasn't acked still comes back
+        self.assertEqual(q.reapLeases(), 1)
+        self.assertEqual(q.size(), 1)
+
+###
+class RedisPriorityQueueLeaseTest(FakeRedisTestCase, LeaseTests):
+
+    def queue(self, **kwargs):
+
+        return RedisPriorityQueue('lease-test', codec=QueueCodec(), **kwargs)
+
+    def put(self, q, item):
+
+        q.put(item, 1)
+
+    def testReapedItemIsNextOut(self):
+
+        q = self.queue(leaseTimeout=0)
+        q.putMany( [('low', 1), ('high', 5)] )
+
+        self.assertEqual(q.getLease(block=False)[0], 'high')
+
+        self.expire()
+        q.reapLeases()
+
+        q.put('higher', 9)
+
+        self.assertEqual(q.getLease(block=False)[0], 'high')
+
+###
+class RedisQueueDedupTest(FakeRedisTestCase):
+
+    def queue(self, **kwargs):
+
+        return RedisQueue('dedup-test', codec=QueueCodec(), dedup=True, **kwargs)
+
+    def testPutManyCountsOnlyNewItems(self):
+
+        q = self.queue()
+
+        self.assertEqual(q.putMany( ['p1', 'p2', 'p1'] ), 2)
+        self.assertEqual(q.putMany( ['p2', 'p3'] ), 1)
+
+        # across chunks too
+        self.assertEqual(q.putMany( ['p4', 'p5', 'p4', 'p6', 'p5'], chunk=2 ), 3)
+
+        self.assertEqual(q.size(), 6)
+        self.assertEqual(q.seen(), 6)
+
+    def testDuplicatesStaySkippedAfterTheyAreTaken(self):
+
+        q = self.queue()
+
+        self.assertTrue( q.put('p1') )
+
+        q.getLease(block=False)
+
+        self.assertFalse( q.put('p1') )
+        self.assertEqual(q.size(), 0)
+
+    def testForgetAllowsRequeue(self):
+
+        q = self.queue()
+
+        q.put('p1')
+
+        self.assertTrue( q.forget('p1') )
+        self.assertTrue( q.put('p1') )
+        self.assertEqual(q.size(), 2)
+
+    def testDedupKey(self):
+
+        q = self.queue(dedupKey=lambda dItem: dItem['projectName'])
+
+        self.assertEqual(q.putMany( [{'projectName': 'p1', 'os': 'ubuntu14'}, {'projectName': 'p1', 'os': 'fedora21'}] ), 1)
+        self.assertEqual(q.getLease(block=False)[0], {'projectName': 'p1', 'os': 'ubuntu14'})
+
+    def testTelemetryCountsOnlyPushedItems(self):
+
+        q = self.queue(telemetry=True)
+
+        q.putMany( ['p1', 'p1', 'p2'] )
+
+        self.assertEqual(fakeredis.FakeStrictRedis(server=self.oServer).hget(q.sStatsKey, 'in'), b'2')
+
+    def testFlushClearsSeenSet(self):
+
+        q = self.queue()
+
+        q.putMany( ['p1', 'p2'] )
+        q.flush()
+
+        self.assertEqual(q.seen(), 0)
+        self.assertEqual(q.putMany( ['p1', 'p2'] ), 2)
+
+###
+class QueueCodecTest(unittest.TestCase):
+
+    dItem = {'projectName': 'p1', 'targets': [{'buildTargetPath': 'a/Makefile', 'ranking': 1}] * 50}
+
+    def testPlainJsonIsTheHistoricalFormat(self):
+
+        oCodec = QueueCodec()
+
+        self.assertEqual( json.loads( oCodec.encode(self.dItem).decode('utf-8') ), self.dItem )
+
+        # json queued by producers without a codec
+        self.assertEqual( oCodec.decode( json.dumps(self.dItem).encode('utf-8') ), self.dItem )
+
+    def testRoundTrips(self):
+
+        for sName in ['json', 'json-zlib', 'json-zstd', 'msgpack', 'msgpack-zlib', 'msgpack-zstd']:
+
+            oCodec = QueueCodec.fromName(sName, threshold=64)
+
+            self.assertEqual(oCodec.decode( oCodec.encode(self.dItem) ), self.dItem, sName)
+
+            # small items aren't compressed
+            self.assertEqual(oCodec.decode( oCodec.encode('p1') ), 'p1', sName)
+
+    def testAnyCodecDecodesAnyFormat(self):
+
+        sData = QueueCodec.fromName('msgpack-zlib', threshold=64).encode(self.dItem)
+
+        self.assertEqual(QueueCodec().decode(sData), self.dItem)
+
+    def testCompressionOnlyAboveThreshold(self):
+
+        oCodec = QueueCodec.fromName('json-zlib', threshold=64)
+
+        self.assertEqual( oCodec.encode('p1'), QueueCodec().encode('p1') )
+        self.assertLess( len( oCodec.encode(self.dItem) ), len( QueueCodec().encode(self.dItem) ) )
+
+    def testUnsupportedCodec(self):
+
+        self.assertRaises(ValueError, QueueCodec, format='xml')
+        self.assertRaises(ValueError, QueueCodec.fromName, 'json-lzma')
+
+###
+class QueueItemsTest(unittest.TestCase):
+
+    def testWithoutCodecItemsPassThrough(self):
+
+        oItems = QueueItems()
+
+        self.assertEqual(oItems.encode('p1'), 'p1')
+        self.assertEqual(oItems.decode(b'p1', bTrack=True), b'p1')
+        self.assertEqual(oItems.stored('p1'), 'p1')
+
+    def testStoredFormOfTrackedItems(self):
+
+        oItems = QueueItems( QueueCodec() )
+
+        # not what the codec would produce today, e.g. queued by an older producer
+        sData = b'{"projectName":  "p1"}'
+
+        item = oItems.decode(sData, bTrack=True)
+
+        self.assertEqual(item, {'projectName': 'p1'})
+        self.assertEqual(oItems.stored(item), sData)
+
+        # forgotten once returned, re-encoded after that
+        self.assertEqual(oItems.stored(item), QueueCodec().encode(item))
+
+    def testTrackingIsBounded(self):
+
+        oItems = QueueItems(QueueCodec(), maxTracked=10)
+
+        lItems = [oItems.decode( QueueCodec().encode([i]), bTrack=True ) for i in range(25)]
+
+        self.assertEqual(len(oItems.dStored), 10)
+        self.assertEqual(list( oItems.dStored.values() )[0][0], lItems[15])
+
+        oItems.clear()
+
+        self.assertEqual(len(oItems.dStored), 0)
+
+###
+class RedisQueueCodecTest(FakeRedisTestCase):
+
+    def testGetnpushHandsOutDecodedItems(self):
+
+        q = RedisQueue('codec-test', name2='codec-test-running', codec=QueueCodec.fromName('msgpack-zlib', threshold=16))
+
+        dItem = {'projectName': 'p1', 'targets': ['a/Makefile'] * 10}
+
+        q.put(dItem)
+
+        item = q.getnpush(block=False)
+
+        self.assertEqual(item, dItem)
+
+        # done() removes exactly what getnpush() moved to the secondary list
+        lRunning = fakeredis.FakeStrictRedis(server=self.oServer).lrange('queue:codec-test-running', 0, -1)
+
+        self.assertEqual(q.oItems.stored(item), lRunning[0])
+
+    def testFlushForgetsTrackedItems(self):
+
+        q = RedisQueue('codec-test', name2='codec-test-running', codec=QueueCodec())
+
+        q.putMany( ['p1', 'p2'] )
+        q.getnpush(block=False)
+        q.flush()
+
+        self.assertEqual(len(q.oItems.dStored), 0)
+
+if __name__ == '__main__':
+    unittest.main()
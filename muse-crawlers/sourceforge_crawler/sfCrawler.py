@@ -55,13 +55,16 @@ def crawlSourceForge(i, out, redisHost):
   site = "SourceForge"
   tmp = "tmp/"
   mkdir_p(tmp)
+
+  # one client (and connection pool) for the whole crawl instead of one per project id
+  redisc = redis.StrictRedis(host=redisHost, port=6379, db=redisDB)
+
   while True:
 
     print ("Working on SF project id: " + str(i)) 
 
     # Use Redis to determine if we have already downloaded
     bExists = None 
-    redisc = redis.StrictRedis(host=redisHost, port=6379, db=redisDB)
     uid = redisc.get('id-to-uuid:sourceforge:' + str(i))
     if uid is not None:
         bExists = True
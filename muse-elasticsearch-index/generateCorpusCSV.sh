@@ -19,23 +19,25 @@ src=/data/corpus_8tof/
 src2=/data/corpus_0to7/
 dest=$1
 
+# optional: project-root manifests (muse-builder/corpusCrawler/corpusManifest.py) to list the projects from
+# instead of finding them in the corpus
+manifests="${@:2}"
+
 sdate=$(date +'%m_%d_%y')
 log=$sdate"_CorpusProjects.csv"
 echo "Creating: $log"
 
-#Loop through all projects in corpus
-find $src -mindepth 9 -maxdepth 9 -type d  |
-while read project
-do
-    if [ -f $project/index.json ]; then
-         toks=$(echo "$project" | grep -o "/" | wc -w)
-         out=$(echo "$project" | sed 's/\//,/'$toks'')
-         echo $out
-         echo $out >> $log
+listProjects() {
+    if [ -n "$manifests" ]; then
+        cat $manifests
+    else
+        find $src -mindepth 9 -maxdepth 9 -type d
+        find $src2 -mindepth 9 -maxdepth 9 -type d
     fi
-done
+}
 
-find $src2 -mindepth 9 -maxdepth 9 -type d  |
+#Loop through all projects in corpus
+listProjects |
 while read project
 do
     if [ -f $project/index.json ]; then
@@ -45,4 +47,3 @@ do
          echo $out >> $log
     fi
 done
-
@@ -7,9 +7,17 @@
 ## Developed under contract #FA8750-14-C-0241
 ##
 import os
+import sys
 root_dir = '/data/corpus/'
 
-for root, dirs, files in os.walk(root_dir):
-   for dir_name in dirs:
+if len(sys.argv) > 1:
+   # project-root manifest (muse-builder/corpusCrawler/corpusManifest.py) instead of walking the corpus
+   for line in open(sys.argv[1]):
+       root, dir_name = os.path.split(line.rstrip('\n'))
        if len(dir_name) == 36 and len(dir_name.split('-')) == 5:
            print ",".join((root, dir_name))
+else:
+   for root, dirs, files in os.walk(root_dir):
+      for dir_name in dirs:
+          if len(dir_name) == 36 and len(dir_name.split('-')) == 5:
+              print ",".join((root, dir_name))
@@ -17,7 +17,7 @@ from elasticsearch import Elasticsearch
 import argparse
 parser = argparse.ArgumentParser()
 parser.add_argument("index", help="elasticsearch index name")
-parser.add_argument("dir_list", help="filename containing list of project dirs")
+parser.add_argument("dir_list", help="filename containing list of project dirs (root,uuid lines or a project-root manifest)")
 parser.add_argument("-np", "--noproject", help="Do not index projects records",
                     action="store_true")
 parser.add_argument("-nf", "--nofile", help="Do not index file records",
@@ -301,7 +301,8 @@ def index_project(record):
             es.index(index=index_name, doc_type="commit", body=commit_record, id=_id, parent=uuid, timeout=30)
 
 f_projects = open(f_name)
-projects = [line.strip().split(",") for line in f_projects if line.strip()]
+#root,uuid csv lines, or one full project path per line (manifest from muse-builder/corpusCrawler/corpusManifest.py)
+projects = [line.strip().split(",") if "," in line else os.path.split(line.strip()) for line in f_projects if line.strip()]
 
 #Load list of already indexed documents
 try: